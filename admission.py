@@ -0,0 +1,176 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, NamedTuple, Optional
+
+from job_queue import QueueFullError
+
+
+class JobCost(NamedTuple):
+    """分割任务预计占用的内存（MB）和CPU（并发执行的任务数，单个任务在一个线程中执行）"""
+    memory_mb: float
+    cpu: int = 1
+
+
+class ClientLimitError(QueueFullError):
+    """同一客户端排队和执行中的任务数已达上限"""
+
+    status_code = 429
+
+
+def estimate_job_cost(size_bytes: int, pages: Optional[int] = None, low_memory: bool = False) -> JobCost:
+    """按文件大小和页数估计分割任务的峰值内存
+
+    PyPDF2解析后的对象约与文件大小相当，另有每页的页面字典和提取出的文本；
+    低内存模式逐页窗口释放已解析对象，与文件大小相关的部分约为三分之一。
+    提交时不解析PDF，页数未知（None）只按文件大小估计，任务开始解析后再用 AdmissionController.update 修正。
+    """
+    size_mb = size_bytes / 1024 / 1024
+    memory_mb = AdmissionController.BASE_MEMORY_MB + AdmissionController.PAGE_MEMORY_MB * max(0, pages or 0)
+    memory_mb += size_mb * (AdmissionController.LOW_MEMORY_SIZE_FACTOR if low_memory else AdmissionController.SIZE_FACTOR)
+    return JobCost(round(memory_mb, 1))
+
+
+class AdmissionController:
+    """按内存和CPU预算决定分割任务何时开始执行
+
+    预算不足时任务排队等待；各客户端轮流出队，同一客户端按提交顺序，且同时执行的任务数不超过 max_running_per_client。
+    队首任务放不下时不跳过它去执行后面的小任务，避免大文件一直等待；单个任务超过全部预算时在没有其他任务执行时单独执行。
+    预算在每个进程内分别计算，多个gunicorn worker时由调用方按worker数分摊（见 app.worker_share）。
+    """
+
+    BASE_MEMORY_MB = 16
+    SIZE_FACTOR = 1.2
+    LOW_MEMORY_SIZE_FACTOR = 0.4
+    PAGE_MEMORY_MB = 0.02
+
+    def __init__(self, memory_budget_mb: float, cpu_budget: int, max_running_per_client: int = 1,
+                 max_pending_per_client: int = 5):
+        self.memory_budget_mb = max(1.0, memory_budget_mb)
+        self.cpu_budget = max(1, cpu_budget)
+        self.max_running_per_client = max(1, max_running_per_client)
+        self.max_pending_per_client = max(1, max_pending_per_client)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._waiting = OrderedDict()  # 客户端 -> deque[(task_id, cost, start)]，按轮转顺序排列
+        self._running = {}  # task_id -> (客户端, cost, 开始时间)
+        self._pending = {}  # 客户端 -> 已预留（排队和执行中）的任务数
+        self._used_memory = 0.0
+        self._used_cpu = 0
+        self._avg_seconds = None
+
+    def reserve(self, client: str):
+        """为客户端预留一个任务名额，超出上限时抛出 ClientLimitError；之后须调用 enqueue 或 cancel"""
+        with self._lock:
+            if self._pending.get(client, 0) >= self.max_pending_per_client:
+                raise ClientLimitError('提交的任务过多，请等待已提交的任务完成', retry_after=self._retry_after_locked())
+            self._pending[client] = self._pending.get(client, 0) + 1
+
+    def cancel(self, client: str):
+        """撤销 reserve 预留的名额"""
+        with self._lock:
+            self._release_pending(client)
+
+    def enqueue(self, task_id: str, client: str, cost: JobCost, start: Callable[[], None]):
+        """任务排队，预算允许时调用 start 开始执行（可能在本次调用中立即执行）"""
+        with self._lock:
+            self._waiting.setdefault(client, deque()).append((task_id, cost, start))
+            ready = self._dispatch_locked()
+        self._start(ready)
+
+    def update(self, task_id: str, cost: JobCost):
+        """执行中的任务得到更准确的估计后（例如解析出页数）调整其占用的预算"""
+        with self._lock:
+            entry = self._running.get(task_id)
+            if entry is None:
+                return
+            client, previous, started_at = entry
+            self._used_memory += min(cost.memory_mb, self.memory_budget_mb) - min(previous.memory_mb, self.memory_budget_mb)
+            self._used_cpu += min(cost.cpu, self.cpu_budget) - min(previous.cpu, self.cpu_budget)
+            self._running[task_id] = (client, cost, started_at)
+            ready = self._dispatch_locked()
+        self._start(ready)
+
+    def release(self, task_id: str):
+        """任务执行结束，归还预算并启动排队的任务"""
+        with self._lock:
+            entry = self._running.pop(task_id, None)
+            if entry is None:
+                return
+            client, cost, started_at = entry
+            self._used_memory -= min(cost.memory_mb, self.memory_budget_mb)
+            self._used_cpu -= min(cost.cpu, self.cpu_budget)
+            self._release_pending(client)
+            seconds = time.monotonic() - started_at
+            self._avg_seconds = seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * seconds
+            ready = self._dispatch_locked()
+        self._start(ready)
+
+    def retry_after(self) -> int:
+        with self._lock:
+            return self._retry_after_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'waiting': sum(len(queue) for queue in self._waiting.values()),
+                'running': len(self._running),
+                'memory_mb': round(self._used_memory, 1),
+                'cpu': self._used_cpu,
+            }
+
+    def _release_pending(self, client: str):
+        count = self._pending.get(client, 0) - 1
+        if count > 0:
+            self._pending[client] = count
+        else:
+            self._pending.pop(client, None)
+
+    def _running_for(self, client: str) -> int:
+        return sum(1 for running_client, _, _ in self._running.values() if running_client == client)
+
+    def _fits(self, cost: JobCost) -> bool:
+        if not self._running:
+            return True
+        return (self._used_memory + cost.memory_mb <= self.memory_budget_mb
+                and self._used_cpu + cost.cpu <= self.cpu_budget)
+
+    def _dispatch_locked(self) -> list:
+        """按客户端轮转取出可以开始的任务，返回它们的 start 回调"""
+        ready = []
+        while self._waiting:
+            client = next((client for client in self._waiting
+                           if self._running_for(client) < self.max_running_per_client), None)
+            if client is None:
+                break
+            queue = self._waiting[client]
+            task_id, cost, start = queue[0]
+            if not self._fits(cost):
+                break
+
+            queue.popleft()
+            # 该客户端移到轮转末尾
+            del self._waiting[client]
+            if queue:
+                self._waiting[client] = queue
+            self._running[task_id] = (client, cost, time.monotonic())
+            self._used_memory += min(cost.memory_mb, self.memory_budget_mb)
+            self._used_cpu += min(cost.cpu, self.cpu_budget)
+            ready.append((task_id, start))
+        return ready
+
+    def _start(self, ready: list):
+        for task_id, start in ready:
+            try:
+                start()
+            except Exception as e:
+                self.logger.error(f"Failed to start job {task_id}: {e}")
+                self.release(task_id)
+
+    def _retry_after_locked(self) -> int:
+        """按平均执行时间估计排队任务全部开始所需的秒数"""
+        waiting = sum(len(queue) for queue in self._waiting.values())
+        average = self._avg_seconds if self._avg_seconds is not None else 5.0
+        return max(1, min(300, math.ceil(average * (waiting + 1) / self.cpu_budget)))
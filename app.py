@@ -1,14 +1,20 @@
-from flask import Flask, render_template, request, send_file, flash, redirect, url_for, jsonify
+from flask import Flask, render_template, request, send_file, flash, redirect, url_for, jsonify, Response, stream_with_context
 import os
+import json
 import uuid
-import zipfile
-import tempfile
-import shutil
 import urllib.parse
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
-from pdf_chapter_splitter import PDFChapterSplitter
+from admission import AdmissionController, estimate_job_cost
+from chunked_upload import ChunkedUploadManager, UploadError
+from chapter_cache import MaterializedChapterCache
+from download_cache import TaskFileIndex, ZipCache
+from metrics import SplitterMetrics
+from progress_events import ProgressBroker
+from job_queue import (JobQueue, MemoryJobStore, SQLiteJobStore, QueueFullError, STATUS_QUEUED, STATUS_RUNNING,
+                       STATUS_DONE, STATUS_FAILED)
+from task_registry import SQLiteTaskRegistry, TaskRegistry
 import logging
-from datetime import datetime, timedelta
 import threading
 import time
 
@@ -17,58 +23,426 @@ app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 app.config['UPLOAD_FOLDER'] = '/tmp/uploads' if os.environ.get('VERCEL') else 'uploads'
 app.config['OUTPUT_FOLDER'] = '/tmp/outputs' if os.environ.get('VERCEL') else 'outputs'
+app.config['CACHE_FOLDER'] = '/tmp/cache' if os.environ.get('VERCEL') else 'cache'
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))  # 后台分割任务的并发数
+app.config['JOB_MAX_PENDING'] = int(os.environ.get('JOB_MAX_PENDING', 20))  # 排队和执行中任务的上限
+# 排队和执行中的任务超过该秒数未更新即视为所在进程已退出，记为失败（进程运行期间定期更新）
+app.config['JOB_STALE_SECONDS'] = int(os.environ.get('JOB_STALE_SECONDS', 300))
+# gunicorn worker数（gunicorn 也读取该变量作为默认worker数），用于把下面整个服务的预算分摊到每个worker
+app.config['WEB_CONCURRENCY'] = max(1, int(os.environ.get('WEB_CONCURRENCY') or 1))
+# 准入控制：按文件大小和页数估计每个任务的峰值内存，同时执行的任务不超过内存和CPU预算（整个服务，按worker数分摊），
+# 其余排队；ADMISSION_MEMORY_MB 为0时关闭。单个客户端同时执行和提交的任务数分别受限，客户端默认按IP区分
+app.config['ADMISSION_MEMORY_MB'] = int(os.environ.get('ADMISSION_MEMORY_MB') or os.environ.get('MEMORY_LIMIT_MB') or 1024)
+app.config['ADMISSION_CPU'] = int(os.environ.get('ADMISSION_CPU', app.config['JOB_WORKERS']))
+app.config['CLIENT_MAX_RUNNING'] = int(os.environ.get('CLIENT_MAX_RUNNING', max(1, app.config['JOB_WORKERS'] // 2)))
+app.config['CLIENT_MAX_PENDING'] = int(os.environ.get('CLIENT_MAX_PENDING', 5))
+app.config['CLIENT_ID_HEADER'] = os.environ.get('CLIENT_ID_HEADER', '')  # 例如反向代理设置的 X-Real-IP
+# 分块上传：单个请求体受 MAX_CONTENT_LENGTH 限制，整个文档的大小上限单独配置
+app.config['UPLOAD_CHUNK_SIZE'] = int(os.environ.get('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+app.config['MAX_DOCUMENT_SIZE'] = int(os.environ.get('MAX_DOCUMENT_SIZE', 500 * 1024 * 1024))
+# 虚拟分割：上传时只记录章节页面范围，章节文件在下载时按需生成并缓存
+app.config['VIRTUAL_SPLIT'] = os.environ.get('VIRTUAL_SPLIT', '').lower() in ('1', 'true', 'yes')
+app.config['CHAPTER_CACHE_BYTES'] = int(os.environ.get('CHAPTER_CACHE_BYTES', 1024 * 1024 * 1024))
+# 低内存模式：处理超大PDF时限制worker常驻内存，MEMORY_LIMIT_MB 为超过即提前释放缓存的上限
+app.config['LOW_MEMORY'] = os.environ.get('LOW_MEMORY', '').lower() in ('1', 'true', 'yes')
+app.config['MEMORY_LIMIT_MB'] = int(os.environ['MEMORY_LIMIT_MB']) if os.environ.get('MEMORY_LIMIT_MB') else None
+# 两阶段章节检测：先按内容流中的字号和字面文字筛选候选页
+app.config['PREFILTER'] = os.environ.get('PREFILTER', '').lower() in ('1', 'true', 'yes')
+# 章节文件的写入方式：standard 由PyPDF2重新序列化，raw 直接复制原始对象字节
+app.config['WRITE_ENGINE'] = os.environ.get('WRITE_ENGINE', 'standard')
+# 上传文件和分割结果的保留时间，以及两者合计的磁盘配额，超出时淘汰最久未访问的任务
+app.config['TASK_TTL_SECONDS'] = int(os.environ.get('TASK_TTL_SECONDS', 2 * 3600))
+app.config['DISK_QUOTA_BYTES'] = int(os.environ.get('DISK_QUOTA_BYTES',
+                                                    400 * 1024 * 1024 if os.environ.get('VERCEL') else 2 * 1024 * 1024 * 1024))
+app.config['CLEANUP_INTERVAL'] = int(os.environ.get('CLEANUP_INTERVAL', 60))
+# 打包下载的压缩级别；PDF本身已压缩，默认不压缩直接存储
+app.config['ZIP_COMPRESS_LEVEL'] = int(os.environ['ZIP_COMPRESS_LEVEL']) if os.environ.get('ZIP_COMPRESS_LEVEL') else None
+# 下载响应的缓存时间（秒）；文件带强ETag，过期后浏览器和CDN用 If-None-Match 重新验证
+app.config['DOWNLOAD_MAX_AGE'] = int(os.environ.get('DOWNLOAD_MAX_AGE', 24 * 3600))
+# 延迟初始化（Vercel默认开启）：导入时不创建目录、不扫描已有任务、不加载PyPDF2和分割模块，
+# 目录和任务登记在第一个请求时完成，分割模块在第一次处理PDF时导入
+app.config['LAZY_INIT'] = os.environ.get('LAZY_INIT', '1' if os.environ.get('VERCEL') else '').lower() in ('1', 'true', 'yes')
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 创建必要的目录
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
-
 # 允许的文件扩展名
 ALLOWED_EXTENSIONS = {'pdf'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def cleanup_old_files():
-    """清理超过2小时的临时文件"""
+def cleanup_periodically():
+    """空闲时也定期清理；有请求时由 before_request 顺带触发"""
     while True:
+        time.sleep(app.config['CLEANUP_INTERVAL'])
         try:
-            current_time = datetime.now()
-            cutoff_time = current_time - timedelta(hours=2)
-            
-            # 清理上传文件夹
-            for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                if os.path.getctime(filepath) < cutoff_time.timestamp():
-                    try:
-                        os.remove(filepath)
-                        logger.info(f"Cleaned up old upload file: {filename}")
-                    except Exception as e:
-                        logger.error(f"Error cleaning up {filename}: {e}")
-            
-            # 清理输出文件夹
-            for dirname in os.listdir(app.config['OUTPUT_FOLDER']):
-                dirpath = os.path.join(app.config['OUTPUT_FOLDER'], dirname)
-                if os.path.isdir(dirpath) and os.path.getctime(dirpath) < cutoff_time.timestamp():
-                    try:
-                        shutil.rmtree(dirpath)
-                        logger.info(f"Cleaned up old output directory: {dirname}")
-                    except Exception as e:
-                        logger.error(f"Error cleaning up {dirname}: {e}")
-                        
+            task_registry.cleanup()
         except Exception as e:
             logger.error(f"Error in cleanup thread: {e}")
+
+chunked_uploads = ChunkedUploadManager(
+    app.config['UPLOAD_FOLDER'],
+    max_size=app.config['MAX_DOCUMENT_SIZE'],
+    chunk_size=app.config['UPLOAD_CHUNK_SIZE']
+)
+
+chapter_cache = MaterializedChapterCache(app.config['CHAPTER_CACHE_BYTES'])
+
+# 下载时按任务的内存索引查找文件，打包下载的ZIP每个任务只生成一次
+file_index = TaskFileIndex()
+zip_cache = ZipCache()
+
+# 各处理阶段的耗时、吞吐量等指标，通过 /metrics 以 Prometheus 格式输出
+split_metrics = SplitterMetrics()
+
+# 分割任务的进度事件，通过 /events/<task_id> 以SSE推送
+progress_broker = ProgressBroker()
+SSE_KEEPALIVE_SECONDS = 15
+# 单个SSE连接的最长时间，到时关闭连接，浏览器在 SSE_RETRY_MS 后带 Last-Event-ID 重连，长任务不会一直占用同一个请求线程
+app.config['SSE_MAX_SECONDS'] = int(os.environ.get('SSE_MAX_SECONDS', 120))
+SSE_RETRY_MS = 2000
+
+MANIFEST_FILENAME = 'manifest.json'
+
+def shared_store():
+    """根据 JOB_STORE 环境变量决定任务状态和任务登记是否保存在SQLite中（sqlite 或 memory）
+
+    默认使用SQLite，多个gunicorn worker共享任务状态和任务登记，请求落到任一worker都能查询；
+    Vercel上每个实例独立且任务在请求内同步完成，默认使用进程内存储。
+    """
+    return (os.environ.get('JOB_STORE') or ('memory' if os.environ.get('VERCEL') else 'sqlite')) == 'sqlite'
+
+def create_job_store():
+    if shared_store():
+        return SQLiteJobStore(os.path.join(app.config['CACHE_FOLDER'], 'jobs.sqlite3'))
+    return MemoryJobStore()
+
+def worker_share(total):
+    """整个服务的预算分摊到每个worker的份额，至少为1；worker各自计算，合计不超过总预算（总预算小于worker数时除外）"""
+    return max(1, total // app.config['WEB_CONCURRENCY'])
+
+admission = AdmissionController(
+    app.config['ADMISSION_MEMORY_MB'] / app.config['WEB_CONCURRENCY'],
+    worker_share(app.config['ADMISSION_CPU']),
+    max_running_per_client=worker_share(app.config['CLIENT_MAX_RUNNING']),
+    max_pending_per_client=worker_share(app.config['CLIENT_MAX_PENDING'])
+) if app.config['ADMISSION_MEMORY_MB'] > 0 and not os.environ.get('VERCEL') else None
+
+# 无服务器环境中请求结束后后台线程不再运行，任务在请求内同步执行
+job_queue = JobQueue(
+    create_job_store(),
+    max_workers=0 if os.environ.get('VERCEL') else max(app.config['JOB_WORKERS'], worker_share(app.config['ADMISSION_CPU'])),
+    max_pending=app.config['JOB_MAX_PENDING'],
+    admission=admission,
+    stale_timeout=app.config['JOB_STALE_SECONDS']
+)
+
+def task_output_dir(task_id):
+    return os.path.join(app.config['OUTPUT_FOLDER'], task_id)
+
+def task_is_busy(task_id):
+    """排队或执行中的任务不能被清理"""
+    job = job_queue.get(task_id)
+    return job is not None and job['status'] in (STATUS_QUEUED, STATUS_RUNNING)
+
+def on_task_removed(task_id, paths):
+    chapter_cache.discard_dir(task_output_dir(task_id))
+    file_index.invalidate(task_id)
+    # 过期的未完成分块上传也由任务登记清理，同时释放其增量哈希状态
+    chunked_uploads.discard(task_id)
+    # 上传文件和结果已删除，任务记录（结果、章节列表、错误信息）随之删除，任务存储不会无限增长
+    job_queue.delete(task_id)
+
+def create_task_registry():
+    """每个任务的上传文件和输出目录，按过期时间和磁盘配额清理；多个worker共享时配额和访问时间按全部worker计算"""
+    options = dict(max_bytes=app.config['DISK_QUOTA_BYTES'], cleanup_interval=app.config['CLEANUP_INTERVAL'],
+                   is_busy=task_is_busy, on_remove=on_task_removed)
+    if shared_store():
+        return SQLiteTaskRegistry(os.path.join(app.config['CACHE_FOLDER'], 'tasks.sqlite3'),
+                                  app.config['TASK_TTL_SECONDS'], **options)
+    return TaskRegistry(app.config['TASK_TTL_SECONDS'], **options)
+
+task_registry = create_task_registry()
+
+def restore_task_registry():
+    """启动时登记已有的上传文件和输出目录，只扫描一次"""
+    tasks = {}
+    for folder in (app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER']):
+        for name in os.listdir(folder):
+            # 上传文件名为 <task_id>_<文件名>，未完成的分块上传为 <upload_id>.part/.json，输出目录名即 task_id
+            task_id = name.split('_', 1)[0].split('.', 1)[0]
+            path = os.path.join(folder, name)
+            try:
+                created_at = os.path.getctime(path)
+            except OSError:
+                continue
+            paths, first_seen = tasks.get(task_id, ([], created_at))
+            paths.append(path)
+            tasks[task_id] = (paths, min(first_seen, created_at))
+    
+    for task_id, (paths, created_at) in tasks.items():
+        task_registry.register(task_id, paths, created_at=created_at)
+    if tasks:
+        logger.info(f"Registered {len(tasks)} existing tasks ({task_registry.total_bytes} bytes)")
+
+_init_lock = threading.Lock()
+_initialized = False
+
+def initialize():
+    """创建必要的目录、登记已有任务并启动清理线程，只执行一次"""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+        restore_task_registry()
         
-        time.sleep(3600)  # 每小时运行一次
+        # 无服务器环境中请求结束后后台线程不再运行，只依赖请求触发的清理
+        if not os.environ.get('VERCEL'):
+            threading.Thread(target=cleanup_periodically, daemon=True).start()
+        _initialized = True
 
-# 启动清理线程 - 在Vercel等无服务器环境中跳过
-import os
-if not os.environ.get('VERCEL'):
-    cleanup_thread = threading.Thread(target=cleanup_old_files, daemon=True)
-    cleanup_thread.start()
+if not app.config['LAZY_INIT']:
+    initialize()
+    # 常驻进程在启动时加载分割模块，第一个分割任务不再承担导入开销
+    import pdf_chapter_splitter  # noqa: F401
+
+@app.before_request
+def ensure_initialized():
+    initialize()
+
+@app.before_request
+def opportunistic_cleanup():
+    try:
+        task_registry.maybe_cleanup()
+    except Exception as e:
+        logger.error(f"Error cleaning up tasks: {e}")
+
+def create_task_splitter(task_id, filepath, patterns, reuse_text=False, progress=True, use_outline=None):
+    """任务使用的splitter；全文扫描时把页面文本索引保存在任务的输出目录中，供重新检测时使用
+
+    重新检测或重新分割时指定了章节模式则不使用书签，否则有书签的PDF总是返回书签结果，新的模式不起作用。
+    """
+    from pdf_chapter_splitter import PDFChapterSplitter
+    output_dir = task_output_dir(task_id)
+    if use_outline is None:
+        use_outline = not (reuse_text and patterns)
+    splitter = PDFChapterSplitter(filepath, output_dir, use_outline=use_outline,
+                                  use_cache=True, cache_dir=app.config['CACHE_FOLDER'],
+                                  progress_callback=(lambda event, data: progress_broker.publish(task_id, event, data))
+                                  if progress else None,
+                                  low_memory=app.config['LOW_MEMORY'], memory_limit_mb=app.config['MEMORY_LIMIT_MB'],
+                                  prefilter=app.config['PREFILTER'], write_engine=app.config['WRITE_ENGINE'],
+                                  text_index_path=text_index_path(task_id), reuse_text=reuse_text)
+    
+    # 添加自定义模式
+    for pattern in patterns:
+        try:
+            splitter.add_custom_pattern(pattern)
+        except Exception as e:
+            logger.warning(f"Invalid pattern '{pattern}': {e}")
+    return splitter
+
+def run_split_job(task_id, filepath, original_filename, patterns, reuse_text=False):
+    """后台执行的分割任务，返回与上传接口相同的结果字段；reuse_text 时先删除上次的分割结果，并用页面文本索引检测章节"""
+    if reuse_text:
+        clear_task_outputs(task_id)
+    splitter = create_task_splitter(task_id, filepath, patterns, reuse_text=reuse_text)
+    
+    try:
+        # 检测和写入共用一次解析；解析后按实际页数修正准入控制的资源估计
+        with splitter.session() as reader:
+            if job_queue.admission is not None:
+                job_queue.admission.update(task_id, estimate_task_cost(filepath, len(reader.pages)))
+            result = execute_split(task_id, splitter, filepath, original_filename)
+    except Exception:
+        split_metrics.observe_job(splitter.profile(), 'failed')
+        raise
+    finally:
+        progress_broker.finish(task_id)
+        file_index.invalidate(task_id)
+        task_registry.update(task_id)
+    
+    profile = splitter.profile()
+    split_metrics.observe_job(profile, 'done')
+    logger.info(f"Task {task_id} finished in {profile['total_seconds']:.2f}s "
+                f"({', '.join(f'{phase}={seconds:.2f}s' for phase, seconds in profile['phases'].items())}), "
+                f"engine={profile['detection_engine']}")
+    return result
+
+def run_index_job(task_id, filepath, previous):
+    """后台为重新检测生成页面文本索引：不使用书签完整扫描一次，任务的状态和结果保持为上次执行的"""
+    splitter = create_task_splitter(task_id, filepath, [], reuse_text=True, use_outline=False)
+    try:
+        with splitter.session() as reader:
+            if job_queue.admission is not None:
+                job_queue.admission.update(task_id, estimate_task_cost(filepath, len(reader.pages)))
+            splitter.find_chapter_breaks()
+    finally:
+        progress_broker.finish(task_id)
+        task_registry.update(task_id)
+    
+    if splitter.load_text_index() is None:
+        logger.warning(f"Task {task_id}: failed to build page text index")
+    if previous['status'] == STATUS_FAILED:
+        raise RuntimeError(previous.get('error') or 'PDF处理失败')
+    return previous['result']
+
+def execute_split(task_id, splitter, filepath, original_filename):
+    """执行分割（或虚拟分割）并返回结果字段"""
+    output_dir = task_output_dir(task_id)
+    
+    # 虚拟分割：只保存分割方案，章节文件在首次下载时生成
+    if app.config['VIRTUAL_SPLIT']:
+        manifest = splitter.plan_split()
+        if not manifest:
+            raise RuntimeError('PDF处理失败')
+        save_manifest(task_id, filepath, manifest)
+        output_files = [entry['filename'] for entry in manifest]
+        return {
+            'success': True,
+            'task_id': task_id,
+            'original_filename': original_filename,
+            'output_files': output_files,
+            'total_files': len(output_files),
+            'engine': splitter.detection_engine
+        }
+    
+    # 执行分割
+    if not splitter.split_pdf_by_chapters():
+        raise RuntimeError('PDF处理失败')
+    
+    # 获取分割结果
+    output_files = []
+    if os.path.exists(output_dir):
+        for f in os.listdir(output_dir):
+            if f.endswith('.pdf'):
+                output_files.append(f)
+    
+    return {
+        'success': True,
+        'task_id': task_id,
+        'original_filename': original_filename,
+        'output_files': sorted(output_files),
+        'total_files': len(output_files),
+        'engine': splitter.detection_engine
+    }
+
+def text_index_path(task_id):
+    from pdf_chapter_splitter import PDFChapterSplitter
+    return os.path.join(task_output_dir(task_id), PDFChapterSplitter.TEXT_INDEX_FILENAME)
+
+def task_source_path(task_id):
+    """任务的上传文件路径，任务不存在或文件已被清理时返回None"""
+    job = job_queue.get(task_id)
+    if job is None or not job.get('original_filename'):
+        return None
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{task_id}_{job['original_filename']}")
+    return filepath if os.path.exists(filepath) else None
+
+def clear_task_outputs(task_id):
+    """删除任务已生成的章节文件、打包的ZIP和虚拟分割方案，保留页面文本索引"""
+    output_dir = task_output_dir(task_id)
+    file_index.invalidate(task_id)
+    if not os.path.isdir(output_dir):
+        return
+    chapter_cache.discard_dir(output_dir)
+    zip_cache.discard(output_dir)
+    for filename in os.listdir(output_dir):
+        if filename.endswith('.pdf') or filename == MANIFEST_FILENAME:
+            os.remove(os.path.join(output_dir, filename))
+
+def manifest_path(task_id):
+    return os.path.join(task_output_dir(task_id), MANIFEST_FILENAME)
+
+def save_manifest(task_id, source_path, manifest):
+    """保存虚拟分割的源文件路径和每个章节的页面范围"""
+    os.makedirs(os.path.dirname(manifest_path(task_id)), exist_ok=True)
+    with open(manifest_path(task_id), 'w', encoding='utf-8') as f:
+        json.dump({'source': source_path, 'chapters': manifest}, f, ensure_ascii=False)
+
+def load_manifest(task_id):
+    """读取虚拟分割方案，任务不是虚拟分割时返回None"""
+    try:
+        with open(manifest_path(task_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def materialize_chapter(task_id, manifest, entry):
+    """返回章节文件路径，首次请求时从源文件生成；源文件已不存在时返回None"""
+    file_path = os.path.join(task_output_dir(task_id), entry['filename'])
+    if not os.path.exists(manifest['source']) and not os.path.exists(file_path):
+        return None
+    
+    def generate(tmp_path):
+        from pdf_chapter_splitter import PDFChapterSplitter
+        splitter = PDFChapterSplitter(manifest['source'], os.path.dirname(file_path), low_memory=app.config['LOW_MEMORY'],
+                                      memory_limit_mb=app.config['MEMORY_LIMIT_MB'],
+                                      write_engine=app.config['WRITE_ENGINE'])
+        written = splitter.write_manifest_entry(entry, tmp_path)
+        for phase, seconds in splitter.phase_timings.items():
+            split_metrics.observe_phase(phase, seconds)
+        return written
+    
+    if not chapter_cache.get(file_path, generate):
+        return None
+    task_registry.update(task_id)
+    return file_path
+
+def parse_custom_patterns(custom_patterns):
+    """把表单中按行填写的自定义章节模式拆分为列表"""
+    custom_patterns = (custom_patterns or '').strip()
+    return [p.strip() for p in custom_patterns.split('\n') if p.strip()] if custom_patterns else []
+
+def client_id():
+    """区分客户端的标识，用于限制单个客户端的并发任务数"""
+    header = app.config['CLIENT_ID_HEADER']
+    return (request.headers.get(header) if header else None) or request.remote_addr or ''
+
+def estimate_task_cost(filepath, pages=None):
+    """估计分割任务的资源占用；未启用准入控制时返回None
+
+    提交时只按文件大小估计，不在请求线程中解析PDF（解析本身就是准入控制要限制的开销）；
+    任务开始执行、解析出页数后由 run_split_job 修正。
+    """
+    if job_queue.admission is None:
+        return None
+    return estimate_job_cost(os.path.getsize(filepath), pages, low_memory=app.config['LOW_MEMORY'])
+
+def queue_full_response(e):
+    """队列已满（503）或客户端超限（429）的响应，带 Retry-After"""
+    split_metrics.observe_rejected('client_limit' if e.status_code == 429 else 'queue_full')
+    response = jsonify({'error': str(e) if e.status_code == 429 else '服务器繁忙，请稍后重试'})
+    response.status_code = e.status_code
+    if e.retry_after:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def submit_split_job(task_id, filepath, original_filename, patterns):
+    """提交后台分割任务，立即返回任务ID；资源预算不足时任务排队，队列已满或客户端超限时拒绝"""
+    task_registry.register(task_id, [filepath, task_output_dir(task_id)])
+    progress_broker.reset(task_id)
+    try:
+        job_queue.submit(task_id, run_split_job, task_id, filepath, original_filename, patterns,
+                         cost=estimate_task_cost(filepath), client=client_id(),
+                         original_filename=original_filename)
+    except QueueFullError as e:
+        task_registry.forget(task_id)
+        os.remove(filepath)
+        return queue_full_response(e)
+    
+    return jsonify({
+        'success': True,
+        'task_id': task_id,
+        'original_filename': original_filename,
+        'status': job_queue.get(task_id)['status']
+    }), 202
 
 @app.route('/')
 def index():
@@ -95,82 +469,314 @@ def upload_file():
         original_filename = filename
         filename = f"{task_id}_{filename}"
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        save_start = time.perf_counter()
         file.save(filepath)
+        split_metrics.observe_phase('save_upload', time.perf_counter() - save_start)
         
         # 获取自定义章节模式
-        custom_patterns = request.form.get('custom_patterns', '').strip()
-        patterns = [p.strip() for p in custom_patterns.split('\n') if p.strip()] if custom_patterns else []
-        
-        # 处理PDF
-        output_dir = os.path.join(app.config['OUTPUT_FOLDER'], task_id)
-        splitter = PDFChapterSplitter(filepath, output_dir)
+        patterns = parse_custom_patterns(request.form.get('custom_patterns', ''))
         
-        # 添加自定义模式
-        for pattern in patterns:
-            try:
-                splitter.add_custom_pattern(pattern)
-            except Exception as e:
-                logger.warning(f"Invalid pattern '{pattern}': {e}")
-        
-        # 执行分割
-        success = splitter.split_pdf_by_chapters()
-        
-        if success:
-            # 获取分割结果
-            output_files = []
-            if os.path.exists(output_dir):
-                for f in os.listdir(output_dir):
-                    if f.endswith('.pdf'):
-                        output_files.append(f)
-            
-            return jsonify({
-                'success': True,
-                'task_id': task_id,
-                'original_filename': original_filename,
-                'output_files': sorted(output_files),
-                'total_files': len(output_files)
-            })
-        else:
-            return jsonify({'error': 'PDF处理失败'}), 500
+        return submit_split_job(task_id, filepath, original_filename, patterns)
             
     except Exception as e:
         logger.error(f"Error processing file: {e}")
         return jsonify({'error': f'处理文件时出错: {str(e)}'}), 500
 
+@app.route('/upload/init', methods=['POST'])
+def upload_init():
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': '只支持PDF文件'}), 400
+    
+    try:
+        upload = chunked_uploads.init(filename, int(data.get('size') or 0))
+        task_registry.register(upload['upload_id'], chunked_uploads.files(upload['upload_id']))
+        return jsonify(upload)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def upload_progress(upload_id):
+    try:
+        return jsonify(chunked_uploads.status(upload_id))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+@app.route('/upload/<upload_id>/chunk', methods=['PUT', 'POST'])
+def upload_chunk(upload_id):
+    try:
+        offset = int(request.args.get('offset', -1))
+        result = chunked_uploads.append(upload_id, offset, request.stream, request.content_length)
+        task_registry.touch(upload_id)
+        task_registry.update(upload_id)
+        return jsonify(result)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except ValueError:
+        return jsonify({'error': '无效的偏移'}), 400
+
+@app.route('/upload/<upload_id>/finalize', methods=['POST'])
+def upload_finalize(upload_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        task_id = str(uuid.uuid4())
+        original_filename = secure_filename(chunked_uploads.status(upload_id)['filename'])
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{task_id}_{original_filename}")
+        finalize_start = time.perf_counter()
+        meta = chunked_uploads.finalize(upload_id, filepath, data.get('sha256'))
+        # 分块文件已移动为任务的上传文件，改由任务登记
+        task_registry.forget(upload_id)
+        split_metrics.observe_phase('save_upload', time.perf_counter() - finalize_start)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    
+    logger.info(f"Chunked upload {upload_id} complete: {meta['size']} bytes, sha256={meta['sha256']}")
+    patterns = parse_custom_patterns(data.get('custom_patterns', ''))
+    return submit_split_job(task_id, filepath, original_filename, patterns)
+
+def check_task_idle(task_id):
+    """重新检测和重新分割前检查任务状态，返回 (源文件路径, 错误响应)"""
+    if task_is_busy(task_id):
+        return None, (jsonify({'error': '任务正在处理中，请稍后重试'}), 409)
+    filepath = task_source_path(task_id)
+    if filepath is None:
+        return None, (jsonify({'error': '任务不存在或源文件已被清理'}), 404)
+    return filepath, None
+
+def resubmit_job(task_id, filepath, func, *args):
+    """重新提交已结束的任务（重新分割或生成页面文本索引），返回与上传接口相同的202响应"""
+    original_filename = job_queue.get(task_id)['original_filename']
+    task_registry.touch(task_id)
+    # 上次执行的进度事件和结束标记不再推送给新的连接
+    progress_broker.reset(task_id)
+    try:
+        job_queue.submit(task_id, func, *args, cost=estimate_task_cost(filepath), client=client_id(),
+                         original_filename=original_filename)
+    except QueueFullError as e:
+        return queue_full_response(e)
+    
+    return jsonify({
+        'success': True,
+        'task_id': task_id,
+        'original_filename': original_filename,
+        'status': job_queue.get(task_id)['status']
+    }), 202
+
+@app.route('/rescan/<task_id>', methods=['POST'])
+def rescan_task(task_id):
+    """用新的章节模式对页面文本索引重新检测，只返回检测结果而不分割
+
+    没有可用的索引时不在请求中解析PDF，而是提交后台任务生成索引（与重新分割一样受队列和准入控制限制），
+    返回202，任务结束后再次请求即可得到检测结果。
+    """
+    filepath, error = check_task_idle(task_id)
+    if error is not None:
+        return error
+    
+    data = request.get_json(silent=True) or {}
+    patterns = parse_custom_patterns(data.get('custom_patterns', ''))
+    task_registry.touch(task_id)
+    splitter = create_task_splitter(task_id, filepath, patterns, reuse_text=True, progress=False)
+    index = splitter.load_text_index()
+    if index is None:
+        return resubmit_job(task_id, filepath, run_index_job, task_id, filepath, job_queue.get(task_id))
+    
+    start = time.perf_counter()
+    chapter_breaks = splitter.rescan_text_index(index)
+    seconds = time.perf_counter() - start
+    split_metrics.observe_phase('rescan', seconds)
+    
+    return jsonify({
+        'task_id': task_id,
+        'engine': splitter.detection_engine,
+        'seconds': round(seconds, 4),
+        'chapters': [{'page': page + 1, 'title': title} for page, title in chapter_breaks],
+        'total': len(chapter_breaks)
+    })
+
+@app.route('/resplit/<task_id>', methods=['POST'])
+def resplit_task(task_id):
+    """按确认后的章节模式重新分割，章节检测使用页面文本索引；结果通过 /status 和 /events 获取"""
+    filepath, error = check_task_idle(task_id)
+    if error is not None:
+        return error
+    
+    data = request.get_json(silent=True) or {}
+    patterns = parse_custom_patterns(data.get('custom_patterns', ''))
+    original_filename = job_queue.get(task_id)['original_filename']
+    return resubmit_job(task_id, filepath, run_split_job, task_id, filepath, original_filename, patterns, True)
+
+@app.route('/metrics')
+def metrics():
+    if job_queue.admission is not None:
+        split_metrics.observe_admission(job_queue.admission.stats())
+    return Response(split_metrics.render(), content_type=SplitterMetrics.CONTENT_TYPE)
+
+def job_status_payload(task_id, job):
+    """任务状态接口和SSE结束事件共用的状态字段"""
+    response = {
+        'task_id': task_id,
+        'status': job['status'],
+        'original_filename': job.get('original_filename')
+    }
+    if job['status'] == STATUS_DONE:
+        response.update(job['result'])
+    elif job['status'] == STATUS_FAILED:
+        response['error'] = job.get('error') or 'PDF处理失败'
+    return response
+
+@app.route('/status/<task_id>')
+def job_status(task_id):
+    job = job_queue.get(task_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    
+    return jsonify(job_status_payload(task_id, job))
+
+def format_sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return '\n'.join(lines) + '\n\n'
+
+def progress_stream(task_id, last_id):
+    """推送任务的进度事件，任务结束时发送 status 事件（内容同 /status 接口）后关闭
+
+    进度事件只在执行任务的进程内可见；请求落到其他worker时仍会按任务状态发送结束事件。
+    连接超过 SSE_MAX_SECONDS 时关闭，由浏览器重连后继续推送。
+    """
+    yield f"retry: {SSE_RETRY_MS}\n\n"
+    deadline = time.monotonic() + app.config['SSE_MAX_SECONDS']
+    idle = 0.0
+    while True:
+        events, finished = progress_broker.wait(task_id, last_id, timeout=1.0)
+        for seq, event, data in events:
+            last_id = seq
+            yield format_sse(event, data, seq)
+        
+        job = job_queue.get(task_id)
+        if job is None:
+            yield format_sse('status', {'task_id': task_id, 'status': STATUS_FAILED, 'error': '任务不存在'})
+            return
+        if job['status'] in (STATUS_DONE, STATUS_FAILED):
+            for seq, event, data in progress_broker.wait(task_id, last_id, timeout=0)[0]:
+                yield format_sse(event, data, seq)
+            yield format_sse('status', job_status_payload(task_id, job))
+            return
+        
+        if time.monotonic() >= deadline:
+            return
+        
+        if finished and not events:
+            # 任务函数已返回，等待任务队列写入最终状态
+            time.sleep(0.05)
+            continue
+        
+        idle = 0.0 if events else idle + 1.0
+        if idle >= SSE_KEEPALIVE_SECONDS:
+            idle = 0.0
+            yield ': keep-alive\n\n'
+
+@app.route('/events/<task_id>')
+def job_events(task_id):
+    if job_queue.get(task_id) is None:
+        return jsonify({'error': '任务不存在'}), 404
+    
+    try:
+        last_id = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_id = 0
+    
+    return Response(
+        stream_with_context(progress_stream(task_id, last_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def materialized_files(task_id, manifest, missing):
+    """逐个生成并返回虚拟分割的章节文件，供流式打包边生成边读取；生成失败的文件名追加到 missing"""
+    for entry in manifest['chapters']:
+        file_path = materialize_chapter(task_id, manifest, entry)
+        if file_path is None:
+            logger.error(f"Failed to materialize {entry['filename']} for task {task_id}")
+            missing.append(entry['filename'])
+            continue
+        yield file_path, entry['filename']
+
+def output_files(task_id):
+    """任务输出目录中的章节文件 {文件名: 路径}，供下载索引加载"""
+    output_dir = task_output_dir(task_id)
+    try:
+        names = os.listdir(output_dir)
+    except FileNotFoundError:
+        return {}
+    return {name: os.path.join(output_dir, name) for name in sorted(names) if name.endswith('.pdf')}
+
+def output_version(task_id):
+    """输出目录的修改时间，章节文件增删（包括其他worker重新分割）后改变，用于校验下载索引"""
+    try:
+        return os.stat(task_output_dir(task_id)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def send_download(file_path, download_name, mimetype):
+    """发送下载文件：强ETag和长期缓存头，支持 If-None-Match 和 Range（断点续传）"""
+    stat = os.stat(file_path)
+    # send_file 将相对路径解析到应用目录而非工作目录
+    return send_file(
+        os.path.abspath(file_path),
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mimetype,
+        conditional=True,
+        etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+        last_modified=stat.st_mtime,
+        max_age=app.config['DOWNLOAD_MAX_AGE']
+    )
+
+def timed_stream(chunks, phase):
+    """转发流式响应的数据块，完整发送后记录该阶段耗时"""
+    start = time.perf_counter()
+    yield from chunks
+    split_metrics.observe_phase(phase, time.perf_counter() - start)
+
 @app.route('/download/<task_id>')
 def download_all(task_id):
     try:
-        output_dir = os.path.join(app.config['OUTPUT_FOLDER'], task_id)
+        output_dir = task_output_dir(task_id)
+        task_registry.touch(task_id)
         if not os.path.exists(output_dir):
             return jsonify({'error': '文件不存在'}), 404
         
-        # 创建ZIP文件
-        zip_path = os.path.join(tempfile.gettempdir(), f"{task_id}_chapters.zip")
-        
-        # 如果ZIP文件已存在，先删除
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
-            
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for filename in os.listdir(output_dir):
-                if filename.endswith('.pdf'):
-                    file_path = os.path.join(output_dir, filename)
-                    zipf.write(file_path, filename)
+        download_name = f"pdf_chapters_{task_id[:8]}.zip"
+        # 已生成过的ZIP直接发送，支持条件请求和断点续传
+        zip_path = zip_cache.cached(output_dir)
+        if zip_path is not None:
+            return send_download(zip_path, download_name, 'application/zip')
         
-        def remove_file(response):
-            try:
-                os.remove(zip_path)
-            except Exception:
-                pass
-            return response
+        missing = []
+        manifest = load_manifest(task_id)
+        if manifest is not None:
+            files = materialized_files(task_id, manifest, missing)
+        else:
+            index = file_index.files(task_id, lambda: output_files(task_id), output_version(task_id))
+            files = [(path, name) for name, path in index.items()]
         
-        return send_file(
-            zip_path, 
-            as_attachment=True, 
-            download_name=f"pdf_chapters_{task_id[:8]}.zip",
-            mimetype='application/zip'
+        # 边读边发送ZIP数据，同时写入缓存；任务仍在处理或有章节生成失败时不缓存
+        from zip_stream import stream_zip
+        chunks = stream_zip(files, app.config['ZIP_COMPRESS_LEVEL'])
+        if not task_is_busy(task_id):
+            chunks = zip_cache.stream_and_store(output_dir, chunks, keep=lambda: not missing,
+                                                on_stored=lambda path: task_registry.update(task_id))
+        return Response(
+            stream_with_context(timed_stream(chunks, 'zip')),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating download: {e}")
         return jsonify({'error': f'下载文件时出错: {str(e)}'}), 500
@@ -180,46 +786,32 @@ def download_single(task_id, filename):
     try:
         # URL解码文件名
         decoded_filename = urllib.parse.unquote(filename, encoding='utf-8')
-        logger.info(f"Decoded filename: {decoded_filename}")
         
         # 检查文件路径安全性
         if '..' in decoded_filename or '/' in decoded_filename or '\\' in decoded_filename:
             return jsonify({'error': '无效的文件名'}), 400
-            
-        # 构建文件路径
-        output_dir = os.path.join(app.config['OUTPUT_FOLDER'], task_id)
-        file_path = os.path.join(output_dir, decoded_filename)
         
-        logger.info(f"Looking for file: {file_path}")
-        logger.info(f"Output dir exists: {os.path.exists(output_dir)}")
+        task_registry.touch(task_id)
         
-        # 列出目录中的所有文件用于调试
-        if os.path.exists(output_dir):
-            files = os.listdir(output_dir)
-            logger.info(f"Files in directory: {files}")
-            
-            # 尝试精确匹配
-            if decoded_filename in files:
-                file_path = os.path.join(output_dir, decoded_filename)
-            else:
-                # 如果精确匹配失败，尝试找到相似的文件
-                for f in files:
-                    if f.endswith('.pdf') and decoded_filename.replace(' ', '') in f.replace(' ', ''):
-                        file_path = os.path.join(output_dir, f)
-                        logger.info(f"Found similar file: {f}")
-                        break
+        # 虚拟分割的章节按需生成
+        manifest = load_manifest(task_id)
+        if manifest is not None:
+            entry = next((e for e in manifest['chapters'] if e['filename'] == decoded_filename), None)
+            file_path = materialize_chapter(task_id, manifest, entry) if entry else None
+            if file_path is None:
+                return jsonify({'error': f'文件不存在: {decoded_filename}'}), 404
+            return send_download(file_path, entry['filename'], 'application/pdf')
         
-        if not os.path.exists(file_path) or not file_path.endswith('.pdf'):
-            logger.error(f"File not found: {file_path}")
+        file_path = file_index.resolve(task_id, decoded_filename, lambda: output_files(task_id), output_version(task_id))
+        if file_path is None or not os.path.exists(file_path):
+            logger.error(f"File not found: {task_id}/{decoded_filename}")
             return jsonify({'error': f'文件不存在: {decoded_filename}'}), 404
         
-        return send_file(
-            file_path, 
-            as_attachment=True, 
-            download_name=os.path.basename(file_path),
-            mimetype='application/pdf'
-        )
+        return send_download(file_path, os.path.basename(file_path), 'application/pdf')
         
+    except HTTPException:
+        # 304、416 等由条件请求和Range处理产生的响应
+        raise
     except Exception as e:
         logger.error(f"Error downloading single file: {e}")
         return jsonify({'error': f'下载文件时出错: {str(e)}'}), 500
@@ -227,10 +819,31 @@ def download_single(task_id, filename):
 @app.route('/preview/<task_id>')
 def preview_chapters(task_id):
     try:
-        output_dir = os.path.join(app.config['OUTPUT_FOLDER'], task_id)
+        output_dir = task_output_dir(task_id)
+        task_registry.touch(task_id)
         if not os.path.exists(output_dir):
             return jsonify({'error': '文件不存在'}), 404
         
+        # 虚拟分割直接根据分割方案返回，不访问章节文件
+        manifest = load_manifest(task_id)
+        if manifest is not None:
+            chapters = []
+            for entry in manifest['chapters']:
+                file_path = os.path.join(output_dir, entry['filename'])
+                chapters.append({
+                    'filename': entry['filename'],
+                    'title': entry['title'],
+                    'start_page': entry['start_page'] + 1,
+                    'end_page': entry['end_page'] + 1,
+                    'pages': entry['end_page'] - entry['start_page'] + 1,
+                    'size': f"{os.path.getsize(file_path) / 1024:.1f} KB" if os.path.exists(file_path) else None
+                })
+            return jsonify({
+                'task_id': task_id,
+                'chapters': chapters,
+                'total': len(chapters)
+            })
+        
         chapters = []
         for filename in sorted(os.listdir(output_dir)):
             if filename.endswith('.pdf'):
@@ -257,6 +870,8 @@ def too_large(e):
 
 @app.errorhandler(Exception)
 def handle_exception(e):
+    if isinstance(e, HTTPException):
+        return e
     logger.error(f"Unhandled exception: {e}")
     return jsonify({'error': '服务器内部错误'}), 500
 
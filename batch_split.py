@@ -0,0 +1,399 @@
+"""批量分割：按目录或通配符收集PDF，在进程池中并发分割，结果逐行写入可续传的JSONL清单
+
+清单每行记录一个文件的处理结果（状态、章节数、各阶段耗时等）；中断后重新运行同一命令时，
+清单中已成功且大小和修改时间未变的文件直接跳过。
+每个文件先写入输出目录旁的临时目录，全部成功后才替换输出目录，中断或失败不会在输出目录中留下不完整的文件。
+"""
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from detection_cache import DetectionCache
+from metrics import peak_rss_bytes
+from pdf_chapter_splitter import PDFChapterSplitter
+
+MANIFEST_FILENAME = 'batch_manifest.jsonl'
+
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def collect_inputs(inputs: Iterable[str], recursive: bool = False) -> List[Path]:
+    """把目录、通配符和文件路径展开为去重并排序的PDF文件列表；不存在的路径记录警告后忽略"""
+    logger = logging.getLogger(__name__)
+    found = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = path.glob('**/*' if recursive else '*')
+        elif glob.has_magic(item):
+            candidates = (Path(p) for p in glob.glob(item, recursive=True))
+        elif path.is_file():
+            candidates = [path]
+        else:
+            logger.warning(f"路径不存在，已忽略: {item}")
+            continue
+
+        found.update(p.resolve() for p in candidates if p.suffix.lower() == '.pdf' and p.is_file())
+    return sorted(found)
+
+
+class BatchManifest:
+    """追加写入的JSONL处理记录，同一文件以最后一条记录为准"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.records: Dict[str, dict] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 中断时可能留下写了一半的最后一行
+                    continue
+                if isinstance(record, dict) and 'file' in record:
+                    self.records[record['file']] = record
+
+    def is_done(self, pdf_path: Path) -> bool:
+        """该文件已成功处理，且之后没有被修改"""
+        record = self.records.get(str(pdf_path))
+        if record is None or record.get('status') != STATUS_DONE:
+            return False
+        stat = pdf_path.stat()
+        return record.get('size') == stat.st_size and record.get('mtime') == stat.st_mtime
+
+    def append(self, record: dict):
+        """写入一条记录并落盘，进程随后被中断也不会丢失"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[record['file']] = record
+
+
+class _ErrorCollector(logging.Handler):
+    """收集分割过程中记录的错误信息，写入清单"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def split_one(pdf_path: str, output_dir: Optional[str], options: dict, pages_per_section: int = 10,
+              patterns: Optional[List[str]] = None) -> dict:
+    """分割单个PDF并返回清单记录；在工作进程中运行，任何错误都记录为失败而不抛出"""
+    stat = os.stat(pdf_path)
+    record = {
+        'file': pdf_path,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'status': STATUS_FAILED,
+        'chapters': 0,
+    }
+
+    start = time.perf_counter()
+    splitter = PDFChapterSplitter(pdf_path, output_dir, **options)
+    splitter.logger.setLevel(logging.WARNING)
+    errors = _ErrorCollector()
+    splitter.logger.addHandler(errors)
+
+    # 写入临时目录（清除上次中断留下的），成功后整体替换输出目录，避免与旧文件重名而生成 _1 副本
+    final_dir = splitter.output_dir
+    staging_dir = final_dir.with_name(f"{final_dir.name}.partial")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    splitter.output_dir = staging_dir
+    try:
+        for pattern in patterns or ():
+            splitter.add_custom_pattern(pattern)
+
+        with splitter.session() as reader:
+            manifest = splitter.plan_split(pages_per_section)
+            if manifest and splitter.create_output_directory():
+                if splitter.write_manifest(reader, manifest):
+                    shutil.rmtree(final_dir, ignore_errors=True)
+                    os.replace(staging_dir, final_dir)
+                    record['status'] = STATUS_DONE
+                record['chapters'] = len(manifest)
+                record['kind'] = manifest[0]['kind']
+    except Exception as e:
+        errors.messages.append(str(e))
+    finally:
+        splitter.logger.removeHandler(errors)
+        splitter.output_dir = final_dir
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    profile = splitter.profile()
+    record.update({
+        'output': str(splitter.output_dir),
+        'pages': profile['pages'],
+        'engine': profile['detection_engine'],
+        'from_cache': profile['from_cache'],
+        'timings': {phase: round(seconds, 4) for phase, seconds in profile['phases'].items()},
+        'seconds': round(time.perf_counter() - start, 4),
+        'bytes_out': profile['bytes_out'],
+        'peak_rss_bytes': profile['peak_rss_bytes'],
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+    })
+    if record['status'] == STATUS_FAILED:
+        record['error'] = errors.messages[-1] if errors.messages else '分割失败'
+    return record
+
+
+def output_dirs(files: List[Path], output_root: Optional[str]) -> Dict[Path, Optional[str]]:
+    """每个文件的输出目录：未指定根目录时放在PDF旁边，否则放在根目录下并为同名文件加序号"""
+    if not output_root:
+        return {path: None for path in files}
+
+    dirs, used = {}, {}
+    for path in files:
+        count = used[path.stem] = used.get(path.stem, 0) + 1
+        name = f"{path.stem}_chapters" if count == 1 else f"{path.stem}_{count}_chapters"
+        dirs[path] = str(Path(output_root) / name)
+    return dirs
+
+
+class BatchSummary:
+    """汇总批量处理的文件数、页数、字节数和各阶段耗时"""
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.done = self.failed = self.skipped = 0
+        self.pages = self.bytes_in = self.bytes_out = 0
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    @property
+    def processed(self) -> int:
+        return self.done + self.failed
+
+    def add(self, record: dict):
+        if record['status'] == STATUS_DONE:
+            self.done += 1
+        else:
+            self.failed += 1
+        self.pages += record.get('pages') or 0
+        self.bytes_in += record.get('size') or 0
+        self.bytes_out += record.get('bytes_out') or 0
+        for phase, seconds in record.get('timings', {}).items():
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        phase_names = {'parse': '解析', 'validate': '验证', 'detect': '检测', 'write': '写入'}
+
+        print("\n批量处理汇总:")
+        print(f"  文件: 共 {self.total_files} 个, 成功 {self.done}, 失败 {self.failed}, 跳过 {self.skipped}")
+        print(f"  耗时: {elapsed:.2f}s")
+        if elapsed > 0 and self.processed:
+            print(f"  吞吐量: {self.processed / elapsed:.2f} 文件/秒, {self.pages / elapsed:.1f} 页/秒 "
+                  f"(共 {self.pages} 页)")
+        print(f"  输入: {self.bytes_in / 1024 / 1024:.2f} MB, 输出: {self.bytes_out / 1024 / 1024:.2f} MB")
+        if self.phases:
+            # 各文件的阶段耗时之和，并发时可能大于总耗时
+            print("  阶段累计: " + ', '.join(f"{phase_names.get(phase, phase)} {seconds:.2f}s"
+                                          for phase, seconds in self.phases.items()))
+        rss = peak_rss_bytes()
+        if rss is not None:
+            print(f"  主进程内存峰值: {rss / 1024 / 1024:.1f} MB")
+
+
+def run_batch(files: List[Path], manifest: BatchManifest, output_root: Optional[str], options: dict,
+              jobs: int = 1, pages_per_section: int = 10, patterns: Optional[List[str]] = None,
+              tasks_per_worker: Optional[int] = None, progress=print) -> BatchSummary:
+    """并发分割文件列表，每完成一个文件即追加清单记录
+
+    同时提交的任务数不超过工作进程数，等待中的文件不会占用内存；
+    指定 tasks_per_worker 时工作进程处理这么多文件后退出并由新进程替换，回收PyPDF2累积的内存。
+    """
+    summary = BatchSummary(len(files))
+    pending = []
+    for path in files:
+        if manifest.is_done(path):
+            summary.skipped += 1
+        else:
+            pending.append(path)
+    if summary.skipped:
+        progress(f"清单中已完成 {summary.skipped} 个文件，跳过")
+
+    dirs = output_dirs(files, output_root)
+
+    def finish(record: dict):
+        manifest.append(record)
+        summary.add(record)
+        if record['status'] == STATUS_DONE:
+            detail = f"{record['chapters']} 个{'章节' if record.get('kind') == 'chapter' else '部分'}"
+        else:
+            detail = f"失败: {record['error']}"
+        progress(f"[{summary.processed}/{len(pending)}] {Path(record['file']).name}: {detail}, {record['seconds']:.2f}s")
+
+    if jobs <= 1 or len(pending) <= 1:
+        for path in pending:
+            finish(split_one(str(path), dirs[path], options, pages_per_section, patterns))
+        return summary
+
+    pool_options = {'max_workers': min(jobs, len(pending))}
+    if tasks_per_worker:
+        # max_tasks_per_child 不支持 fork 启动方式
+        pool_options.update(max_tasks_per_child=tasks_per_worker, mp_context=multiprocessing.get_context('spawn'))
+
+    queue = iter(pending)
+    executor = ProcessPoolExecutor(**pool_options)
+    try:
+        running = {}
+
+        def submit_next() -> bool:
+            path = next(queue, None)
+            if path is None:
+                return False
+            future = executor.submit(split_one, str(path), dirs[path], options, pages_per_section, patterns)
+            running[future] = path
+            return True
+
+        for _ in range(pool_options['max_workers']):
+            submit_next()
+
+        while running:
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                path = running.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # 工作进程异常退出（如被系统因内存不足杀死）
+                    stat = path.stat()
+                    record = {'file': str(path), 'size': stat.st_size, 'mtime': stat.st_mtime,
+                              'status': STATUS_FAILED, 'chapters': 0, 'seconds': 0.0,
+                              'error': f"工作进程出错: {e}",
+                              'finished_at': datetime.now().isoformat(timespec='seconds')}
+                finish(record)
+                submit_next()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='批量PDF章节分割工具',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例用法:
+  python batch_split.py books/ -o chapters -j 4                   # 用4个进程分割目录下的全部PDF
+  python batch_split.py "scans/**/*.pdf" -o chapters -j 8        # 使用通配符（需加引号）
+  python batch_split.py books/ -r -o chapters --low-memory       # 递归子目录，每个进程使用低内存模式
+  python batch_split.py books/ -o chapters --manifest run.jsonl  # 指定清单文件，中断后重新运行会跳过已完成的文件
+        """
+    )
+
+    parser.add_argument('inputs', nargs='+', help='PDF文件、目录或通配符')
+    parser.add_argument('-o', '--output', help='输出根目录，每个PDF输出到其中的 文件名_chapters 目录（默认在PDF旁边）',
+                        default=None)
+    parser.add_argument('-j', '--jobs', type=int, help='并发处理的文件数（默认1）', default=1)
+    parser.add_argument('-r', '--recursive', action='store_true', help='递归处理目录下的子目录')
+    parser.add_argument('--manifest', help=f'处理记录清单路径（默认为输出根目录或当前目录下的 {MANIFEST_FILENAME}）',
+                        default=None)
+    parser.add_argument('--tasks-per-worker', type=int, help='每个工作进程处理多少个文件后重启以回收内存（默认不重启）',
+                        default=None)
+    parser.add_argument('-p', '--pages', type=int, help='未找到章节时每节的页数（默认10页）', default=10)
+    parser.add_argument('--pattern', help='添加自定义章节匹配模式（正则表达式）', action='append')
+    parser.add_argument('--no-outline', action='store_true', help='不使用PDF书签，始终扫描全文检测章节')
+    parser.add_argument('--outline-depth', type=int, help='使用书签检测章节时的最大层级（默认1，仅顶层）', default=1)
+    parser.add_argument('--header-only', action='store_true', help='只提取页面顶部区域的文本检测章节')
+    parser.add_argument('--prefilter', action='store_true', help='先按内容流中的字号和字面文字预筛选，只完整提取候选页')
+    parser.add_argument('--optimize', action='store_true', help='写入前删除未使用的资源并合并相同对象')
+    parser.add_argument('--write-engine', choices=PDFChapterSplitter.WRITE_ENGINES, default='standard',
+                        help='写入方式：standard 由PyPDF2重新序列化页面，raw 直接复制原始对象字节')
+    parser.add_argument('--no-cache', action='store_true', help='不读取也不保存章节检测结果缓存')
+    parser.add_argument('--cache-dir', help='检测结果缓存目录（默认 ~/.cache/pdf-chapter-splitter）', default=None)
+    parser.add_argument('--low-memory', action='store_true', help='每个文件都使用低内存模式')
+    parser.add_argument('--memory-limit', type=int, help='每个工作进程的内存上限（MB），指定后自动启用低内存模式',
+                        default=None)
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示详细输出')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format='%(levelname)s: %(message)s')
+
+    if args.jobs <= 0:
+        print("错误: 并发数必须大于0")
+        sys.exit(1)
+
+    if args.pages <= 0:
+        print("错误: 页数必须大于0")
+        sys.exit(1)
+
+    if args.outline_depth <= 0:
+        print("错误: 书签层级必须大于0")
+        sys.exit(1)
+
+    if args.tasks_per_worker is not None and args.tasks_per_worker <= 0:
+        print("错误: 每个进程处理的文件数必须大于0")
+        sys.exit(1)
+
+    if args.memory_limit is not None and args.memory_limit <= 0:
+        print("错误: 内存上限必须大于0")
+        sys.exit(1)
+
+    for pattern in args.pattern or ():
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            print(f"错误: 无效的正则表达式模式 '{pattern}': {e}")
+            sys.exit(1)
+
+    files = collect_inputs(args.inputs, args.recursive)
+    if not files:
+        print("错误: 没有找到PDF文件")
+        sys.exit(1)
+
+    manifest_path = args.manifest or os.path.join(args.output or '.', MANIFEST_FILENAME)
+    manifest = BatchManifest(manifest_path)
+    options = {
+        'use_outline': not args.no_outline,
+        'outline_depth': args.outline_depth,
+        'header_only': args.header_only,
+        'prefilter': args.prefilter,
+        'optimize_output': args.optimize,
+        'write_engine': args.write_engine,
+        'use_cache': not args.no_cache,
+        'cache_dir': args.cache_dir or DetectionCache.default_dir(),
+        'low_memory': args.low_memory,
+        'memory_limit_mb': args.memory_limit,
+    }
+
+    print(f"找到 {len(files)} 个PDF文件，清单: {manifest.path}")
+    try:
+        summary = run_batch(files, manifest, args.output, options, jobs=args.jobs, pages_per_section=args.pages,
+                            patterns=args.pattern, tasks_per_worker=args.tasks_per_worker)
+    except KeyboardInterrupt:
+        print("\n用户中断操作，已完成的文件记录在清单中，重新运行将跳过这些文件")
+        sys.exit(1)
+
+    summary.report()
+    if summary.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
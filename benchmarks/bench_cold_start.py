@@ -0,0 +1,153 @@
+"""冷启动基准：在全新的Python进程中测量导入Web应用的耗时，以及各类路由第一次请求的延迟
+
+每次测量都启动新进程并在临时工作目录中运行，分别测试延迟初始化（LAZY_INIT=1）和启动时初始化（LAZY_INIT=0），
+取各项的中位数；同时记录不处理PDF的请求之后PyPDF2是否已被加载。
+指定 --baseline 时与保存的结果比较，任一指标变慢超过阈值即以非0状态退出。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from synthetic_corpus import generate_pdf
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULT_VERSION = 1
+
+# 在子进程中执行：依次导入应用、请求首页、预览、上传分割并等待任务完成
+_CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+from app import app, job_queue
+result = {'import': time.perf_counter() - start, 'pdf_loaded_after_import': 'PyPDF2' in sys.modules}
+client = app.test_client()
+
+def timed(name, method, *args, **kwargs):
+    start = time.perf_counter()
+    response = getattr(client, method)(*args, **kwargs)
+    result[name] = time.perf_counter() - start
+    return response
+
+timed('index', 'get', '/')
+timed('preview', 'get', '/preview/missing')
+result['pdf_loaded_after_light'] = 'PyPDF2' in sys.modules
+
+start = time.perf_counter()
+with open(sys.argv[1], 'rb') as f:
+    response = client.post('/upload', data={'file': (f, 'cold.pdf')}, content_type='multipart/form-data')
+task_id = response.get_json()['task_id']
+while job_queue.get(task_id)['status'] not in ('done', 'failed'):
+    time.sleep(0.005)
+result['split'] = time.perf_counter() - start
+result['split_status'] = job_queue.get(task_id)['status']
+print(json.dumps(result))
+'''
+
+METRICS = ('import', 'index', 'preview', 'split')
+
+
+def run_child(pdf_path: str, lazy: bool, vercel: bool) -> dict:
+    env = dict(os.environ, LAZY_INIT='1' if lazy else '0', PYTHONPATH=ROOT)
+    env.pop('VERCEL', None)
+    if vercel:
+        env['VERCEL'] = '1'
+    with tempfile.TemporaryDirectory() as work_dir:
+        output = subprocess.run([sys.executable, '-c', _CHILD, pdf_path], cwd=work_dir, env=env,
+                                capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_mode(pdf_path: str, lazy: bool, vercel: bool, repeat: int) -> dict:
+    runs = [run_child(pdf_path, lazy, vercel) for _ in range(repeat)]
+    summary = {name: round(statistics.median(run[name] for run in runs), 6) for name in METRICS}
+    summary['first_request'] = round(statistics.median(run['import'] + run['index'] for run in runs), 6)
+    summary['pdf_loaded_after_import'] = any(run['pdf_loaded_after_import'] for run in runs)
+    summary['pdf_loaded_after_light'] = any(run['pdf_loaded_after_light'] for run in runs)
+    summary['split_failed'] = sum(run['split_status'] != 'done' for run in runs)
+    return summary
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_seconds: float) -> list:
+    """返回变慢超过阈值的 (模式, 指标, 基准耗时, 当前耗时)"""
+    regressions = []
+    for mode, metrics in current['modes'].items():
+        for name in METRICS + ('first_request',):
+            before = baseline.get('modes', {}).get(mode, {}).get(name)
+            after = metrics[name]
+            if before is None or max(before, after) < min_seconds:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append((mode, name, before, after))
+    return regressions
+
+
+def print_results(results: dict):
+    print(f"{'模式':<8}{'导入':>9}{'首页':>9}{'预览':>9}{'首个请求':>11}{'上传分割':>11}  导入后/轻量请求后已加载PyPDF2")
+    for mode, m in results['modes'].items():
+        print(f"{mode:<8}{m['import'] * 1000:>7.0f}ms{m['index'] * 1000:>7.1f}ms{m['preview'] * 1000:>7.1f}ms"
+              f"{m['first_request'] * 1000:>9.0f}ms{m['split'] * 1000:>9.0f}ms  "
+              f"{'是' if m['pdf_loaded_after_import'] else '否'}/{'是' if m['pdf_loaded_after_light'] else '否'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Web应用冷启动基准',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+示例:
+  python benchmarks/bench_cold_start.py --repeat 10 -o cold_start.json
+  python benchmarks/bench_cold_start.py --vercel --baseline cold_start.json
+        '''
+    )
+    parser.add_argument('--repeat', type=int, default=5, help='每种模式启动的进程数，取中位数（默认5）')
+    parser.add_argument('--pages', type=int, default=20, help='上传测试使用的合成PDF页数（默认20）')
+    parser.add_argument('--vercel', action='store_true', help='模拟Vercel环境（同步执行任务；文件和检测缓存保存在/tmp，重复运行时检测缓存会命中）')
+    parser.add_argument('--output', '-o', help='结果JSON文件路径')
+    parser.add_argument('--baseline', help='与之比较的基准结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定为退化的变慢比例（默认0.2，即20%%）')
+    parser.add_argument('--min-seconds', type=float, default=0.005, help='耗时低于该值的指标不参与比较（默认0.005）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        pdf_path = os.path.join(corpus_dir, 'cold.pdf')
+        generate_pdf(pdf_path, max(10, args.pages), 'en_chapter')
+        modes = {}
+        for name, lazy in (('lazy', True), ('eager', False)):
+            print(f"运行 {name} ...", file=sys.stderr)
+            modes[name] = bench_mode(pdf_path, lazy, args.vercel, max(1, args.repeat))
+
+    results = {
+        'version': RESULT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'vercel': args.vercel,
+        'repeat': args.repeat,
+        'modes': modes,
+    }
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\n{len(regressions)} 项冷启动指标变慢超过 {args.threshold:.0%}:")
+            for mode, name, before, after in regressions:
+                print(f"  {mode} {name}: {before * 1000:.1f}ms -> {after * 1000:.1f}ms")
+            sys.exit(1)
+        print("\n未发现冷启动退化")
+
+
+if __name__ == '__main__':
+    main()
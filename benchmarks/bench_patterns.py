@@ -0,0 +1,76 @@
+"""章节模式匹配微基准：比较逐个 re.match 与组合匹配器在 6 个和 50 个模式下的行/秒"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pdf_chapter_splitter import ChapterPatternMatcher, PDFChapterSplitter
+
+
+def build_lines(count: int, seed: int = 42) -> list:
+    """生成以正文为主、夹杂少量章节标题的测试行"""
+    rng = random.Random(seed)
+    headings = ['第三章 总论', 'Chapter 12 Results', '4. Methods', '第2节 背景', 'Section 7', '第一部分 基础']
+    words = ['the', 'data', 'model', '数据', '分析', 'result', 'page', '方法', 'value', 'system']
+    lines = []
+    for _ in range(count):
+        if rng.random() < 0.02:
+            lines.append(rng.choice(headings))
+        else:
+            lines.append(' '.join(rng.choice(words) for _ in range(rng.randint(3, 12))))
+    return lines
+
+
+def build_patterns(total: int) -> list:
+    """内置模式加上若干自定义模式，凑足指定数量"""
+    patterns = list(PDFChapterSplitter('benchmark.pdf').chapter_patterns)
+    for i in range(total - len(patterns)):
+        patterns.append(rf'^附录{i}\s*\S*' if i % 2 else rf'^Appendix\s+{i}\b')
+    return patterns
+
+
+def legacy_match(patterns: list, line: str):
+    for index, pattern in enumerate(patterns):
+        if re.match(pattern, line, re.IGNORECASE):
+            return index
+    return None
+
+
+def bench(label: str, func, lines: list, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - start)
+    rate = len(lines) / best
+    print(f"  {label}: {rate:,.0f} 行/秒")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='章节模式匹配微基准')
+    parser.add_argument('--lines', type=int, default=100000, help='测试行数（默认100000）')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最快一次（默认3）')
+    args = parser.parse_args()
+    
+    lines = build_lines(args.lines)
+    for total in (6, 50):
+        patterns = build_patterns(total)
+        matcher = ChapterPatternMatcher(patterns)
+        
+        # 两种实现的匹配结果必须一致
+        assert all(legacy_match(patterns, line) == matcher.match(line) for line in lines[:5000])
+        
+        print(f"{total} 个模式:")
+        legacy = bench('re.match', lambda line: legacy_match(patterns, line), lines, args.repeat)
+        engine = bench('组合匹配器', matcher.match, lines, args.repeat)
+        print(f"  加速比: {engine / legacy:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""分割流程基准：在合成PDF上分别计时解析、验证、检测、写入各阶段并记录内存峰值
+
+结果写入JSON；指定 --baseline 时与保存的基准结果比较，任一阶段变慢超过阈值即以非0状态退出。
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import PyPDF2
+from pdf_chapter_splitter import PDFChapterSplitter
+from synthetic_corpus import HEADING_FAMILIES, MAX_PAGES, MIN_PAGES, generate_pdf
+
+RESULT_VERSION = 1
+PHASES = ('parse', 'validate', 'detect', 'write', 'split_evenly')
+
+
+@contextmanager
+def phase(timings: dict, peaks: dict, name: str):
+    """计时一个阶段；tracemalloc 已启动时同时记录该阶段的内存峰值"""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+        if tracing:
+            peaks[name] = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+
+
+def run_once(pdf_path: str, options: dict) -> dict:
+    """完整执行一次分割流程，返回各阶段耗时、内存峰值和检测结果"""
+    timings, peaks = {}, {}
+    with tempfile.TemporaryDirectory() as work_dir, ExitStack() as stack:
+        splitter = PDFChapterSplitter(pdf_path, os.path.join(work_dir, 'chapters'), use_cache=False, **options)
+
+        with phase(timings, peaks, 'parse'):
+            reader = stack.enter_context(splitter.session())
+            len(reader.pages)
+
+        with phase(timings, peaks, 'validate'):
+            if not splitter.validate_pdf():
+                raise RuntimeError(f"PDF验证失败: {pdf_path}")
+
+        with phase(timings, peaks, 'detect'):
+            chapter_breaks = splitter.find_chapter_breaks()
+
+        with phase(timings, peaks, 'write'):
+            if len(chapter_breaks) >= 2:
+                manifest = splitter._plan_chapters(reader, chapter_breaks)
+            else:
+                manifest = splitter._plan_sections(reader, 10)
+            splitter.create_output_directory()
+            if not splitter.write_manifest(reader, manifest):
+                raise RuntimeError(f"写入章节失败: {pdf_path}")
+            bytes_out = sum(f.stat().st_size for f in splitter.output_dir.iterdir())
+
+        with phase(timings, peaks, 'split_evenly'):
+            splitter.output_dir = Path(work_dir) / 'sections'
+            splitter.create_output_directory()
+            if not splitter.split_pdf_evenly():
+                raise RuntimeError(f"均匀分割失败: {pdf_path}")
+
+    return {
+        'timings': timings,
+        'peaks': peaks,
+        'chapters_found': len(chapter_breaks),
+        'engine': splitter.detection_engine,
+        'files_written': len(manifest),
+        'bytes_out': bytes_out,
+    }
+
+
+def bench_case(pdf_path: str, spec: dict, options: dict, repeat: int, measure_memory: bool) -> dict:
+    """重复运行取各阶段最快耗时；内存峰值在单独一次运行中测量，避免 tracemalloc 影响计时"""
+    best = {}
+    for _ in range(repeat):
+        run = run_once(pdf_path, options)
+        for name, seconds in run['timings'].items():
+            best[name] = min(best.get(name, float('inf')), seconds)
+
+    peaks = {}
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            peaks = run_once(pdf_path, options)['peaks']
+        finally:
+            tracemalloc.stop()
+
+    total = sum(best.values())
+    return {
+        'family': spec['family'],
+        'pages': spec['pages'],
+        'size': spec['size'],
+        'chapters_expected': len(spec['chapters']),
+        'chapters_found': run['chapters_found'],
+        'engine': run['engine'],
+        'files_written': run['files_written'],
+        'bytes_out': run['bytes_out'],
+        'phases': {
+            name: {'seconds': round(best[name], 6), 'peak_kb': round(peaks[name] / 1024, 1) if name in peaks else None}
+            for name in PHASES
+        },
+        'total_seconds': round(total, 6),
+        'pages_per_second': round(spec['pages'] / total, 1) if total else None,
+    }
+
+
+def max_rss_kb():
+    """进程的最大常驻内存（KB），平台不支持时返回None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以KB为单位
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_seconds: float) -> list:
+    """返回比基准变慢超过 threshold 的 (用例, 阶段, 基准秒数, 当前秒数)；耗时低于 min_seconds 的阶段视为噪声"""
+    regressions = []
+    for case, result in current['cases'].items():
+        base = baseline.get('cases', {}).get(case)
+        if base is None:
+            continue
+        for name, stats in result['phases'].items():
+            base_seconds = base['phases'].get(name, {}).get('seconds')
+            if base_seconds is None or max(base_seconds, stats['seconds']) < min_seconds:
+                continue
+            if stats['seconds'] > base_seconds * (1 + threshold):
+                regressions.append((case, name, base_seconds, stats['seconds']))
+    return regressions
+
+
+def print_results(results: dict):
+    header = f"{'用例':<22}" + ''.join(f"{name:>13}" for name in PHASES) + f"{'页/秒':>10}{'章节':>8}"
+    print(header)
+    for case, result in results['cases'].items():
+        row = f"{case:<22}" + ''.join(f"{result['phases'][name]['seconds'] * 1000:>11.1f}ms" for name in PHASES)
+        row += f"{result['pages_per_second'] or 0:>10.0f}{result['chapters_found']:>5}/{result['chapters_expected']:<3}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='PDF分割流程基准测试',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+示例:
+  python benchmarks/bench_splitter.py --pages 10 100 1000 --output baseline.json
+  python benchmarks/bench_splitter.py --output current.json --baseline baseline.json --threshold 0.2
+  python benchmarks/bench_splitter.py --families zh_chapter --pages 5000 --images 2 --header-only
+        '''
+    )
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000],
+                        help=f'页数，可指定多个（{MIN_PAGES}-{MAX_PAGES}，默认 10 100 1000）')
+    parser.add_argument('--families', nargs='+', choices=sorted(HEADING_FAMILIES), default=sorted(HEADING_FAMILIES),
+                        help='标题格式（默认全部）')
+    parser.add_argument('--pages-per-chapter', type=int, default=10, help='每章页数（默认10）')
+    parser.add_argument('--lines', type=int, default=30, help='每页正文行数（默认30）')
+    parser.add_argument('--images', type=int, default=0, help='每页嵌入图片数（默认0）')
+    parser.add_argument('--image-kb', type=int, default=16, help='每张图片的大小KB（默认16）')
+    parser.add_argument('--outline', action='store_true', help='合成PDF带章节书签')
+    parser.add_argument('--corpus-dir', help='合成PDF的存放目录，已存在的文件直接复用（默认临时目录）')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，各阶段取最快一次（默认3）')
+    parser.add_argument('--no-memory', action='store_true', help='不测量各阶段内存峰值')
+    parser.add_argument('--workers', type=int, default=1, help='检测阶段的进程数')
+    parser.add_argument('--write-workers', type=int, default=1, help='写入阶段的进程数')
+    parser.add_argument('--header-only', action='store_true', help='只扫描页面顶部文本')
+    parser.add_argument('--prefilter', action='store_true', help='检测前先按内容流预筛选候选页')
+    parser.add_argument('--optimize', action='store_true', help='写入时优化输出文件')
+    parser.add_argument('--write-engine', choices=PDFChapterSplitter.WRITE_ENGINES, default='standard',
+                        help='写入方式（默认standard）')
+    parser.add_argument('--output', '-o', help='结果JSON文件路径')
+    parser.add_argument('--baseline', help='与之比较的基准结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定为退化的变慢比例（默认0.2，即20%%）')
+    parser.add_argument('--min-seconds', type=float, default=0.005, help='耗时低于该值的阶段不参与比较（默认0.005）')
+    args = parser.parse_args()
+
+    for pages in args.pages:
+        if not MIN_PAGES <= pages <= MAX_PAGES:
+            parser.error(f"页数必须在 {MIN_PAGES}-{MAX_PAGES} 之间: {pages}")
+
+    logging.getLogger('pdf_chapter_splitter').setLevel(logging.WARNING)
+    options = {
+        'workers': args.workers,
+        'write_workers': args.write_workers,
+        'header_only': args.header_only,
+        'prefilter': args.prefilter,
+        'optimize_output': args.optimize,
+        'write_engine': args.write_engine,
+    }
+
+    with ExitStack() as stack:
+        corpus_dir = args.corpus_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(corpus_dir, exist_ok=True)
+
+        cases = {}
+        for family in args.families:
+            for pages in args.pages:
+                case = f"{family}-{pages}p"
+                name = f"{case}-{args.lines}l-{args.images}i{args.image_kb}k{'-outline' if args.outline else ''}.pdf"
+                pdf_path = os.path.join(corpus_dir, name)
+                if os.path.exists(pdf_path):
+                    spec = {'family': family, 'pages': pages, 'size': os.path.getsize(pdf_path),
+                            'chapters': list(range(0, pages, max(1, args.pages_per_chapter)))}
+                else:
+                    spec = generate_pdf(pdf_path, pages, family, args.pages_per_chapter, args.lines, args.images,
+                                        args.image_kb, args.outline)
+                print(f"运行 {case} ...", file=sys.stderr)
+                cases[case] = bench_case(pdf_path, spec, options, max(1, args.repeat), not args.no_memory)
+
+    results = {
+        'version': RESULT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pypdf2': PyPDF2.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'corpus': {
+            'pages_per_chapter': args.pages_per_chapter,
+            'lines_per_page': args.lines,
+            'images_per_page': args.images,
+            'image_kb': args.image_kb,
+            'outline': args.outline,
+        },
+        'options': options,
+        'repeat': args.repeat,
+        'cases': cases,
+        'max_rss_kb': max_rss_kb(),
+    }
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\n发现 {len(regressions)} 处性能退化（阈值 {args.threshold:.0%}）:")
+            for case, name, base_seconds, seconds in regressions:
+                print(f"  {case} {name}: {base_seconds * 1000:.1f}ms -> {seconds * 1000:.1f}ms "
+                      f"(+{(seconds - base_seconds) / base_seconds:.0%})")
+            sys.exit(1)
+        print(f"\n与基准相比没有超过 {args.threshold:.0%} 的退化")
+
+
+if __name__ == '__main__':
+    main()
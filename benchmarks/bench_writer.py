@@ -0,0 +1,183 @@
+"""写入方式对比：在图片较多的合成PDF（或指定的真实PDF）上分别用 standard 和 raw 写入章节与均匀分割的文件
+
+每种写入方式重复运行取最快一次，报告耗时、吞吐量和输出大小；
+同时用PyPDF2读回两种方式的输出，核对每个文件的页数和页面文本是否一致。
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import PyPDF2
+from pdf_chapter_splitter import PDFChapterSplitter
+from synthetic_corpus import MAX_PAGES, MIN_PAGES, generate_pdf
+
+
+def write_once(pdf_path: str, output_dir: str, engine: str, pages_per_section: int) -> dict:
+    """按章节和按固定页数各写一遍，返回两部分的耗时和输出字节数"""
+    splitter = PDFChapterSplitter(pdf_path, os.path.join(output_dir, 'chapters'), use_cache=False,
+                                  write_engine=engine)
+    with splitter.session() as reader:
+        chapter_breaks = splitter.find_chapter_breaks()
+        if len(chapter_breaks) >= 2:
+            manifest = splitter._plan_chapters(reader, chapter_breaks)
+        else:
+            manifest = splitter._plan_sections(reader, pages_per_section)
+        splitter.create_output_directory()
+
+        start = time.perf_counter()
+        if not splitter.write_manifest(reader, manifest):
+            raise RuntimeError(f"写入章节失败: {pdf_path}")
+        chapters_seconds = time.perf_counter() - start
+
+        splitter.output_dir = Path(output_dir) / 'sections'
+        splitter.create_output_directory()
+        start = time.perf_counter()
+        if not splitter.split_pdf_evenly(pages_per_section):
+            raise RuntimeError(f"均匀分割失败: {pdf_path}")
+        sections_seconds = time.perf_counter() - start
+
+    return {
+        'engine': splitter.write_engine,  # raw 失败回退时为 standard
+        'chapters_seconds': chapters_seconds,
+        'sections_seconds': sections_seconds,
+        'bytes_out': sum(f.stat().st_size for f in Path(output_dir).rglob('*.pdf')),
+    }
+
+
+def read_back(output_dir: str) -> dict:
+    """读回输出目录中的每个文件，返回 {相对路径: (页数, 每页文本)}"""
+    contents = {}
+    for path in sorted(Path(output_dir).rglob('*.pdf')):
+        reader = PyPDF2.PdfReader(str(path))
+        contents[str(path.relative_to(output_dir))] = (
+            len(reader.pages), [page.extract_text() for page in reader.pages])
+    return contents
+
+
+def compare_outputs(standard: dict, raw: dict) -> list:
+    """返回两种写入方式输出不一致的文件"""
+    mismatched = sorted(set(standard) ^ set(raw))
+    mismatched += [name for name in sorted(set(standard) & set(raw)) if standard[name] != raw[name]]
+    return mismatched
+
+
+def bench_pdf(pdf_path: str, repeat: int, pages_per_section: int) -> dict:
+    size = os.path.getsize(pdf_path)
+    results, contents = {}, {}
+    for engine in PDFChapterSplitter.WRITE_ENGINES:
+        best = None
+        for attempt in range(repeat):
+            with tempfile.TemporaryDirectory() as output_dir:
+                run = write_once(pdf_path, output_dir, engine, pages_per_section)
+                if attempt == 0:
+                    contents[engine] = read_back(output_dir)
+            if best is None or run['chapters_seconds'] + run['sections_seconds'] < best['seconds']:
+                best = dict(run, seconds=run['chapters_seconds'] + run['sections_seconds'])
+
+        results[engine] = {
+            'engine_used': best['engine'],
+            'chapters_seconds': round(best['chapters_seconds'], 4),
+            'sections_seconds': round(best['sections_seconds'], 4),
+            'seconds': round(best['seconds'], 4),
+            # 两次写入各复制一遍全部页面
+            'mb_per_second': round(2 * size / best['seconds'] / 1024 / 1024, 1) if best['seconds'] else None,
+            'bytes_out': best['bytes_out'],
+        }
+
+    standard, raw = results['standard'], results['raw']
+    mismatched = compare_outputs(contents['standard'], contents['raw'])
+    return {
+        'size': size,
+        'engines': results,
+        'speedup': round(standard['seconds'] / raw['seconds'], 2) if raw['seconds'] else None,
+        'files': len(contents['standard']),
+        'mismatched': mismatched,
+    }
+
+
+def print_results(cases: dict):
+    print(f"{'用例':<28}{'大小MB':>8}{'standard':>10}{'raw':>10}{'加速':>7}"
+          f"{'standard MB/s':>15}{'raw MB/s':>10}{'输出比':>8}{'一致':>6}")
+    for case, result in cases.items():
+        standard, raw = result['engines']['standard'], result['engines']['raw']
+        ratio = raw['bytes_out'] / standard['bytes_out'] if standard['bytes_out'] else 0
+        print(f"{case:<28}{result['size'] / 1024 / 1024:>8.1f}{standard['seconds'] * 1000:>8.0f}ms"
+              f"{raw['seconds'] * 1000:>8.0f}ms{result['speedup'] or 0:>6.1f}x"
+              f"{standard['mb_per_second'] or 0:>15.1f}{raw['mb_per_second'] or 0:>10.1f}{ratio:>8.2f}"
+              f"{'否' if result['mismatched'] else '是':>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='standard 与 raw 写入方式的性能对比',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+示例:
+  python benchmarks/bench_writer.py --pages 200 --images 4 --image-kb 64
+  python benchmarks/bench_writer.py --images 0 1 8 --repeat 5
+  python benchmarks/bench_writer.py --pdf scan1.pdf scan2.pdf --no-synthetic
+        '''
+    )
+    parser.add_argument('--pages', type=int, nargs='+', default=[200], help=f'合成PDF的页数（{MIN_PAGES}-{MAX_PAGES}，默认200）')
+    parser.add_argument('--images', type=int, nargs='+', default=[0, 4], help='每页嵌入图片数，可指定多个（默认 0 4）')
+    parser.add_argument('--image-kb', type=int, default=64, help='每张图片的大小KB（默认64）')
+    parser.add_argument('--lines', type=int, default=30, help='每页正文行数（默认30）')
+    parser.add_argument('--pages-per-section', type=int, default=10, help='均匀分割时每份的页数（默认10）')
+    parser.add_argument('--pdf', nargs='+', default=[], help='同时测试的真实PDF')
+    parser.add_argument('--no-synthetic', action='store_true', help='不生成合成PDF，只测试 --pdf 指定的文件')
+    parser.add_argument('--corpus-dir', help='合成PDF的存放目录，已存在的文件直接复用（默认临时目录）')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最快一次（默认3）')
+    parser.add_argument('--output', '-o', help='结果JSON文件路径')
+    args = parser.parse_args()
+
+    for pages in args.pages:
+        if not MIN_PAGES <= pages <= MAX_PAGES:
+            parser.error(f"页数必须在 {MIN_PAGES}-{MAX_PAGES} 之间: {pages}")
+
+    logging.getLogger('pdf_chapter_splitter').setLevel(logging.WARNING)
+
+    cases = {}
+    with ExitStack() as stack:
+        corpus_dir = args.corpus_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(corpus_dir, exist_ok=True)
+
+        pdf_paths = {}
+        if not args.no_synthetic:
+            for pages in args.pages:
+                for images in args.images:
+                    case = f"{pages}p-{images}i{args.image_kb}k"
+                    pdf_path = os.path.join(corpus_dir, f"en_chapter-{pages}p-{args.lines}l-{images}i{args.image_kb}k.pdf")
+                    if not os.path.exists(pdf_path):
+                        generate_pdf(pdf_path, pages, 'en_chapter', lines_per_page=args.lines,
+                                     images_per_page=images, image_kb=args.image_kb)
+                    pdf_paths[case] = pdf_path
+        for pdf_path in args.pdf:
+            pdf_paths[os.path.basename(pdf_path)] = pdf_path
+
+        for case, pdf_path in pdf_paths.items():
+            print(f"运行 {case} ...", file=sys.stderr)
+            cases[case] = bench_pdf(pdf_path, max(1, args.repeat), args.pages_per_section)
+
+    print_results(cases)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'pypdf2': PyPDF2.__version__, 'cases': cases}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+    mismatched = {case: result['mismatched'] for case, result in cases.items() if result['mismatched']}
+    if mismatched:
+        for case, files in mismatched.items():
+            print(f"\n{case}: {len(files)} 个文件的输出不一致: {', '.join(files[:5])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,595 @@
+"""Web服务负载测试：在本地启动应用（gunicorn或Flask开发服务器），按指定并发和请求比例持续发送请求
+
+请求包括上传合成PDF（多种页数）、预览章节、打包下载和下载单个章节；预览和下载只针对已分割完成的任务，
+压测前先上传每种大小的PDF各一份作为初始任务，压测中上传的任务完成后也加入其中。
+报告每个路由的吞吐量、p50/p95/p99延迟和错误率，上传到分割完成的耗时，以及服务进程（含全部worker）常驻内存随时间的变化。
+指定 --baseline 时与保存的结果比较，吞吐量下降或p95延迟上升超过阈值即以非0状态退出。
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from synthetic_corpus import MAX_PAGES, MIN_PAGES, generate_pdf
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULT_VERSION = 1
+ROUTES = ('upload', 'preview', 'download_zip', 'download_file')
+DEFAULT_MIX = 'upload=1,preview=4,download_zip=1,download_file=4'
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def parse_mix(value: str) -> dict:
+    """解析 "upload=1,preview=4" 形式的请求比例"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ROUTES:
+            raise argparse.ArgumentTypeError(f"未知路由: {name}（可选: {', '.join(ROUTES)}）")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"比例必须是数字: {item}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError('至少一个路由的比例需大于0')
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind: str, port: int, workers: int, threads: int, work_dir: str, env: dict) -> subprocess.Popen:
+    """在临时工作目录中启动服务，上传和输出目录都在其中；WEB_CONCURRENCY 与worker数一致，准入预算按它分摊"""
+    env = dict(env, WEB_CONCURRENCY=str(workers if kind == 'gunicorn' else 1))
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+                   '--worker-class', 'gthread', '--threads', str(threads), '--timeout', '300', 'wsgi:app']
+    else:
+        command = [sys.executable, '-c',
+                   f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    return subprocess.Popen(command, cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(host: str, port: int, process: subprocess.Popen = None, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"服务进程已退出，退出码 {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"服务在 {timeout:.0f} 秒内未就绪")
+
+
+def process_tree(pid: int) -> list:
+    """pid 及其全部子孙进程，读取 /proc，其他平台只返回 pid 本身"""
+    if not os.path.isdir('/proc'):
+        return [pid]
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                # 进程名可能含空格和括号，从最后一个右括号之后解析
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def rss_bytes(pid: int):
+    try:
+        with open(f'/proc/{pid}/statm', 'rb') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class RssSampler(threading.Thread):
+    """定时记录服务进程树中每个进程的常驻内存"""
+
+    def __init__(self, pid: int, interval: float, started: float, stats: 'RouteStats'):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.started = started
+        self.stats = stats
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while True:
+            per_process = {}
+            for pid in process_tree(self.pid):
+                rss = rss_bytes(pid)
+                if rss is not None:
+                    per_process[str(pid)] = rss
+            if per_process:
+                self.samples.append({
+                    'elapsed': round(time.monotonic() - self.started, 2),
+                    'requests': self.stats.total(),
+                    'total_rss': sum(per_process.values()),
+                    'processes': per_process,
+                })
+            if self.stopped.wait(self.interval):
+                return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class RouteStats:
+    """线程安全地记录每个路由的延迟、状态码和响应字节数"""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float, status, size: int = 0):
+        with self._lock:
+            entry = self._routes.setdefault(route, {'latencies': [], 'statuses': {}, 'bytes': 0})
+            entry['latencies'].append(seconds)
+            key = str(status)
+            entry['statuses'][key] = entry['statuses'].get(key, 0) + 1
+            entry['bytes'] += size
+
+    def total(self) -> int:
+        with self._lock:
+            return sum(len(entry['latencies']) for entry in self._routes.values())
+
+    def summary(self, duration: float) -> dict:
+        with self._lock:
+            routes = {name: dict(entry, latencies=list(entry['latencies'])) for name, entry in self._routes.items()}
+        result = {}
+        for name, entry in sorted(routes.items()):
+            latencies = sorted(entry['latencies'])
+            errors = sum(count for status, count in entry['statuses'].items()
+                         if not status.isdigit() or int(status) >= 400)
+            result[name] = {
+                'requests': len(latencies),
+                'throughput': round(len(latencies) / duration, 2) if duration else None,
+                'errors': errors,
+                'error_rate': round(errors / len(latencies), 4) if latencies else 0,
+                'statuses': entry['statuses'],
+                'p50': round(percentile(latencies, 50), 4),
+                'p95': round(percentile(latencies, 95), 4),
+                'p99': round(percentile(latencies, 99), 4),
+                'mean': round(statistics.fmean(latencies), 4) if latencies else 0,
+                'max': round(latencies[-1], 4) if latencies else 0,
+                'mb_per_second': round(entry['bytes'] / duration / 1024 / 1024, 2) if duration else None,
+            }
+        return result
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class TaskPool:
+    """已分割完成、可以预览和下载的任务，以及等待完成的上传任务"""
+
+    def __init__(self):
+        self.ready = []  # (task_id, [章节文件名])
+        self.pending = {}  # task_id -> 上传完成时间
+        self.split_seconds = []
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def add_pending(self, task_id: str):
+        with self._lock:
+            self.pending[task_id] = time.monotonic()
+
+    def pending_ids(self) -> list:
+        with self._lock:
+            return list(self.pending)
+
+    def finish(self, task_id: str, payload: dict):
+        with self._lock:
+            started = self.pending.pop(task_id, None)
+            if payload.get('status') == 'done':
+                self.ready.append((task_id, payload.get('output_files') or []))
+                if started is not None:
+                    self.split_seconds.append(time.monotonic() - started)
+            else:
+                self.failed += 1
+
+    def pick(self, rng: random.Random):
+        with self._lock:
+            return rng.choice(self.ready) if self.ready else None
+
+
+class LoadClient:
+    """每个并发线程一个客户端，复用HTTP连接"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None):
+        """返回 (状态码, 响应体)；连接错误时重连一次后再抛出"""
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                response = self.conn.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def multipart_body(filename: str, data: bytes):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def upload(client: LoadClient, name: str, data: bytes, tenant: str = None):
+    body, headers = multipart_body(name, data)
+    if tenant:
+        headers['X-Client-Id'] = tenant
+    status, response = client.request('POST', '/upload', body, headers)
+    task_id = json.loads(response).get('task_id') if status == 202 else None
+    return status, len(response), task_id
+
+
+def poll_status(client: LoadClient, pool: TaskPool, task_ids: list):
+    for task_id in task_ids:
+        status, response = client.request('GET', f'/status/{task_id}')
+        if status == 200:
+            payload = json.loads(response)
+            if payload['status'] in ('done', 'failed'):
+                pool.finish(task_id, payload)
+        elif status == 404:
+            pool.finish(task_id, {'status': 'failed'})
+
+
+def run_route(route: str, args, client: LoadClient, pool: TaskPool, pdfs: list, rng: random.Random):
+    """发送一个请求，返回 (状态码, 响应字节数)；没有可用任务时返回None"""
+    if route == 'upload':
+        name, data = rng.choice(pdfs)
+        tenant = f'tenant-{rng.randrange(args.tenants)}' if args.tenants else None
+        status, size, task_id = upload(client, name, data, tenant)
+        if task_id:
+            pool.add_pending(task_id)
+        return status, size
+
+    task = pool.pick(rng)
+    if task is None:
+        return None
+    task_id, files = task
+    if route == 'preview':
+        path = f'/preview/{task_id}'
+    elif route == 'download_zip':
+        path = f'/download/{task_id}'
+    else:
+        if not files:
+            return None
+        path = f'/download/{task_id}/{quote(rng.choice(files))}'
+    status, response = client.request('GET', path)
+    return status, len(response)
+
+
+def load_worker(index: int, args, pool: TaskPool, stats: RouteStats, pdfs: list, deadline: float):
+    rng = random.Random(args.seed + index)
+    client = LoadClient(args.host, args.port, args.timeout)
+    routes = [route for route in ROUTES if args.mix.get(route, 0) > 0]
+    weights = [args.mix[route] for route in routes]
+    try:
+        while time.monotonic() < deadline:
+            route = rng.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                outcome = run_route(route, args, client, pool, pdfs, rng)
+            except (http.client.HTTPException, OSError, ValueError) as e:
+                stats.record(route, time.perf_counter() - start, type(e).__name__)
+                continue
+            if outcome is None:
+                time.sleep(0.01)
+                continue
+            status, size = outcome
+            stats.record(route, time.perf_counter() - start, status, size)
+            if args.think_time:
+                time.sleep(rng.uniform(0, 2 * args.think_time))
+    finally:
+        client.close()
+
+
+def status_poller(args, pool: TaskPool, stopped: threading.Event):
+    """定期查询压测中上传的任务，完成后加入可下载的任务"""
+    client = LoadClient(args.host, args.port, args.timeout)
+    try:
+        while not stopped.wait(args.poll_interval):
+            try:
+                poll_status(client, pool, pool.pending_ids())
+            except (http.client.HTTPException, OSError, ValueError):
+                pass
+    finally:
+        client.close()
+
+
+def warm_up(args, pool: TaskPool, pdfs: list, timeout: float):
+    """每种大小上传一份并等待分割完成，作为压测开始时可预览和下载的任务"""
+    client = LoadClient(args.host, args.port, args.timeout)
+    try:
+        for name, data in pdfs:
+            status, _, task_id = upload(client, name, data)
+            if not task_id:
+                raise RuntimeError(f"预热上传失败: {name}，状态码 {status}")
+            pool.add_pending(task_id)
+        deadline = time.monotonic() + timeout
+        while pool.pending_ids():
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"预热任务在 {timeout:.0f} 秒内未完成")
+            time.sleep(0.1)
+            poll_status(client, pool, pool.pending_ids())
+        if not pool.ready:
+            raise RuntimeError('预热任务全部分割失败')
+    finally:
+        client.close()
+    pool.split_seconds.clear()
+    pool.failed = 0
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def summarize_rss(samples: list) -> dict:
+    totals = [sample['total_rss'] for sample in samples]
+    if not totals:
+        return {}
+    return {
+        'start': totals[0],
+        'end': totals[-1],
+        'peak': max(totals),
+        'mean': int(statistics.fmean(totals)),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_seconds: float) -> list:
+    """返回退化的 (路由, 指标, 基准值, 当前值)：吞吐量下降或p95延迟上升超过阈值"""
+    regressions = []
+    for route, metrics in current['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if not before:
+            continue
+        if before.get('throughput') and metrics['throughput'] < before['throughput'] * (1 - threshold):
+            regressions.append((route, 'throughput', before['throughput'], metrics['throughput']))
+        if max(before['p95'], metrics['p95']) >= min_seconds and metrics['p95'] > before['p95'] * (1 + threshold):
+            regressions.append((route, 'p95', before['p95'], metrics['p95']))
+    return regressions
+
+
+def print_results(results: dict):
+    print(f"{'路由':<15}{'请求数':>8}{'req/s':>9}{'错误率':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'MB/s':>8}")
+    for route, m in results['routes'].items():
+        print(f"{route:<15}{m['requests']:>8}{m['throughput'] or 0:>9.1f}{m['error_rate']:>9.1%}"
+              f"{m['p50'] * 1000:>8.0f}ms{m['p95'] * 1000:>8.0f}ms{m['p99'] * 1000:>8.0f}ms{m['mb_per_second'] or 0:>8.1f}")
+    split = results['split']
+    if split['completed']:
+        print(f"\n上传到分割完成: {split['completed']} 个任务，p50 {split['p50']:.2f}s，p95 {split['p95']:.2f}s，"
+              f"失败 {split['failed']}，未完成 {split['unfinished']}")
+    rss = results['rss']
+    if rss:
+        print(f"服务常驻内存: 开始 {rss['start'] / 1024 / 1024:.0f}MB，峰值 {rss['peak'] / 1024 / 1024:.0f}MB，"
+              f"结束 {rss['end'] / 1024 / 1024:.0f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Web服务负载测试',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f'''
+示例:
+  python benchmarks/load_test.py --concurrency 16 --duration 60 -o load.json
+  python benchmarks/load_test.py --server gunicorn --workers 4 --pages 20 200 800
+  python benchmarks/load_test.py --mix upload=1,download_file=9 --baseline load.json
+  python benchmarks/load_test.py --url http://127.0.0.1:5000   # 测试已运行的服务（不记录内存）
+
+请求比例可用的路由: {', '.join(ROUTES)}
+        '''
+    )
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'flask'], default='auto',
+                        help='启动方式（默认auto：已安装gunicorn时使用gunicorn，否则Flask开发服务器）')
+    parser.add_argument('--url', help='测试已运行的服务，不在本地启动')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker数（默认4）')
+    parser.add_argument('--threads', type=int, default=8, help='每个gunicorn worker的线程数（默认8，与Dockerfile一致）')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='传给服务进程的环境变量，可重复指定，例如 --env LOW_MEMORY=1')
+    parser.add_argument('--concurrency', '-c', type=int, default=8, help='并发客户端数（默认8）')
+    parser.add_argument('--duration', '-d', type=float, default=30, help='压测时长秒数（默认30）')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f'各路由的请求比例（默认 {DEFAULT_MIX}）')
+    parser.add_argument('--pages', type=int, nargs='+', default=[20, 100, 300],
+                        help=f'上传的合成PDF页数（{MIN_PAGES}-{MAX_PAGES}），每次上传随机选一种（默认 20 100 300）')
+    parser.add_argument('--images', type=int, default=0, help='合成PDF每页嵌入图片数（默认0）')
+    parser.add_argument('--image-kb', type=int, default=64, help='每张图片的大小KB（默认64）')
+    parser.add_argument('--corpus-dir', help='合成PDF的存放目录，已存在的文件直接复用（默认临时目录）')
+    parser.add_argument('--tenants', type=int,
+                        help='上传时在 X-Client-Id 头中随机使用的客户端数，本地启动的服务按该请求头区分客户端'
+                             '（默认与并发数相同；0表示不发送，全部请求按同一IP计入单客户端限制）')
+    parser.add_argument('--think-time', type=float, default=0, help='每个客户端两次请求之间的平均间隔秒数（默认0）')
+    parser.add_argument('--timeout', type=float, default=120, help='单个请求的超时秒数（默认120）')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='查询上传任务状态的间隔秒数（默认0.5）')
+    parser.add_argument('--sample-interval', type=float, default=1.0, help='记录常驻内存的间隔秒数（默认1）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子（默认0）')
+    parser.add_argument('--output', '-o', help='结果JSON文件路径')
+    parser.add_argument('--baseline', help='与之比较的基准结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定为退化的比例（默认0.2，即20%%）')
+    parser.add_argument('--min-seconds', type=float, default=0.01, help='p95低于该值的路由不比较延迟（默认0.01）')
+    args = parser.parse_args()
+
+    for pages in args.pages:
+        if not MIN_PAGES <= pages <= MAX_PAGES:
+            parser.error(f"页数必须在 {MIN_PAGES}-{MAX_PAGES} 之间: {pages}")
+    # 多个worker之间须共享任务状态，否则状态查询落到其他worker时返回404
+    # 压测请求都来自本机，按 X-Client-Id 区分客户端，否则全部上传计入同一客户端的并发限制
+    env = dict(os.environ, PYTHONPATH=ROOT, LAZY_INIT='0', JOB_STORE='sqlite', CLIENT_ID_HEADER='X-Client-Id')
+    env.pop('VERCEL', None)
+    if args.tenants is None:
+        args.tenants = max(1, args.concurrency)
+    for item in args.env:
+        key, sep, value = item.partition('=')
+        if not sep:
+            parser.error(f"环境变量格式应为 KEY=VALUE: {item}")
+        env[key] = value
+
+    server = args.server
+    if server == 'auto':
+        server = 'gunicorn' if subprocess.run([sys.executable, '-c', 'import gunicorn'],
+                                              capture_output=True).returncode == 0 else 'flask'
+
+    with ExitStack() as stack:
+        corpus_dir = args.corpus_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(corpus_dir, exist_ok=True)
+        pdfs = []
+        for pages in sorted(set(args.pages)):
+            name = f"en_chapter-{pages}p-30l-{args.images}i{args.image_kb}k.pdf"
+            pdf_path = os.path.join(corpus_dir, name)
+            if not os.path.exists(pdf_path):
+                generate_pdf(pdf_path, pages, 'en_chapter', images_per_page=args.images, image_kb=args.image_kb)
+            with open(pdf_path, 'rb') as f:
+                pdfs.append((name, f.read()))
+
+        process = None
+        if args.url:
+            parts = urlsplit(args.url)
+            args.host, args.port = parts.hostname, parts.port or 80
+            server = 'external'
+        else:
+            args.host, args.port = '127.0.0.1', free_port()
+            work_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            print(f"启动 {server} 服务，端口 {args.port} ...", file=sys.stderr)
+            process = start_server(server, args.port, args.workers, args.threads, work_dir, env)
+            stack.callback(stop_server, process)
+        wait_ready(args.host, args.port, process)
+
+        pool = TaskPool()
+        print(f"预热：上传 {len(pdfs)} 个PDF并等待分割完成 ...", file=sys.stderr)
+        warm_up(args, pool, pdfs, timeout=max(60, args.timeout))
+
+        stats = RouteStats()
+        started = time.monotonic()
+        sampler = RssSampler(process.pid, args.sample_interval, started, stats) if process else None
+        if sampler:
+            sampler.start()
+        stopped = threading.Event()
+        poller = threading.Thread(target=status_poller, args=(args, pool, stopped), daemon=True)
+        poller.start()
+
+        print(f"压测 {args.duration:.0f} 秒，并发 {args.concurrency} ...", file=sys.stderr)
+        deadline = started + args.duration
+        workers = [threading.Thread(target=load_worker, args=(index, args, pool, stats, pdfs, deadline))
+                   for index in range(max(1, args.concurrency))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        duration = time.monotonic() - started
+
+        stopped.set()
+        poller.join()
+        if sampler:
+            sampler.stop()
+
+    split_seconds = sorted(pool.split_seconds)
+    results = {
+        'version': RESULT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'server': server,
+        'workers': args.workers if server == 'gunicorn' else 1,
+        'threads': args.threads if server == 'gunicorn' else None,
+        'env': args.env,
+        'concurrency': args.concurrency,
+        'tenants': args.tenants,
+        'duration': round(duration, 2),
+        'mix': args.mix,
+        'pdfs': {name: len(data) for name, data in pdfs},
+        'throughput': round(stats.total() / duration, 2),
+        'routes': stats.summary(duration),
+        'split': {
+            'completed': len(split_seconds),
+            'failed': pool.failed,
+            'unfinished': len(pool.pending),
+            'p50': round(percentile(split_seconds, 50), 3),
+            'p95': round(percentile(split_seconds, 95), 3),
+            'p99': round(percentile(split_seconds, 99), 3),
+        },
+        'rss': summarize_rss(sampler.samples) if sampler else {},
+        'rss_timeline': sampler.samples if sampler else [],
+    }
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\n{len(regressions)} 项指标退化超过 {args.threshold:.0%}:")
+            for route, name, before, after in regressions:
+                print(f"  {route} {name}: {before} -> {after}")
+            sys.exit(1)
+        print("\n未发现性能退化")
+
+
+if __name__ == '__main__':
+    main()
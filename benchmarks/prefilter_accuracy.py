@@ -0,0 +1,154 @@
+"""预筛选准确性检查：在合成PDF（或指定的真实PDF）上对比完整扫描与两阶段预筛选扫描的检测结果和耗时
+
+召回率以完整扫描找到的章节为准；合成PDF同时报告相对真实章节页的召回率。
+标题字号可设为与正文相同（--heading-sizes 10），用来观察预筛选在最不利情况下的漏检。
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pdf_chapter_splitter import PDFChapterSplitter
+from synthetic_corpus import HEADING_FAMILIES, MAX_PAGES, MIN_PAGES, generate_pdf
+
+
+def scan(pdf_path: str, prefilter: bool) -> dict:
+    """不使用书签和缓存执行一次全文扫描，返回章节分割点、检测耗时和候选页数"""
+    splitter = PDFChapterSplitter(pdf_path, use_outline=False, use_cache=False, prefilter=prefilter)
+    with splitter.session() as reader:
+        pages = len(reader.pages)
+        start = time.perf_counter()
+        chapter_breaks = splitter.find_chapter_breaks()
+        seconds = time.perf_counter() - start
+
+    candidates = stage1_seconds = None
+    if prefilter:
+        # 在新的会话中单独计时第一阶段，避免复用检测时已解析的内容流
+        with splitter.session() as reader:
+            start = time.perf_counter()
+            candidates = sum(splitter.is_heading_candidate(reader, n) for n in range(pages))
+            stage1_seconds = time.perf_counter() - start
+
+    return {
+        'pages': pages,
+        'breaks': [page for page, _ in chapter_breaks],
+        'seconds': seconds,
+        'candidates': candidates,
+        'stage1_seconds': stage1_seconds,
+    }
+
+
+def recall(found: list, expected: list):
+    if not expected:
+        return None
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def check(pdf_path: str, expected: list = None) -> dict:
+    full = scan(pdf_path, prefilter=False)
+    filtered = scan(pdf_path, prefilter=True)
+    missed = sorted(set(full['breaks']) - set(filtered['breaks']))
+    return {
+        'pages': full['pages'],
+        'candidates': filtered['candidates'],
+        'candidate_ratio': round(filtered['candidates'] / full['pages'], 4) if full['pages'] else None,
+        'chapters_full': len(full['breaks']),
+        'chapters_prefilter': len(filtered['breaks']),
+        'recall_vs_full': recall(filtered['breaks'], full['breaks']),
+        'recall_full_vs_truth': recall(full['breaks'], expected) if expected is not None else None,
+        'recall_prefilter_vs_truth': recall(filtered['breaks'], expected) if expected is not None else None,
+        'missed_pages': [page + 1 for page in missed],
+        'full_seconds': round(full['seconds'], 4),
+        'prefilter_seconds': round(filtered['seconds'], 4),
+        'stage1_seconds': round(filtered['stage1_seconds'], 4),
+        'speedup': round(full['seconds'] / filtered['seconds'], 2) if filtered['seconds'] else None,
+    }
+
+
+def print_results(cases: dict):
+    def percent(value):
+        return f"{value:.0%}" if value is not None else '-'
+
+    print(f"{'用例':<32}{'页数':>6}{'候选页':>9}{'完整':>6}{'预筛选':>8}{'召回率':>8}{'真实召回':>10}"
+          f"{'完整耗时':>10}{'预筛选耗时':>12}{'加速':>7}")
+    for case, result in cases.items():
+        print(f"{case:<32}{result['pages']:>6}{percent(result['candidate_ratio']):>9}"
+              f"{result['chapters_full']:>6}{result['chapters_prefilter']:>8}{percent(result['recall_vs_full']):>8}"
+              f"{percent(result['recall_prefilter_vs_truth']):>10}{result['full_seconds'] * 1000:>8.0f}ms"
+              f"{result['prefilter_seconds'] * 1000:>10.0f}ms{result['speedup'] or 0:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='章节检测预筛选的准确性检查',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+示例:
+  python benchmarks/prefilter_accuracy.py --pages 100 1000
+  python benchmarks/prefilter_accuracy.py --heading-sizes 18 12 10 --min-recall 1.0
+  python benchmarks/prefilter_accuracy.py --pdf book1.pdf book2.pdf --families
+        '''
+    )
+    parser.add_argument('--pages', type=int, nargs='+', default=[100, 1000],
+                        help=f'合成PDF的页数，可指定多个（{MIN_PAGES}-{MAX_PAGES}，默认 100 1000）')
+    parser.add_argument('--families', nargs='*', choices=sorted(HEADING_FAMILIES), default=sorted(HEADING_FAMILIES),
+                        help='标题格式（默认全部，不带参数时不生成合成PDF）')
+    parser.add_argument('--heading-sizes', type=int, nargs='+', default=[18, 10],
+                        help='章节标题字号，正文为10（默认 18 10）')
+    parser.add_argument('--pages-per-chapter', type=int, default=10, help='每章页数（默认10）')
+    parser.add_argument('--lines', type=int, default=30, help='每页正文行数（默认30）')
+    parser.add_argument('--pdf', nargs='+', default=[], help='同时检查的真实PDF（以完整扫描结果为准）')
+    parser.add_argument('--corpus-dir', help='合成PDF的存放目录（默认临时目录）')
+    parser.add_argument('--output', '-o', help='结果JSON文件路径')
+    parser.add_argument('--min-recall', type=float, default=None,
+                        help='相对完整扫描的最低召回率，任一用例低于该值时以非0状态退出')
+    args = parser.parse_args()
+
+    for pages in args.pages:
+        if not MIN_PAGES <= pages <= MAX_PAGES:
+            parser.error(f"页数必须在 {MIN_PAGES}-{MAX_PAGES} 之间: {pages}")
+
+    logging.getLogger('pdf_chapter_splitter').setLevel(logging.WARNING)
+
+    cases = {}
+    with ExitStack() as stack:
+        corpus_dir = args.corpus_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(corpus_dir, exist_ok=True)
+
+        for family in args.families:
+            for heading_size in args.heading_sizes:
+                for pages in args.pages:
+                    case = f"{family}-{pages}p-h{heading_size}"
+                    pdf_path = os.path.join(corpus_dir, f"{case}-{args.lines}l.pdf")
+                    spec = generate_pdf(pdf_path, pages, family, args.pages_per_chapter, args.lines,
+                                        heading_size=heading_size)
+                    print(f"检查 {case} ...", file=sys.stderr)
+                    cases[case] = check(pdf_path, spec['chapters'])
+
+        for pdf_path in args.pdf:
+            print(f"检查 {pdf_path} ...", file=sys.stderr)
+            cases[os.path.basename(pdf_path)] = check(pdf_path)
+
+    print_results(cases)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'heading_ratio': PDFChapterSplitter.PREFILTER_HEADING_RATIO, 'cases': cases},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+    if args.min_recall is not None:
+        failed = [case for case, result in cases.items()
+                  if result['recall_vs_full'] is not None and result['recall_vs_full'] < args.min_recall]
+        if failed:
+            print(f"\n{len(failed)} 个用例的召回率低于 {args.min_recall:.0%}: {', '.join(failed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
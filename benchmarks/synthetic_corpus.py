@@ -0,0 +1,214 @@
+"""离线生成用于基准测试的合成PDF：页数、标题格式、文字密度和嵌入图片均可配置"""
+import argparse
+import math
+import os
+import random
+from typing import Callable, Dict
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+    TextStringObject,
+)
+
+MIN_PAGES = 10
+MAX_PAGES = 5000
+
+_CN_DIGITS = '零一二三四五六七八九'
+
+
+def chinese_number(n: int) -> str:
+    """1-99 转为中文数字，更大的数保留阿拉伯数字（内置模式同样接受）"""
+    if n < 10:
+        return _CN_DIGITS[n]
+    if n < 100:
+        tens, ones = divmod(n, 10)
+        return ('' if tens == 1 else _CN_DIGITS[tens]) + '十' + (_CN_DIGITS[ones] if ones else '')
+    return str(n)
+
+
+# 每种标题格式对应一个内置章节模式
+HEADING_FAMILIES: Dict[str, Callable[[int], str]] = {
+    'zh_chapter': lambda n: f"第{chinese_number(n)}章 数据分析方法",
+    'en_chapter': lambda n: f"Chapter {n} Results and Discussion",
+    'numbered': lambda n: f"{n}. Introduction",
+    'zh_section': lambda n: f"第{n}节 研究背景",
+    'zh_part': lambda n: f"第{chinese_number(n)}部分 基础知识",
+    'en_section': lambda n: f"Section {n} Methods",
+}
+
+_WORDS = ['the', 'data', 'model', 'result', 'page', 'value', 'system', 'analysis',
+          '数据', '分析', '方法', '结果', '系统', '模型']
+
+# 正文行以小写单词开头，不会被任何内置模式误判为标题
+_BODY_FIRST_WORDS = [word for word in _WORDS if word.isascii()]
+
+
+def _to_unicode_cmap(text_chars: set) -> bytes:
+    """为 Identity-H 编码生成 ToUnicode CMap：字符编码即其UTF-16码元"""
+    high_bytes = sorted({ord(char) >> 8 for char in text_chars})
+    ranges = ''.join(f"<{high:02X}00> <{high:02X}FF> <{high:02X}00>\n" for high in high_bytes)
+    return (
+        "/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n"
+        "/CMapName /Synthetic-UCS def /CMapType 2 def\n"
+        "1 begincodespacerange <0000> <FFFF> endcodespacerange\n"
+        f"{len(high_bytes)} beginbfrange\n{ranges}endbfrange\n"
+        "endcmap CMapName currentdict /CMap defineresource pop end end"
+    ).encode('ascii')
+
+
+def _add_font(writer: PdfWriter, text_chars: set):
+    """添加一个可同时显示中英文的 Type0 字体，返回其间接引用"""
+    to_unicode = DecodedStreamObject()
+    to_unicode.set_data(_to_unicode_cmap(text_chars))
+    descendant = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/CIDFontType2'),
+        NameObject('/BaseFont'): NameObject('/STSong-Light'),
+        NameObject('/CIDSystemInfo'): DictionaryObject({
+            NameObject('/Registry'): TextStringObject('Adobe'),
+            NameObject('/Ordering'): TextStringObject('Identity'),
+            NameObject('/Supplement'): NumberObject(0),
+        }),
+    })
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type0'),
+        NameObject('/BaseFont'): NameObject('/STSong-Light'),
+        NameObject('/Encoding'): NameObject('/Identity-H'),
+        NameObject('/DescendantFonts'): ArrayObject([writer._add_object(descendant)]),
+        NameObject('/ToUnicode'): writer._add_object(to_unicode),
+    })
+    return writer._add_object(font)
+
+
+def _add_image(writer: PdfWriter, rng: random.Random, size_kb: int):
+    """添加一张随机灰度图片（不可压缩），返回其间接引用"""
+    side = max(1, int(math.sqrt(size_kb * 1024)))
+    image = DecodedStreamObject()
+    image.set_data(rng.randbytes(side * side))
+    image.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Image'),
+        NameObject('/Width'): NumberObject(side),
+        NameObject('/Height'): NumberObject(side),
+        NameObject('/ColorSpace'): NameObject('/DeviceGray'),
+        NameObject('/BitsPerComponent'): NumberObject(8),
+    })
+    return writer._add_object(image)
+
+
+def _show(text: str) -> str:
+    return f"<{text.encode('utf-16-be').hex().upper()}> Tj"
+
+
+def _body_line(rng: random.Random) -> str:
+    words = [rng.choice(_BODY_FIRST_WORDS)] + [rng.choice(_WORDS) for _ in range(rng.randint(5, 14))]
+    return ' '.join(words)
+
+
+def generate_pdf(path: str, pages: int, family: str = 'en_chapter', pages_per_chapter: int = 10,
+                 lines_per_page: int = 30, images_per_page: int = 0, image_kb: int = 16,
+                 outline: bool = False, seed: int = 42, heading_size: int = 18) -> dict:
+    """生成合成PDF并返回其描述，其中 chapters 为各章节起始页（从0开始）
+
+    heading_size 为章节标题的字号，正文字号为10；设为10时标题与正文无法按字号区分。
+    """
+    if not MIN_PAGES <= pages <= MAX_PAGES:
+        raise ValueError(f"页数必须在 {MIN_PAGES}-{MAX_PAGES} 之间")
+    if family not in HEADING_FAMILIES:
+        raise ValueError(f"未知的标题格式: {family}")
+
+    rng = random.Random(seed)
+    heading = HEADING_FAMILIES[family]
+    chapters = list(range(0, pages, max(1, pages_per_chapter)))
+    chapter_index = {page_num: index for index, page_num in enumerate(chapters)}
+
+    # 先生成全部文字，ToUnicode CMap 需要覆盖出现过的全部字符
+    page_lines = []
+    for page_num in range(pages):
+        lines = []
+        if page_num in chapter_index:
+            lines.append(heading(chapter_index[page_num] + 1))
+        lines.extend(_body_line(rng) for _ in range(lines_per_page))
+        page_lines.append(lines)
+
+    writer = PdfWriter()
+    chars = {char for lines in page_lines for line in lines for char in line}
+    font = _add_font(writer, chars)
+
+    for page_num, lines in enumerate(page_lines):
+        writer.add_blank_page(612, 792)
+        page = writer.pages[-1]
+
+        ops = ["BT 72 740 Td"]
+        for index, line in enumerate(lines):
+            size = heading_size if index == 0 and page_num in chapter_index else 10
+            ops.append(f"/F1 {size} Tf {_show(line)} 0 -{size + 4} Td")
+        ops.append("ET")
+
+        xobjects = DictionaryObject()
+        for index in range(images_per_page):
+            name = f"/Im{index}"
+            xobjects[NameObject(name)] = _add_image(writer, rng, image_kb)
+            ops.append(f"q 100 0 0 100 {72 + index * 110} 72 cm {name} Do Q")
+
+        content = DecodedStreamObject()
+        content.set_data('\n'.join(ops).encode('ascii'))
+        page[NameObject('/Contents')] = writer._add_object(content)
+
+        resources = DictionaryObject({NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})})
+        if xobjects:
+            resources[NameObject('/XObject')] = xobjects
+        page[NameObject('/Resources')] = resources
+
+    if outline:
+        for index, page_num in enumerate(chapters):
+            writer.add_outline_item(heading(index + 1), page_num)
+
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+    return {
+        'path': path,
+        'pages': pages,
+        'family': family,
+        'chapters': chapters,
+        'lines_per_page': lines_per_page,
+        'images_per_page': images_per_page,
+        'image_kb': image_kb,
+        'outline': outline,
+        'heading_size': heading_size,
+        'size': os.path.getsize(path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成用于基准测试的合成PDF')
+    parser.add_argument('output_dir', help='输出目录')
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000],
+                        help=f'页数，可指定多个（{MIN_PAGES}-{MAX_PAGES}，默认 10 100 1000）')
+    parser.add_argument('--families', nargs='+', choices=sorted(HEADING_FAMILIES), default=sorted(HEADING_FAMILIES),
+                        help='标题格式（默认全部）')
+    parser.add_argument('--pages-per-chapter', type=int, default=10, help='每章页数（默认10）')
+    parser.add_argument('--lines', type=int, default=30, help='每页正文行数（默认30）')
+    parser.add_argument('--images', type=int, default=0, help='每页嵌入图片数（默认0）')
+    parser.add_argument('--image-kb', type=int, default=16, help='每张图片的大小KB（默认16）')
+    parser.add_argument('--outline', action='store_true', help='同时写入章节书签')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for family in args.families:
+        for pages in args.pages:
+            path = os.path.join(args.output_dir, f"{family}-{pages}p.pdf")
+            spec = generate_pdf(path, pages, family, args.pages_per_chapter, args.lines,
+                                args.images, args.image_kb, args.outline)
+            print(f"{path}: {spec['size'] / 1024:.1f} KB, {len(spec['chapters'])} 个章节")
+
+
+if __name__ == '__main__':
+    main()
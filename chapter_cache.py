@@ -0,0 +1,86 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+
+class MaterializedChapterCache:
+    """按需生成的章节文件缓存：总大小超过上限时按最近最少使用淘汰
+
+    生成过程在每个文件各自的锁内进行，同一章节被并发请求时只生成一次。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._entries = OrderedDict()  # 文件路径 -> 大小
+        self._total = 0
+        self._lock = threading.Lock()
+        self._file_locks = {}
+
+    def _file_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            return self._file_locks.setdefault(path, threading.Lock())
+
+    def get(self, path: str, generate: Callable[[str], bool]) -> bool:
+        """确保 path 存在，不存在时调用 generate(临时路径) 生成；返回文件是否可用"""
+        with self._file_lock(path):
+            if os.path.exists(path):
+                self._touch(path)
+                return True
+
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                if not generate(tmp_path) or not os.path.exists(tmp_path):
+                    return False
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            self._add(path, os.path.getsize(path))
+            return True
+
+    def discard_dir(self, directory: str):
+        """目录已被删除时移除其中文件的记录，不再计入容量"""
+        prefix = os.path.join(directory, '')
+        with self._lock:
+            for path in [p for p in self._entries if p.startswith(prefix)]:
+                self._total -= self._entries.pop(path)
+                self._file_locks.pop(path, None)
+
+    def _touch(self, path: str):
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+            else:
+                # 进程重启前生成的文件也纳入容量统计
+                size = os.path.getsize(path)
+                self._entries[path] = size
+                self._total += size
+        self._evict(keep=path)
+
+    def _add(self, path: str, size: int):
+        with self._lock:
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+        self._evict(keep=path)
+
+    def _evict(self, keep: str):
+        with self._lock:
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                path, size = next(iter(self._entries.items()))
+                if path == keep:
+                    self._entries.move_to_end(path)
+                    continue
+                del self._entries[path]
+                self._file_locks.pop(path, None)
+                self._total -= size
+                try:
+                    os.remove(path)
+                    self.logger.info(f"Evicted materialized chapter: {path}")
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    self.logger.error(f"Error evicting {path}: {e}")
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    """分块上传请求无效，status_code 为应返回的HTTP状态码"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ChunkedUploadManager:
+    """分块、可续传的上传：分块直接追加写入磁盘，同时增量计算SHA-256
+
+    上传进度保存在与分块文件同目录的JSON文件中，进程重启或请求落到其他worker后仍可续传。
+    每个上传有自己的锁，读取请求体期间只锁住该上传，慢速客户端不会阻塞其他上传。
+    """
+
+    def __init__(self, upload_dir: str, max_size: int, chunk_size: int):
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self._hashers = {}  # upload_id -> (已计算的字节数, sha256对象)
+        self._upload_locks = {}  # upload_id -> [锁, 使用中的请求数]
+        self._lock = threading.Lock()  # 保护 _hashers 和 _upload_locks
+
+    @contextmanager
+    def _locked(self, upload_id: str):
+        """持有单个上传的锁；没有请求使用时删除该锁"""
+        with self._lock:
+            entry = self._upload_locks.setdefault(upload_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._upload_locks[upload_id]
+
+    def _paths(self, upload_id: str):
+        if not _UPLOAD_ID_RE.match(upload_id or ''):
+            raise UploadError('无效的上传ID', 404)
+        base = os.path.join(self.upload_dir, upload_id)
+        return base + '.part', base + '.json'
+
+    def _load(self, upload_id: str) -> dict:
+        part_path, meta_path = self._paths(upload_id)
+        if not os.path.exists(meta_path) or not os.path.exists(part_path):
+            raise UploadError('上传不存在或已过期', 404)
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        # 以磁盘上实际写入的字节数为准
+        meta['received'] = os.path.getsize(part_path)
+        return meta
+
+    def _save(self, upload_id: str, meta: dict):
+        _, meta_path = self._paths(upload_id)
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def _take_hasher(self, upload_id: str, part_path: str, received: int):
+        """取出与已接收字节数一致的哈希状态，不一致时从分块文件重新计算；调用方需持有该上传的锁
+
+        取出后缓存中不再保留，写入过程中哈希状态与文件不一致，成功后由调用方放回。
+        """
+        with self._lock:
+            cached = self._hashers.pop(upload_id, None)
+        if cached is not None and cached[0] == received:
+            return cached[1]
+
+        hasher = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(block)
+        return hasher
+
+    def discard(self, upload_id: str):
+        """丢弃未完成上传的哈希状态，上传被清理（过期或超出配额）后调用"""
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+
+    def files(self, upload_id: str) -> list:
+        """未完成上传占用的分块文件和进度文件"""
+        return list(self._paths(upload_id))
+
+    def init(self, filename: str, size: int, **fields) -> dict:
+        """开始一次上传，返回上传ID和分块大小"""
+        if size <= 0:
+            raise UploadError('文件大小无效')
+        if size > self.max_size:
+            raise UploadError(f'文件太大，最大支持{self.max_size // (1024 * 1024)}MB', 413)
+
+        upload_id = uuid.uuid4().hex
+        part_path, _ = self._paths(upload_id)
+        open(part_path, 'wb').close()
+        self._save(upload_id, dict(fields, filename=filename, size=size))
+        return {'upload_id': upload_id, 'chunk_size': self.chunk_size, 'received': 0, 'size': size}
+
+    def status(self, upload_id: str) -> dict:
+        """返回已接收的字节数，客户端据此续传"""
+        meta = self._load(upload_id)
+        return {'upload_id': upload_id, 'filename': meta['filename'], 'received': meta['received'],
+                'size': meta['size'], 'chunk_size': self.chunk_size}
+
+    def append(self, upload_id: str, offset: int, stream, length: Optional[int]) -> dict:
+        """把请求体作为一个分块追加到偏移 offset 处，偏移必须等于已接收的字节数"""
+        if length is not None and length > self.chunk_size:
+            raise UploadError(f'分块过大，最大{self.chunk_size}字节', 413)
+
+        part_path, _ = self._paths(upload_id)
+        with self._locked(upload_id):
+            meta = self._load(upload_id)
+            if offset != meta['received']:
+                raise UploadError(f"偏移不匹配，已接收 {meta['received']} 字节", 409)
+
+            hasher = self._take_hasher(upload_id, part_path, meta['received'])
+            written = 0
+            with open(part_path, 'ab') as f:
+                try:
+                    while True:
+                        block = stream.read(64 * 1024)
+                        if not block:
+                            break
+                        written += len(block)
+                        if written > self.chunk_size or meta['received'] + written > meta['size']:
+                            raise UploadError('分块超出声明的大小', 413)
+                        f.write(block)
+                        hasher.update(block)
+                except Exception:
+                    # 连接中断或分块无效时丢弃本分块已写入的部分，客户端可从原偏移重传
+                    f.truncate(meta['received'])
+                    raise
+
+            received = meta['received'] + written
+            with self._lock:
+                self._hashers[upload_id] = (received, hasher)
+            return {'upload_id': upload_id, 'received': received, 'size': meta['size']}
+
+    def finalize(self, upload_id: str, dest_path: str, expected_sha256: Optional[str] = None) -> dict:
+        """校验大小和哈希后把完整文件移动到 dest_path，返回上传元数据和SHA-256"""
+        part_path, meta_path = self._paths(upload_id)
+        with self._locked(upload_id):
+            meta = self._load(upload_id)
+            if meta['received'] != meta['size']:
+                raise UploadError(f"上传未完成，已接收 {meta['received']}/{meta['size']} 字节", 409)
+
+            hasher = self._take_hasher(upload_id, part_path, meta['received'])
+            sha256 = hasher.hexdigest()
+            if expected_sha256 and expected_sha256.lower() != sha256:
+                # 校验失败时保留上传，客户端可以重新提交
+                with self._lock:
+                    self._hashers[upload_id] = (meta['received'], hasher)
+                raise UploadError('文件校验失败，SHA-256不匹配', 422)
+
+            os.replace(part_path, dest_path)
+            os.remove(meta_path)
+            meta['sha256'] = sha256
+            return meta
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+class DetectionCache:
+    """以文件内容哈希和模式指纹为键，持久化保存章节检测结果的SQLite缓存（LRU淘汰）"""
+
+    DEFAULT_MAX_ENTRIES = 1000
+
+    def __init__(self, cache_dir: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max(1, max_entries)
+        self.db_path = self.cache_dir / 'chapter_breaks.sqlite3'
+        self.logger = logging.getLogger(__name__)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS breaks ('
+                ' content_hash TEXT NOT NULL,'
+                ' fingerprint TEXT NOT NULL,'
+                ' engine TEXT,'
+                ' breaks TEXT NOT NULL,'
+                ' last_used REAL NOT NULL,'
+                ' PRIMARY KEY (content_hash, fingerprint))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_breaks_last_used ON breaks (last_used)')
+
+    @staticmethod
+    def default_dir() -> str:
+        """默认缓存目录，可通过环境变量 PDF_SPLITTER_CACHE_DIR 覆盖"""
+        return os.environ.get('PDF_SPLITTER_CACHE_DIR') or str(Path.home() / '.cache' / 'pdf-chapter-splitter')
+
+    @staticmethod
+    def file_hash(path, chunk_size: int = 1024 * 1024) -> str:
+        """分块计算文件内容的SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def fingerprint(options: dict) -> str:
+        """检测配置（模式列表、书签和页眉设置等）的指纹"""
+        payload = json.dumps(options, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后关闭连接"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, content_hash: str, fingerprint: str) -> Optional[Tuple[List[Tuple[int, str]], Optional[str]]]:
+        """返回缓存的 (章节分割点, 检测引擎)，未命中时返回None"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT breaks, engine FROM breaks WHERE content_hash = ? AND fingerprint = ?',
+                    (content_hash, fingerprint)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    'UPDATE breaks SET last_used = ? WHERE content_hash = ? AND fingerprint = ?',
+                    (time.time(), content_hash, fingerprint)
+                )
+            breaks = [(int(page), str(title)) for page, title in json.loads(row[0])]
+            return breaks, row[1]
+        except Exception as e:
+            self.logger.warning(f"读取检测缓存失败: {e}")
+            return None
+
+    def put(self, content_hash: str, fingerprint: str, breaks: List[Tuple[int, str]], engine: Optional[str]):
+        """保存检测结果，并按最近使用时间淘汰超出上限的条目"""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO breaks (content_hash, fingerprint, engine, breaks, last_used) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (content_hash, fingerprint, engine, json.dumps(breaks, ensure_ascii=False), time.time())
+                )
+                conn.execute(
+                    'DELETE FROM breaks WHERE rowid IN ('
+                    ' SELECT rowid FROM breaks ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+        except Exception as e:
+            self.logger.warning(f"写入检测缓存失败: {e}")
+
+    def clear(self):
+        """清空缓存"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM breaks')
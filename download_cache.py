@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, Optional
+
+
+class TaskFileIndex:
+    """每个任务的输出文件名到路径的内存索引，下载时不再列目录和逐个比较文件名
+
+    索引在第一次访问任务时由 load() 建立。多个worker各有一份索引，而重新分割只在执行任务的进程中调用 invalidate，
+    因此调用方传入输出目录的版本（修改时间），与建立索引时不同即重新加载；按文件名找不到时也重新加载一次。
+    最多保留 max_tasks 个任务，超出时淘汰最久未访问的。
+    """
+
+    def __init__(self, max_tasks: int = 1024):
+        self.max_tasks = max(1, max_tasks)
+        self._tasks = OrderedDict()  # task_id -> (版本, {文件名: 路径})
+        self._lock = threading.Lock()
+
+    def files(self, task_id: str, load: Callable[[], Dict[str, str]], version=None) -> Dict[str, str]:
+        return self._files(task_id, load, version)[0]
+
+    def resolve(self, task_id: str, filename: str, load: Callable[[], Dict[str, str]],
+                version=None) -> Optional[str]:
+        """精确匹配文件名；找不到时忽略空格再匹配（浏览器或客户端可能改写了文件名中的空格）"""
+        files, cached = self._files(task_id, load, version)
+        path = self._match(files, filename)
+        if path is None and cached:
+            # 目录修改时间的精度可能不足以发现变化，索引中没有时按目录内容重新加载
+            self.invalidate(task_id)
+            path = self._match(self._files(task_id, load, version)[0], filename)
+        return path
+
+    def invalidate(self, task_id: str):
+        with self._lock:
+            self._tasks.pop(task_id, None)
+
+    def _files(self, task_id: str, load: Callable[[], Dict[str, str]], version) -> tuple:
+        """返回 (索引, 是否来自缓存)"""
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            if entry is not None and entry[0] == version:
+                self._tasks.move_to_end(task_id)
+                return entry[1], True
+
+        files = load()
+        with self._lock:
+            self._tasks[task_id] = (version, files)
+            self._tasks.move_to_end(task_id)
+            while len(self._tasks) > self.max_tasks:
+                self._tasks.popitem(last=False)
+        return files, False
+
+    @staticmethod
+    def _match(files: Dict[str, str], filename: str) -> Optional[str]:
+        path = files.get(filename)
+        if path is not None:
+            return path
+
+        compact = filename.replace(' ', '')
+        for name, path in files.items():
+            if compact in name.replace(' ', ''):
+                return path
+        return None
+
+
+class ZipCache:
+    """打包下载的ZIP缓存：第一次下载时边生成边发送，同时写入任务目录，之后直接发送缓存文件
+
+    同一任务同时只有一个请求写入缓存，其余并发请求只流式发送、不写文件；客户端中途断开或生成出错时不保存。
+    """
+
+    FILENAME = '.download.zip'
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._building = set()
+        self._lock = threading.Lock()
+
+    def path(self, output_dir: str) -> str:
+        return os.path.join(output_dir, self.FILENAME)
+
+    def cached(self, output_dir: str) -> Optional[str]:
+        path = self.path(output_dir)
+        return path if os.path.exists(path) else None
+
+    def discard(self, output_dir: str):
+        try:
+            os.remove(self.path(output_dir))
+        except FileNotFoundError:
+            pass
+
+    def stream_and_store(self, output_dir: str, chunks: Iterator[bytes], keep: Optional[Callable[[], bool]] = None,
+                         on_stored: Optional[Callable[[str], None]] = None) -> Iterator[bytes]:
+        """转发 chunks 并写入缓存文件；全部发送后 keep() 返回False时（例如有章节生成失败）丢弃"""
+        with self._lock:
+            if output_dir in self._building:
+                building = False
+            else:
+                self._building.add(output_dir)
+                building = True
+        if not building:
+            yield from chunks
+            return
+
+        path = self.path(output_dir)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        stored = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            if keep is None or keep():
+                os.replace(tmp_path, path)
+                stored = True
+        finally:
+            if not stored:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            with self._lock:
+                self._building.discard(output_dir)
+
+        if on_stored is not None:
+            try:
+                on_stored(path)
+            except Exception as e:
+                self.logger.warning(f"ZIP cache callback failed: {e}")
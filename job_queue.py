@@ -0,0 +1,257 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+# 任务状态
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """等待中的任务数已达上限，retry_after 为建议客户端重试前等待的秒数"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MemoryJobStore:
+    """进程内的任务状态存储，适用于单进程部署和测试"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, task_id: str, **fields):
+        with self._lock:
+            self._jobs[task_id] = dict(fields, task_id=task_id, status=STATUS_QUEUED,
+                                       created_at=time.time(), updated_at=time.time())
+
+    def update(self, task_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(task_id)
+            if job is not None:
+                job.update(fields, updated_at=time.time())
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(task_id)
+            return dict(job) if job is not None else None
+
+    def delete(self, task_id: str):
+        with self._lock:
+            self._jobs.pop(task_id, None)
+
+    def touch(self, task_ids):
+        with self._lock:
+            for task_id in task_ids:
+                job = self._jobs.get(task_id)
+                if job is not None:
+                    job['updated_at'] = time.time()
+
+    def fail_stale(self, before: float, error: str) -> int:
+        with self._lock:
+            stale = [job for job in self._jobs.values()
+                     if job['status'] in (STATUS_QUEUED, STATUS_RUNNING) and job['updated_at'] < before]
+            for job in stale:
+                job.update(status=STATUS_FAILED, error=error, finished_at=time.time(), updated_at=time.time())
+            return len(stale)
+
+
+class SQLiteJobStore:
+    """基于SQLite的本地持久化任务状态存储，可在多个gunicorn worker之间共享"""
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' task_id TEXT PRIMARY KEY,'
+                ' data TEXT NOT NULL)'
+            )
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后关闭连接"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, task_id: str, **fields):
+        job = dict(fields, task_id=task_id, status=STATUS_QUEUED, created_at=time.time(), updated_at=time.time())
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO jobs (task_id, data) VALUES (?, ?)',
+                         (task_id, json.dumps(job, ensure_ascii=False)))
+
+    def update(self, task_id: str, **fields):
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM jobs WHERE task_id = ?', (task_id,)).fetchone()
+            if row is None:
+                return
+            job = json.loads(row[0])
+            job.update(fields, updated_at=time.time())
+            conn.execute('UPDATE jobs SET data = ? WHERE task_id = ?',
+                         (json.dumps(job, ensure_ascii=False), task_id))
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM jobs WHERE task_id = ?', (task_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def delete(self, task_id: str):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE task_id = ?', (task_id,))
+
+    def touch(self, task_ids):
+        """更新执行中任务的 updated_at，表明执行它们的进程仍在运行"""
+        for task_id in task_ids:
+            self.update(task_id)
+
+    def fail_stale(self, before: float, error: str) -> int:
+        """把 updated_at 早于 before 的排队和执行中任务记为失败（执行它们的进程已退出），返回任务数"""
+        with self._connect() as conn:
+            jobs = [json.loads(row[0]) for row in conn.execute('SELECT data FROM jobs')]
+            stale = [job for job in jobs
+                     if job['status'] in (STATUS_QUEUED, STATUS_RUNNING) and job['updated_at'] < before]
+            for job in stale:
+                job.update(status=STATUS_FAILED, error=error, finished_at=time.time(), updated_at=time.time())
+                conn.execute('UPDATE jobs SET data = ? WHERE task_id = ?',
+                             (json.dumps(job, ensure_ascii=False), job['task_id']))
+        return len(stale)
+
+
+class JobQueue:
+    """有界的后台任务队列：提交后立即返回，任务在线程池中执行并把状态写入任务存储
+
+    max_workers 为0时在提交线程中同步执行，适用于请求结束后不能继续运行后台线程的无服务器环境。
+    指定 admission（admission.AdmissionController）时，带 cost 提交的任务由它按资源预算决定何时交给线程池，
+    max_workers 应不小于它的CPU预算；同步执行时不使用 admission。
+
+    进程崩溃或重启后，它排队和执行中的任务在共享存储中不会再更新。stale_timeout 大于0时，
+    本进程每隔 stale_timeout 的四分之一更新自己未结束任务的 updated_at，并把超过 stale_timeout 未更新的任务记为失败。
+    """
+
+    STALE_ERROR = '任务因服务重启而中断，请重新提交'
+    RETRY_AFTER = 5  # 未启用准入控制、无法估计等待时间时建议的重试间隔（秒）
+
+    def __init__(self, store=None, max_workers: int = 2, max_pending: int = 20, admission=None,
+                 stale_timeout: float = 0):
+        self.store = store if store is not None else MemoryJobStore()
+        self.max_workers = max(0, max_workers)
+        self.max_pending = max(1, max_pending)
+        self.admission = admission if self.max_workers else None
+        self.stale_timeout = stale_timeout
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers else None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._active = set()  # 本进程提交、尚未结束的任务
+        self._active_lock = threading.Lock()
+        if self._executor is not None and stale_timeout > 0:
+            self.recover_stale()
+            threading.Thread(target=self._heartbeat, daemon=True).start()
+
+    def submit(self, task_id: str, func: Callable[..., dict], *args, cost=None, client: str = '', **fields):
+        """登记任务并排队执行；func 返回的字典作为任务结果保存
+
+        cost 为 admission.JobCost 时按资源预算排队，client 用于限制单个客户端的并发数。
+        """
+        admission = self.admission if cost is not None else None
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError('任务队列已满', retry_after=admission.retry_after() if admission else self.RETRY_AFTER)
+
+        try:
+            if admission is not None:
+                admission.reserve(client)
+            try:
+                self.store.create(task_id, **fields)
+            except Exception:
+                if admission is not None:
+                    admission.cancel(client)
+                raise
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._active_lock:
+            self._active.add(task_id)
+        if self._executor is None:
+            self._run(task_id, func, args)
+        elif admission is not None:
+            admission.enqueue(task_id, client, cost, lambda: self._dispatch(task_id, func, args, admission))
+        else:
+            try:
+                self._executor.submit(self._run, task_id, func, args)
+            except Exception:
+                self._finished(task_id)
+                raise
+
+    def _dispatch(self, task_id: str, func: Callable[..., dict], args: tuple, admission):
+        """admission 放行后交给线程池；提交失败时任务记为失败，由 admission 归还预算"""
+        try:
+            self._executor.submit(self._run, task_id, func, args, admission)
+        except Exception as e:
+            self.store.update(task_id, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+            self._finished(task_id)
+            raise
+
+    def _run(self, task_id: str, func: Callable[..., dict], args: tuple, admission=None):
+        try:
+            self.store.update(task_id, status=STATUS_RUNNING, started_at=time.time())
+            result = func(*args)
+            self.store.update(task_id, status=STATUS_DONE, result=result, finished_at=time.time())
+        except Exception as e:
+            self.logger.error(f"Job {task_id} failed: {e}")
+            self.store.update(task_id, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+        finally:
+            if admission is not None:
+                admission.release(task_id)
+            self._finished(task_id)
+
+    def _finished(self, task_id: str):
+        with self._active_lock:
+            self._active.discard(task_id)
+        self._slots.release()
+
+    def recover_stale(self) -> int:
+        """把其他进程留下的、超过 stale_timeout 未更新的排队和执行中任务记为失败"""
+        try:
+            count = self.store.fail_stale(time.time() - self.stale_timeout, self.STALE_ERROR)
+        except Exception as e:
+            self.logger.error(f"Failed to recover stale jobs: {e}")
+            return 0
+        if count:
+            self.logger.warning(f"Marked {count} stale jobs as failed")
+        return count
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.stale_timeout / 4)
+            with self._active_lock:
+                active = list(self._active)
+            try:
+                self.store.touch(active)
+            except Exception as e:
+                self.logger.error(f"Failed to refresh active jobs: {e}")
+            self.recover_stale()
+
+    def get(self, task_id: str) -> Optional[dict]:
+        return self.store.get(task_id)
+
+    def delete(self, task_id: str):
+        """删除已结束任务的记录，任务的文件被清理后调用"""
+        self.store.delete(task_id)
@@ -0,0 +1,197 @@
+import os
+import sys
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 各阶段耗时（秒）
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# 每秒处理页数
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# 输入输出字节数：64KB 到 1GB，每档4倍
+BYTES_BUCKETS = tuple(64 * 1024 * 4 ** i for i in range(8))
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """当前进程的最大常驻内存（字节），平台不支持时返回None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以KB为单位
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+    """当前进程的常驻内存（字节），仅支持提供 /proc 的系统，其他平台返回None"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * _PAGE_SIZE
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return '\n'.join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """可任意设置的当前值"""
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """累积分桶直方图，桶的上界不含 +Inf"""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # 标签值 -> [各桶计数, 总和, 次数]
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class SplitterMetrics:
+    """汇总分割任务的性能数据，以 Prometheus 文本格式输出
+
+    数据保存在进程内存中；多个gunicorn worker时每个worker分别统计，由Prometheus按实例汇总。
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, prefix: str = 'pdf_splitter'):
+        self.phase_seconds = Histogram(f'{prefix}_phase_seconds', '各处理阶段耗时（秒）', TIME_BUCKETS, ('phase',))
+        self.pages_per_second = Histogram(f'{prefix}_pages_per_second', '分割任务每秒处理的页数', RATE_BUCKETS)
+        self.job_bytes = Histogram(f'{prefix}_job_bytes', '分割任务输入和输出的字节数', BYTES_BUCKETS, ('direction',))
+        self.jobs = Counter(f'{prefix}_jobs_total', '按结果和检测方式统计的分割任务数', ('status', 'engine', 'cached'))
+        self.peak_rss = Gauge(f'{prefix}_process_peak_rss_bytes', '进程的最大常驻内存（字节）')
+        self.admission = Gauge(f'{prefix}_admission', '准入控制的排队和执行中任务数、已占用的内存（MB）和CPU预算', ('state',))
+        self.rejected = Counter(f'{prefix}_rejected_total', '因队列已满或客户端超限被拒绝的任务数', ('reason',))
+        self._metrics = (self.phase_seconds, self.pages_per_second, self.job_bytes, self.jobs, self.peak_rss,
+                         self.admission, self.rejected)
+
+    def observe_phase(self, phase: str, seconds: float):
+        self.phase_seconds.observe(seconds, phase=phase)
+
+    def observe_job(self, profile: dict, status: str):
+        """记录一次分割任务，profile 为 PDFChapterSplitter.profile() 的返回值"""
+        for phase, seconds in profile['phases'].items():
+            self.observe_phase(phase, seconds)
+        if profile.get('pages_per_second'):
+            self.pages_per_second.observe(profile['pages_per_second'])
+        if profile.get('bytes_in') is not None:
+            self.job_bytes.observe(profile['bytes_in'], direction='in')
+        if profile.get('bytes_out'):
+            self.job_bytes.observe(profile['bytes_out'], direction='out')
+        self.jobs.inc(status=status, engine=profile.get('detection_engine') or 'none',
+                      cached='true' if profile.get('from_cache') else 'false')
+
+    def observe_rejected(self, reason: str):
+        self.rejected.inc(reason=reason)
+
+    def observe_admission(self, stats: dict):
+        """记录 AdmissionController.stats() 的当前值"""
+        for state, value in stats.items():
+            self.admission.set(value, state=state)
+
+    def render(self) -> str:
+        rss = peak_rss_bytes()
+        if rss is not None:
+            self.peak_rss.set(rss)
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
@@ -0,0 +1,96 @@
+"""页面文本索引：保存章节检测时提取并清理过的每页文本，更换章节模式后不必重新提取即可重新匹配
+
+文件格式：魔数、JSON头部的长度和内容（源文件大小和修改时间、提取选项、页数），
+之后是zlib压缩的正文：每页文本在拼接文本中的结束偏移（uint32，小端），再接全部页面文本的UTF-8拼接。
+被预筛选排除、未提取文本的页面在头部的 skipped 中列出，其文本为None。
+"""
+import json
+import os
+import struct
+import zlib
+from typing import List, Optional
+
+_MAGIC = b'PTXI'
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+class PageTextIndex:
+    """按页保存的文本，可与当前源文件和提取选项比对以判断是否仍然有效"""
+
+    VERSION = 1
+
+    def __init__(self, texts: List[Optional[str]], source: dict, options: dict):
+        self.texts = texts
+        self.source = source
+        self.options = options
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def skipped(self) -> List[int]:
+        """未提取文本的页码（从0开始）"""
+        return [page_num for page_num, text in enumerate(self.texts) if text is None]
+
+    @staticmethod
+    def source_info(pdf_path) -> dict:
+        """源文件的大小和修改时间，文件被替换后索引随之失效"""
+        stat = os.stat(pdf_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def matches(self, source: dict, options: dict) -> bool:
+        return self.source == source and self.options == options
+
+    def save(self, path):
+        """先写临时文件再替换，并发读取时不会读到写了一半的索引"""
+        encoded = [(text or '').encode('utf-8') for text in self.texts]
+        offsets = []
+        end = 0
+        for data in encoded:
+            end += len(data)
+            offsets.append(end)
+
+        header = json.dumps({
+            'version': self.VERSION,
+            'pages': len(self.texts),
+            'source': self.source,
+            'options': self.options,
+            'skipped': self.skipped,
+        }, ensure_ascii=False).encode('utf-8')
+        body = zlib.compress(struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(encoded))
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_MAGIC + _HEADER_LENGTH.pack(len(header)) + header + body)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> 'PageTextIndex':
+        """读取索引，文件格式或版本不符时抛出 ValueError"""
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError('不是页面文本索引文件')
+        start = len(_MAGIC) + _HEADER_LENGTH.size
+        (header_length,) = _HEADER_LENGTH.unpack_from(data, len(_MAGIC))
+        header = json.loads(data[start:start + header_length].decode('utf-8'))
+        if header.get('version') != cls.VERSION:
+            raise ValueError(f"不支持的页面文本索引版本: {header.get('version')}")
+
+        try:
+            body = zlib.decompress(data[start + header_length:])
+        except zlib.error as e:
+            raise ValueError(f"页面文本索引已损坏: {e}")
+        pages = header['pages']
+        offsets = struct.unpack_from(f'<{pages}I', body)
+        text_data = body[4 * pages:]
+
+        texts = []
+        begin = 0
+        for end in offsets:
+            texts.append(text_data[begin:end].decode('utf-8'))
+            begin = end
+        for page_num in header.get('skipped', []):
+            texts[page_num] = None
+        return cls(texts, header['source'], header['options'])
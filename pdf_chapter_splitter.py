@@ -1,20 +1,219 @@
 import PyPDF2
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, NameObject, read_object
+from PyPDF2._utils import read_non_whitespace, read_until_regex
 import re
 import os
 import sys
+import gc
+import time
+from collections import Counter
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Callable, List, Tuple, Optional
 import argparse
 import logging
 from contextlib import contextmanager
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from detection_cache import DetectionCache
+from page_text_index import PageTextIndex
+from pdf_optimizer import optimize_writer
+from raw_copy import RawPageCopier
+from metrics import current_rss_bytes, peak_rss_bytes
+
+
+class ChapterPatternMatcher:
+    """将全部章节模式一次性编译为单个带命名分组的组合正则，并用首字符预筛选快速排除不可能的行"""
+    
+    _DIGITS = 'digits'
+    # IGNORECASE 下除大小写外还与这些ASCII字母等价的字符（ſ、开尔文符号K、带点和无点的i）
+    _CASE_EQUIVALENTS = {'s': '\u017f', 'k': '\u212a', 'i': '\u0130\u0131'}
+    
+    def __init__(self, patterns: List[str], flags: int = re.IGNORECASE):
+        self.patterns = tuple(patterns)
+        self._compiled = [re.compile(pattern, flags) for pattern in self.patterns]
+        
+        # 带分组的模式放进组合正则后分组编号会改变，\1 等反向引用会指向错误的分组，这些模式单独匹配
+        self._combined_indexes = [index for index, regex in enumerate(self._compiled) if regex.groups == 0]
+        self._separate_indexes = [index for index, regex in enumerate(self._compiled) if regex.groups > 0]
+        self._group_names = [f"_p{index}" for index in self._combined_indexes]
+        
+        # 模式中自带全局标志时无法组合，退回逐个匹配已编译的模式
+        try:
+            combined = '|'.join(f"(?P<{name}>{self.patterns[index]})"
+                                for name, index in zip(self._group_names, self._combined_indexes))
+            self._combined = re.compile(combined, flags) if self._combined_indexes else None
+        except re.error:
+            self._combined = None
+        if self._combined is None:
+            self._combined_indexes = []
+            self._separate_indexes = list(range(len(self.patterns)))
+        
+        self._first_chars = set()
+        self._allow_digits = False
+        self._prefilter = bool(self.patterns)
+        for pattern in self.patterns:
+            first = self._first_chars_of(pattern)
+            if first is None:
+                self._prefilter = False
+                break
+            if first == self._DIGITS:
+                self._allow_digits = True
+            else:
+                self._first_chars.update(first)
+    
+    @classmethod
+    def _first_chars_of(cls, pattern: str):
+        """推断模式能匹配的行首字符集合，无法确定时返回None"""
+        body = pattern[1:] if pattern.startswith('^') else pattern
+        if not body:
+            return None
+            
+        if body[0] == '\\':
+            escaped = body[1:2]
+            rest = body[2:]
+            if escaped == 'd':
+                first = cls._DIGITS
+            elif escaped and not escaped.isalnum():
+                first = {escaped}
+            else:
+                return None
+        elif body[0] in '.[](){}|?*+$^':
+            return None
+        else:
+            char = body[0]
+            # 非ASCII的大小写字母在 IGNORECASE 下的等价字符不止大小写两种，不做预筛选
+            if not char.isascii() and char.lower() != char.upper():
+                return None
+            first = {char.lower(), char.upper()} | set(cls._CASE_EQUIVALENTS.get(char.lower(), ''))
+            rest = body[1:]
+        
+        # 首个元素允许出现零次时无法据此预筛选
+        if rest[:1] in ('?', '*') or rest.startswith('{0') or rest.startswith('|'):
+            return None
+        if '|' in body:
+            return None
+            
+        return first
+    
+    def could_match(self, line: str) -> bool:
+        """廉价的首字符预筛选，返回False时该行不可能是章节标题"""
+        if not self._prefilter:
+            return True
+        if not line:
+            return False
+        first = line[0]
+        return first in self._first_chars or (self._allow_digits and first.isdigit())
+    
+    def match(self, line: str) -> Optional[int]:
+        """返回首个匹配该行的模式序号，均不匹配时返回None"""
+        if not self.could_match(line):
+            return None
+            
+        matched = None
+        if self._combined is not None:
+            m = self._combined.match(line)
+            if m is not None:
+                for index, name in zip(self._combined_indexes, self._group_names):
+                    if m.start(name) != -1:
+                        matched = index
+                        break
+        
+        # 单独匹配的模式只需检查排在已匹配模式之前的
+        for index in self._separate_indexes:
+            if matched is not None and index > matched:
+                break
+            if self._compiled[index].match(line):
+                return index
+        return matched
 
 
 class PDFChapterSplitter:
-    def __init__(self, pdf_path: str, output_dir: str = None):
+    # 检测算法变化时递增，使旧的缓存结果失效
+    DETECTION_VERSION = 3
+    
+    # 页数少于该值时进程池启动开销大于收益，自动使用串行扫描
+    PARALLEL_MIN_PAGES = 200
+    
+    # 低内存模式下每处理这么多页丢弃一次reader缓存的已解析对象
+    LOW_MEMORY_WINDOW = 32
+    
+    # 输出文件的写入方式：standard 用PyPDF2克隆并序列化页面，raw 直接复制原始对象字节
+    WRITE_ENGINES = ('standard', 'raw')
+    
+    # 命令行默认把页面文本索引保存在输出目录中的该文件
+    TEXT_INDEX_FILENAME = '.page_text.idx'
+    
+    # 页眉模式下会改变文本位置的操作符和显示文本的操作符
+    _TEXT_SHOW_OPERATORS = (b'Tj', b'TJ', b"'", b'"')
+    
+    # 预筛选：字号不小于页面正文字号该倍数的文本视为可能的标题
+    PREFILTER_HEADING_RATIO = 1.2
+    # 预筛选只检查内容流中前若干个文本显示操作的字面字符串
+    PREFILTER_SHOW_OPS = 20
+    
+    # 预筛选用正则直接扫描内容流，只识别 BT、Tf、Tm 和文本显示操作，不做完整解析
+    _NUMBER = rb'[-+]?(?:\d+\.?\d*|\.\d+)'
+    _PREFILTER_OPS_RE = re.compile(
+        rb'(?P<bt>\bBT\b)'
+        rb'|(?P<tf>' + _NUMBER + rb')\s+Tf\b'
+        rb'|(?P<tm>(?:' + _NUMBER + rb'\s+){6})Tm\b'
+        rb'|\((?P<str>(?:[^()\\]|\\.)*)\)\s*(?:Tj|\'|")'
+        rb'|\[(?P<arr>(?:[^\]\\]|\\.)*)\]\s*TJ'
+        rb'|(?P<hex><[0-9A-Fa-f\s]*>)\s*(?:Tj|\'|")',
+        re.DOTALL
+    )
+    _LITERAL_RE = re.compile(rb'\(((?:[^()\\]|\\.)*)\)', re.DOTALL)
+    _LITERAL_ESCAPE_RE = re.compile(rb'\\([0-7]{1,3}|\r\n|[\s\S])')
+    _LITERAL_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+    
+    def __init__(self, pdf_path: str, output_dir: str = None, use_outline: bool = True, outline_depth: int = 1,
+                 workers: int = 1, header_only: bool = False, header_lines: int = 10,
+                 header_ratio: Optional[float] = None, use_cache: bool = False, cache_dir: Optional[str] = None,
+                 cache_max_entries: int = DetectionCache.DEFAULT_MAX_ENTRIES, write_workers: int = 1,
+                 optimize_output: bool = False, progress_callback: Optional[Callable[[str, dict], None]] = None,
+                 low_memory: bool = False, memory_limit_mb: Optional[int] = None, prefilter: bool = False,
+                 write_engine: str = 'standard', text_index_path: Optional[str] = None, reuse_text: bool = False):
         self.pdf_path = Path(pdf_path)
         self.output_dir = Path(output_dir) if output_dir else self.pdf_path.parent / f"{self.pdf_path.stem}_chapters"
         self._pdf_file = None
         self.reader = None
+        self.use_outline = use_outline
+        self.outline_depth = max(1, outline_depth)
+        self.detection_engine = None  # 最近一次章节检测所用的引擎: 'outline' 或 'text'
+        self.workers = max(1, workers or 1)
+        self.parallel_min_pages = self.PARALLEL_MIN_PAGES
+        self.write_workers = max(1, write_workers or 1)
+        self.optimize_output = optimize_output  # 写入前删除未使用资源并合并相同对象
+        if write_engine not in self.WRITE_ENGINES:
+            raise ValueError(f"未知的写入方式: {write_engine}")
+        # raw 不解析内容流和图片，按原始字节复制；优化输出需要PyPDF2的对象，此时仍用 standard
+        self.write_engine = write_engine
+        self._raw_copier = None
+        # 低内存模式：按页窗口丢弃reader缓存的已解析对象，每个章节写入后也立即丢弃；
+        # 设置内存上限时常驻内存超过上限即提前丢弃并回收
+        self.low_memory = low_memory or bool(memory_limit_mb)
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.low_memory_window = self.LOW_MEMORY_WINDOW
+        self._over_limit_warned = False
+        # 页眉模式：只提取页面顶部区域的前若干行文本，收集够后立即停止解析
+        self.header_only = header_only
+        self.header_lines = max(1, header_lines)
+        self.header_ratio = header_ratio if header_ratio and 0 < header_ratio < 1 else None
+        # 两阶段检测：先用内容流中的字号和字面字符串廉价排除不可能是章节首页的页面，
+        # 只对候选页做完整文本提取；标题与正文字号相同且无法直接读出文字时会漏检
+        self.prefilter = prefilter
+        # 检测结果缓存：以文件内容哈希和检测配置指纹为键
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir or DetectionCache.default_dir()
+        self.cache_max_entries = cache_max_entries
+        self.from_cache = False  # 最近一次检测结果是否来自缓存
+        self._detection_cache = None
+        self._content_hash = None
+        # 页面文本索引：全文扫描时保存每页清理后的文本；reuse_text 时直接用索引重新匹配章节模式，
+        # 索引不存在或已过期时忽略检测缓存重新扫描，以便生成索引
+        self.text_index_path = Path(text_index_path) if text_index_path else None
+        self.reuse_text = reuse_text and self.text_index_path is not None
         self.chapter_patterns = [
             r'^第[一二三四五六七八九十\d]+章',  # 中文章节标题
             r'^Chapter\s+\d+',  # 英文章节标题
@@ -23,6 +222,13 @@ class PDFChapterSplitter:
             r'^第[一二三四五六七八九十\d]+部分',  # 中文部分标题
             r'^Section\s+\d+',  # 英文节标题
         ]
+        self._pattern_matcher = None
+        # 性能数据：各阶段累计耗时（秒）、总页数和已写入的字节数
+        self.phase_timings = {}
+        self.total_pages = None
+        self.bytes_out = 0
+        # 进度回调 callback(事件名, 数据)：page_scanned、chapter_found、chapter_written
+        self.progress_callback = progress_callback
         
         # 设置日志
         logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -30,10 +236,14 @@ class PDFChapterSplitter:
     
     @contextmanager
     def _pdf_context(self):
-        """上下文管理器，确保PDF文件正确关闭"""
+        """上下文管理器，确保PDF文件正确关闭；已有打开的会话时直接复用同一个reader"""
+        if self.reader is not None:
+            yield self.reader
+            return
+            
         try:
-            self._pdf_file = open(self.pdf_path, 'rb')
-            self.reader = PyPDF2.PdfReader(self._pdf_file)
+            with self._timed('parse'):
+                self._open_reader()
             yield self.reader
         except FileNotFoundError:
             self.logger.error(f"PDF文件不存在: {self.pdf_path}")
@@ -48,24 +258,111 @@ class PDFChapterSplitter:
             self.logger.error(f"加载PDF文件失败: {e}")
             raise
         finally:
+            self.reader = None
+            self._raw_copier = None
             if self._pdf_file:
                 self._pdf_file.close()
                 self._pdf_file = None
-                self.reader = None
+    
+    def _open_reader(self):
+        """打开源文件并解析页面树"""
+        self._pdf_file = open(self.pdf_path, 'rb')
+        self.reader = PyPDF2.PdfReader(self._pdf_file)
+        self.total_pages = len(self.reader.pages)
+        return self.reader
+    
+    def _memory_options(self) -> dict:
+        """传给工作进程的低内存设置，不影响检测结果，因此不参与缓存指纹"""
+        return {
+            'low_memory': self.low_memory,
+            'memory_limit_mb': self.memory_limit // (1024 * 1024) if self.memory_limit else None,
+        }
+    
+    def _release_parsed_state(self, reader, pages_done: int):
+        """低内存模式下每处理完一个窗口的页面或超过内存上限时，丢弃reader缓存的已解析对象
+
+        PyPDF2 会缓存解析过的全部对象（包括内容流和图片数据），不丢弃时内存随页数线性增长；
+        被丢弃的对象之后需要时会从文件重新读取。
+        """
+        over_limit = self.memory_limit is not None and (current_rss_bytes() or 0) > self.memory_limit
+        if not over_limit and pages_done % self.low_memory_window:
+            return
+        
+        reader.resolved_objects.clear()
+        if over_limit:
+            gc.collect()
+            if not self._over_limit_warned and (current_rss_bytes() or 0) > self.memory_limit:
+                self._over_limit_warned = True
+                self.logger.warning(f"释放缓存后内存仍超过上限 {self.memory_limit // (1024 * 1024)} MB")
+    
+    @contextmanager
+    def _timed(self, phase: str):
+        """累计一个处理阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_timings[phase] = self.phase_timings.get(phase, 0.0) + time.perf_counter() - start
+    
+    def _emit(self, event: str, **data):
+        """通知进度回调；回调出错不影响分割。调用方应先检查 progress_callback 是否为None，避免无监听时构造参数"""
+        try:
+            self.progress_callback(event, data)
+        except Exception as e:
+            self.logger.warning(f"进度回调出错: {e}")
+    
+    def profile(self) -> dict:
+        """本实例已执行作业的性能数据：各阶段耗时、页数、吞吐量、输入输出字节数、检测方式和进程内存峰值"""
+        total_seconds = sum(self.phase_timings.values())
+        try:
+            bytes_in = self.pdf_path.stat().st_size
+        except OSError:
+            bytes_in = None
+        return {
+            'phases': dict(self.phase_timings),
+            'total_seconds': total_seconds,
+            'pages': self.total_pages,
+            'pages_per_second': self.total_pages / total_seconds if self.total_pages and total_seconds else None,
+            'bytes_in': bytes_in,
+            'bytes_out': self.bytes_out,
+            'detection_engine': self.detection_engine,
+            'from_cache': self.from_cache,
+            'peak_rss_bytes': peak_rss_bytes(),
+        }
+    
+    @contextmanager
+    def session(self):
+        """在一次作业中只打开并解析一次PDF，期间的验证、检测、写入和信息查询共用同一个reader"""
+        with self._pdf_context() as reader:
+            yield reader
+    
+    @property
+    def pattern_matcher(self) -> ChapterPatternMatcher:
+        """当前章节模式对应的组合匹配器，模式列表变化后自动重新编译"""
+        if self._pattern_matcher is None or self._pattern_matcher.patterns != tuple(self.chapter_patterns):
+            self._pattern_matcher = ChapterPatternMatcher(self.chapter_patterns)
+        return self._pattern_matcher
+    
+    def _check_file(self) -> bool:
+        """检查PDF路径是否指向非空文件"""
+        if not self.pdf_path.exists():
+            self.logger.error(f"PDF文件不存在: {self.pdf_path}")
+            return False
+            
+        if not self.pdf_path.is_file():
+            self.logger.error(f"路径不是文件: {self.pdf_path}")
+            return False
+            
+        if self.pdf_path.stat().st_size == 0:
+            self.logger.error("PDF文件为空")
+            return False
+        
+        return True
     
     def validate_pdf(self) -> bool:
         """验证PDF文件是否有效"""
         try:
-            if not self.pdf_path.exists():
-                self.logger.error(f"PDF文件不存在: {self.pdf_path}")
-                return False
-                
-            if not self.pdf_path.is_file():
-                self.logger.error(f"路径不是文件: {self.pdf_path}")
-                return False
-                
-            if self.pdf_path.stat().st_size == 0:
-                self.logger.error("PDF文件为空")
+            if not self._check_file():
                 return False
                 
             with self._pdf_context() as reader:
@@ -94,80 +391,580 @@ class PDFChapterSplitter:
                 
             page = reader.pages[page_num]
             text = page.extract_text()
-            
-            # 处理可能的编码问题
-            if text:
-                # 清理文本中的异常字符
-                text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
-                # 统一换行符
-                text = re.sub(r'\r\n|\r', '\n', text)
-            
-            return text or ""
+            return self._clean_text(text)
             
         except Exception as e:
             self.logger.warning(f"提取第{page_num + 1}页文本失败: {e}")
             return ""
     
-    def find_chapter_breaks(self) -> List[Tuple[int, str]]:
-        """查找章节分割点"""
-        chapter_breaks = []
+    @staticmethod
+    def _clean_text(text: Optional[str]) -> str:
+        """清理提取出的文本中的异常字符并统一换行符"""
+        # 处理可能的编码问题
+        if text:
+            # 清理文本中的异常字符
+            text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
+            # 统一换行符
+            text = re.sub(r'\r\n|\r', '\n', text)
         
-        try:
-            with self._pdf_context() as reader:
-                total_pages = len(reader.pages)
-                self.logger.info(f"开始扫描 {total_pages} 页以查找章节...")
+        return text or ""
+    
+    def _header_content_bytes(self, data: bytes, min_y: Optional[float]) -> Optional[bytes]:
+        """遍历内容流，只保留位于页眉区域的前若干行文本操作，收集够后提前停止；无法处理时返回None"""
+        stream = BytesIO(data)
+        cm = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+        cm_stack = []
+        line_matrix = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+        leading = 0.0
+        operands = []
+        op_start = 0
+        skipped = []  # 区域外的文本操作字节范围
+        last_line_y = None
+        lines_collected = 0
+        cut = len(data)
+        in_text = False
+        
+        def move_line(tx, ty):
+            line_matrix[4] += tx * line_matrix[0] + ty * line_matrix[2]
+            line_matrix[5] += tx * line_matrix[1] + ty * line_matrix[3]
+        
+        while True:
+            peek = read_non_whitespace(stream)
+            if peek == b"" or peek == 0:
+                break
+            stream.seek(-1, 1)
+            
+            if peek == b"%":
+                while peek not in (b"\r", b"\n", b""):
+                    peek = stream.read(1)
+                continue
                 
-                for page_num in range(total_pages):
-                    text = self.extract_text_from_page(reader, page_num)
-                    if not text.strip():
+            if not (peek.isalpha() or peek in (b"'", b'"')):
+                operands.append(read_object(stream, None, "bytes"))
+                continue
+            
+            operator = read_until_regex(stream, NameObject.delimiter_pattern, True)
+            if operator == b"BI":
+                # 内联图片需要完整解析，交给常规提取
+                return None
+            
+            try:
+                values = [float(v) for v in operands if isinstance(v, (int, float))]
+                if operator == b"q":
+                    cm_stack.append(list(cm))
+                elif operator == b"Q":
+                    cm = cm_stack.pop() if cm_stack else [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+                elif operator == b"cm" and len(values) == 6:
+                    a, b, c, d, e, f = values
+                    cm = [
+                        a * cm[0] + b * cm[2], a * cm[1] + b * cm[3],
+                        c * cm[0] + d * cm[2], c * cm[1] + d * cm[3],
+                        e * cm[0] + f * cm[2] + cm[4], e * cm[1] + f * cm[3] + cm[5],
+                    ]
+                elif operator == b"BT":
+                    in_text = True
+                    line_matrix = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+                elif operator == b"ET":
+                    in_text = False
+                elif operator == b"Tm" and len(values) == 6:
+                    line_matrix = values
+                elif operator == b"TL" and values:
+                    leading = values[0]
+                elif operator in (b"Td", b"TD") and len(values) == 2:
+                    if operator == b"TD":
+                        leading = -values[1]
+                    move_line(values[0], values[1])
+                elif operator in (b"T*", b"'", b'"'):
+                    move_line(0.0, -leading)
+            except (TypeError, ValueError):
+                pass
+            
+            if operator in self._TEXT_SHOW_OPERATORS:
+                y = line_matrix[4] * cm[1] + line_matrix[5] * cm[3] + cm[5]
+                if min_y is not None and y < min_y:
+                    skipped.append((op_start, stream.tell()))
+                else:
+                    line_y = round(y, 1)
+                    if line_y != last_line_y:
+                        if lines_collected >= self.header_lines:
+                            cut = op_start
+                            break
+                        lines_collected += 1
+                        last_line_y = line_y
+            
+            operands = []
+            op_start = stream.tell()
+        
+        parts = []
+        position = 0
+        for start, end in skipped:
+            if start >= cut:
+                break
+            parts.append(data[position:start])
+            position = end
+        parts.append(data[position:cut])
+        if cut < len(data) and in_text:
+            parts.append(b"\nET")
+        return b"".join(parts)
+    
+    @staticmethod
+    def _page_content_bytes(page) -> Optional[bytes]:
+        """页面解压后的内容流，多个内容流按顺序拼接；页面没有内容时返回None"""
+        contents = page.get(NameObject('/Contents'))
+        if contents is None:
+            return None
+            
+        contents = contents.get_object()
+        if isinstance(contents, ArrayObject):
+            return b"\n".join(stream.get_object().get_data() for stream in contents)
+        return contents.get_data()
+    
+    @classmethod
+    def _decode_literal(cls, raw: bytes) -> str:
+        """按PDF字面字符串的转义规则解码，单字节编码近似按 Latin-1 处理"""
+        def unescape(m):
+            escaped = m.group(1)
+            if escaped[:1].isdigit():
+                return bytes([int(escaped, 8) & 0xFF])
+            if escaped in (b'\r\n', b'\n', b'\r'):
+                return b''  # 续行
+            return cls._LITERAL_ESCAPES.get(escaped, escaped)
+        
+        return cls._LITERAL_ESCAPE_RE.sub(unescape, raw).decode('latin-1')
+    
+    @staticmethod
+    def _has_form_xobject(page) -> bool:
+        """页面是否引用了表单XObject，其中的文本不在页面自身的内容流里"""
+        resources = page.get(NameObject('/Resources'))
+        xobjects = resources.get_object().get(NameObject('/XObject')) if resources is not None else None
+        if xobjects is None:
+            return False
+        return any(xobject.get_object().get('/Subtype') == '/Form' for xobject in xobjects.get_object().values())
+    
+    def is_heading_candidate(self, reader, page_num: int) -> bool:
+        """预筛选第一阶段：只看原始内容流判断页面是否可能是章节首页
+
+        页面有明显大于正文字号的文字，或前几个文本操作的字面字符串匹配章节模式时为候选页；
+        没有文本操作的页面直接排除。无法判断时保守地返回True。
+        """
+        try:
+            page = reader.pages[page_num]
+            data = self._page_content_bytes(page)
+            if data is None:
+                return False
+            if b'Do' in data and self._has_form_xobject(page):
+                return True
+            
+            matcher = self.pattern_matcher
+            sizes = Counter()  # 有效字号 -> 文本显示操作数
+            font_size = tm_scale = 1.0
+            block_text = []
+            literals_checked = 0
+            for m in self._PREFILTER_OPS_RE.finditer(data):
+                kind = m.lastgroup
+                if kind == 'bt':
+                    tm_scale = 1.0
+                    block_text = []
+                elif kind == 'tf':
+                    font_size = abs(float(m.group('tf')))
+                elif kind == 'tm':
+                    _, _, c, d = (float(v) for v in m.group('tm').split()[:4])
+                    tm_scale = (c * c + d * d) ** 0.5
+                else:
+                    sizes[round(font_size * tm_scale, 1)] += 1
+                    if kind == 'hex' or literals_checked >= self.PREFILTER_SHOW_OPS:
                         continue
-                        
-                    lines = text.split('\n')
-                    
-                    # 检查页面前10行和可能的标题位置
-                    lines_to_check = lines[:10]
                     
-                    # 如果页面很长，也检查中间部分可能的标题
-                    if len(lines) > 20:
-                        mid_start = len(lines) // 2 - 2
-                        mid_end = len(lines) // 2 + 3
-                        lines_to_check.extend(lines[mid_start:mid_end])
-                    
-                    for line_idx, line in enumerate(lines_to_check):
-                        line = line.strip()
-                        if not line or len(line) < 2:
-                            continue
-                        
-                        # 跳过过长的行（可能是正文）
-                        if len(line) > 100:
-                            continue
-                            
-                        for pattern in self.chapter_patterns:
-                            if re.match(pattern, line, re.IGNORECASE):
-                                # 避免重复检测同一页的章节
-                                if chapter_breaks and chapter_breaks[-1][0] == page_num:
-                                    break
-                                    
-                                chapter_title = line[:60].strip()  # 增加标题长度限制
-                                chapter_breaks.append((page_num, chapter_title))
-                                self.logger.info(f"发现章节: 第{page_num + 1}页 - {chapter_title}")
-                                break
-                        else:
-                            continue
-                        break  # 找到章节后跳出行循环
+                    # 字面字符串可以直接读出文字（单字节编码），同一文本块内的片段拼接后再匹配
+                    raw = m.group('str') if kind == 'str' else b''.join(self._LITERAL_RE.findall(m.group('arr')))
+                    text = self._decode_literal(raw).strip()
+                    literals_checked += 1
+                    if not text:
+                        continue
+                    block_text.append(text)
+                    if matcher.match(text) is not None or matcher.match(''.join(block_text).strip()) is not None:
+                        return True
+            
+            if not sizes:
+                return False
+            
+            # 出现次数最多的字号视为正文字号，次数相同时取较小者
+            body_size = min(sizes, key=lambda size: (-sizes[size], size))
+            return max(sizes) >= body_size * self.PREFILTER_HEADING_RATIO
+            
+        except Exception as e:
+            self.logger.debug(f"第{page_num + 1}页预筛选失败，按候选页处理: {e}")
+            return True
+    
+    def extract_header_text_from_page(self, reader, page_num: int) -> str:
+        """只提取页面顶部区域（header_ratio）的前 header_lines 行文本"""
+        try:
+            if page_num >= len(reader.pages):
+                self.logger.warning(f"页面索引超出范围: {page_num}")
+                return ""
                 
-                # 去重并排序
-                chapter_breaks = list(dict.fromkeys(chapter_breaks))  # 去重保持顺序
-                chapter_breaks.sort(key=lambda x: x[0])  # 按页码排序
+            page = reader.pages[page_num]
+            data = self._page_content_bytes(page)
+            if data is None:
+                return ""
+            
+            min_y = None
+            if self.header_ratio:
+                box = page.mediabox
+                min_y = float(box.top) - float(box.height) * self.header_ratio
+            
+            header_data = self._header_content_bytes(data, min_y)
+            if header_data is None:
+                return self.extract_text_from_page(reader, page_num)
+            
+            # 用截断后的内容流构造临时页面，复用PyPDF2的字体解码逻辑
+            header_stream = DecodedStreamObject()
+            header_stream.set_data(header_data)
+            header_page = PyPDF2.PageObject(reader)
+            header_page.update(page)
+            header_page[NameObject('/Contents')] = header_stream
+            return self._clean_text(header_page.extract_text())
+            
+        except Exception as e:
+            self.logger.debug(f"第{page_num + 1}页页眉提取失败，改用完整提取: {e}")
+            return self.extract_text_from_page(reader, page_num)
+    
+    def _walk_outline(self, reader, items, depth: int, breaks: List[Tuple[int, str]]):
+        """递归遍历书签树，收集不超过指定层级的条目"""
+        for item in items:
+            if isinstance(item, list):
+                # 嵌套列表是上一个条目的子书签
+                if depth < self.outline_depth:
+                    self._walk_outline(reader, item, depth + 1, breaks)
+                continue
+            
+            try:
+                page_num = reader.get_destination_page_number(item)
+            except Exception as e:
+                self.logger.debug(f"无法解析书签目标页: {e}")
+                continue
+            
+            if page_num is None or page_num < 0:
+                continue
                 
-                self.logger.info(f"总共找到 {len(chapter_breaks)} 个章节")
+            title = str(item.title or '').strip()
+            breaks.append((page_num, title[:60].strip()))
+    
+    def find_outline_breaks(self, reader) -> List[Tuple[int, str]]:
+        """根据PDF书签（/Outlines）查找章节分割点，书签缺失或不可用时返回空列表"""
+        try:
+            outline = reader.outline
+        except Exception as e:
+            self.logger.debug(f"读取书签失败: {e}")
+            return []
+        
+        if not outline:
+            return []
+        
+        outline_breaks = []
+        self._walk_outline(reader, outline, 1, outline_breaks)
+        
+        # 每页只保留第一个书签，并按页码排序
+        seen_pages = set()
+        chapter_breaks = []
+        for page_num, title in sorted(outline_breaks, key=lambda x: x[0]):
+            if page_num in seen_pages or page_num >= len(reader.pages):
+                continue
+            seen_pages.add(page_num)
+            chapter_breaks.append((page_num, title))
+        
+        # 少于两个有效章节的书签视为退化，交由全文扫描处理
+        if len(chapter_breaks) < 2:
+            self.logger.info("书签不足以划分章节，改用全文扫描")
+            return []
+        
+        return chapter_breaks
+    
+    def _match_chapter_title(self, text: str) -> Optional[str]:
+        """在页面文本的候选标题行中查找章节标题，未找到时返回None"""
+        matcher = self.pattern_matcher
+        lines = text.split('\n')
+        
+        # 检查页面前10行和可能的标题位置
+        lines_to_check = lines[:10]
+        
+        # 如果页面很长，也检查中间部分可能的标题
+        if len(lines) > 20:
+            mid_start = len(lines) // 2 - 2
+            mid_end = len(lines) // 2 + 3
+            lines_to_check.extend(lines[mid_start:mid_end])
+        
+        for line in lines_to_check:
+            line = line.strip()
+            if not line or len(line) < 2:
+                continue
+            
+            # 跳过过长的行（可能是正文）
+            if len(line) > 100:
+                continue
+                
+            pattern_index = matcher.match(line)
+            if pattern_index is not None:
+                self.logger.debug(f"行 '{line[:60]}' 匹配模式: {matcher.patterns[pattern_index]}")
+                return line[:60].strip()  # 增加标题长度限制
+        
+        return None
+    
+    def _scan_pages(self, reader, start_page: int, end_page: int,
+                    page_texts: Optional[List[Optional[str]]] = None) -> List[Tuple[int, str]]:
+        """逐页扫描 [start_page, end_page) 范围内的文本，每页最多记录一个章节
+
+        传入 page_texts 时把每页提取的文本依次追加到其中，被预筛选排除的页面追加None。
+        """
+        chapter_breaks = []
+        
+        extract = self.extract_header_text_from_page if self.header_only else self.extract_text_from_page
+        progress = self.progress_callback
+        total_pages = len(reader.pages)
+        
+        skipped = 0
+        
+        for page_num in range(start_page, end_page):
+            if self.prefilter and not self.is_heading_candidate(reader, page_num):
+                text = ''
+                skipped += 1
+                if page_texts is not None:
+                    page_texts.append(None)
+            else:
+                text = extract(reader, page_num)
+                if page_texts is not None:
+                    page_texts.append(text)
+            if self.low_memory:
+                self._release_parsed_state(reader, page_num - start_page + 1)
+            if progress is not None:
+                self._emit('page_scanned', page=page_num + 1, total=total_pages)
+            if not text.strip():
+                continue
+            
+            chapter_title = self._match_chapter_title(text)
+            if chapter_title is None:
+                continue
                 
+            chapter_breaks.append((page_num, chapter_title))
+            self.logger.info(f"发现章节: 第{page_num + 1}页 - {chapter_title}")
+            if progress is not None:
+                self._emit('chapter_found', page=page_num + 1, title=chapter_title)
+        
+        if self.prefilter:
+            self.logger.info(f"预筛选排除了 {skipped}/{end_page - start_page} 页，其余页面完整提取文本")
+        return chapter_breaks
+    
+    def _scan_options(self) -> dict:
+        """传给扫描工作进程的配置，使其与当前实例的检测行为一致"""
+        return {
+            'chapter_patterns': list(self.chapter_patterns),
+            'header_only': self.header_only,
+            'header_lines': self.header_lines,
+            'header_ratio': self.header_ratio,
+            'prefilter': self.prefilter,
+        }
+    
+    def _scan_pages_parallel(self, total_pages: int,
+                             page_texts: Optional[List[Optional[str]]] = None) -> List[Tuple[int, str]]:
+        """将页面按连续分片分发到进程池扫描，并按页码顺序合并结果（page_texts 同 _scan_pages）"""
+        shard_size = -(-total_pages // self.workers)
+        shards = [(start, min(start + shard_size, total_pages)) for start in range(0, total_pages, shard_size)]
+        self.logger.info(f"使用 {len(shards)} 个进程并行扫描")
+        
+        try:
+            with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+                futures = {
+                    executor.submit(_scan_pages_worker, str(self.pdf_path), dict(self._scan_options(), **self._memory_options()),
+                                    start, end, page_texts is not None): end - start
+                    for start, end in shards
+                }
+                # 工作进程中无法回调，每个分片完成时报告一次进度
+                if self.progress_callback is not None:
+                    scanned = 0
+                    for future in as_completed(futures):
+                        scanned += futures[future]
+                        self._emit('page_scanned', page=scanned, total=total_pages)
+                # 按提交顺序收集，保证分片结果按页码顺序合并
+                chapter_breaks = []
+                shard_texts = []
+                for future in futures:
+                    breaks, texts = future.result()
+                    chapter_breaks.extend(breaks)
+                    shard_texts.extend(texts or [])
+        except Exception as e:
+            self.logger.warning(f"并行扫描失败，改为串行扫描: {e}")
+            return self._scan_pages(self.reader, 0, total_pages, page_texts)
+        
+        if page_texts is not None:
+            page_texts.extend(shard_texts)
+        
+        for page_num, chapter_title in chapter_breaks:
+            self.logger.info(f"发现章节: 第{page_num + 1}页 - {chapter_title}")
+            if self.progress_callback is not None:
+                self._emit('chapter_found', page=page_num + 1, title=chapter_title)
+        
+        return chapter_breaks
+    
+    def _detection_fingerprint(self) -> str:
+        """影响检测结果的全部配置的指纹，作为缓存键的一部分"""
+        options = self._scan_options()
+        options.update({
+            'version': self.DETECTION_VERSION,
+            'use_outline': self.use_outline,
+            'outline_depth': self.outline_depth,
+        })
+        return DetectionCache.fingerprint(options)
+    
+    def _get_detection_cache(self) -> Optional[DetectionCache]:
+        """按需打开检测结果缓存，打开失败时本次运行不再使用缓存"""
+        if not self.use_cache:
+            return None
+            
+        if self._detection_cache is None:
+            try:
+                self._detection_cache = DetectionCache(self.cache_dir, self.cache_max_entries)
+            except Exception as e:
+                self.logger.warning(f"无法打开检测缓存，已禁用: {e}")
+                self.use_cache = False
+                return None
+        
+        return self._detection_cache
+    
+    def _cache_key(self) -> Tuple[str, str]:
+        """(文件内容哈希, 检测配置指纹)"""
+        if self._content_hash is None:
+            self._content_hash = DetectionCache.file_hash(self.pdf_path)
+        return self._content_hash, self._detection_fingerprint()
+    
+    def find_chapter_breaks(self) -> List[Tuple[int, str]]:
+        """查找章节分割点，已检测过的文档直接使用缓存结果；reuse_text 时优先使用页面文本索引"""
+        if self.reuse_text:
+            index = self.load_text_index()
+            if index is not None:
+                self.from_cache = False
+                self.logger.info(f"使用页面文本索引重新匹配章节模式: {len(index)} 页")
+                return self.rescan_text_index(index)
+        
+        cache = self._get_detection_cache()
+        # 需要生成页面文本索引时不读取缓存
+        if cache is not None and not self.reuse_text:
+            try:
+                cached = cache.get(*self._cache_key())
+            except Exception as e:
+                self.logger.warning(f"读取检测缓存失败: {e}")
+                cached = None
+            if cached is not None:
+                chapter_breaks, self.detection_engine = cached
+                self.from_cache = True
+                self.logger.info(f"使用缓存的检测结果: {len(chapter_breaks)} 个章节")
+                return chapter_breaks
+        
+        self.from_cache = False
+        self.detection_engine = None
+        
+        try:
+            with self._pdf_context() as reader:
+                chapter_breaks = self._detect_chapter_breaks(reader)
         except Exception as e:
             self.logger.error(f"查找章节时出错: {e}")
             return []
         
+        if cache is not None:
+            cache.put(*self._cache_key(), chapter_breaks, self.detection_engine)
+        
+        return chapter_breaks
+    
+    def _detect_chapter_breaks(self, reader) -> List[Tuple[int, str]]:
+        """依次尝试书签和全文扫描查找章节分割点"""
+        if self.use_outline:
+            chapter_breaks = self.find_outline_breaks(reader)
+            if chapter_breaks:
+                self.detection_engine = 'outline'
+                for page_num, title in chapter_breaks:
+                    self.logger.info(f"发现章节: 第{page_num + 1}页 - {title}")
+                    if self.progress_callback is not None:
+                        self._emit('chapter_found', page=page_num + 1, title=title)
+                self.logger.info(f"根据书签找到 {len(chapter_breaks)} 个章节")
+                return chapter_breaks
+        
+        self.detection_engine = 'text'
+        total_pages = len(reader.pages)
+        self.logger.info(f"开始扫描 {total_pages} 页以查找章节...")
+        
+        page_texts = [] if self.text_index_path is not None else None
+        if self.workers > 1 and total_pages >= self.parallel_min_pages:
+            chapter_breaks = self._scan_pages_parallel(total_pages, page_texts)
+        else:
+            chapter_breaks = self._scan_pages(reader, 0, total_pages, page_texts)
+        
+        if page_texts is not None and len(page_texts) == total_pages:
+            self._save_text_index(page_texts)
+        
+        return self._finish_text_breaks(chapter_breaks)
+    
+    def _finish_text_breaks(self, chapter_breaks: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """去重并按页码排序全文扫描找到的章节"""
+        chapter_breaks = list(dict.fromkeys(chapter_breaks))  # 去重保持顺序
+        chapter_breaks.sort(key=lambda x: x[0])  # 按页码排序
+        
+        self.logger.info(f"总共找到 {len(chapter_breaks)} 个章节")
         return chapter_breaks
     
+    def _text_index_options(self) -> dict:
+        """影响提取出的页面文本的配置，与索引中保存的不一致时索引失效"""
+        return {
+            'version': self.DETECTION_VERSION,
+            'header_only': self.header_only,
+            'header_lines': self.header_lines,
+            'header_ratio': self.header_ratio,
+            'prefilter': self.prefilter,
+        }
+    
+    def _save_text_index(self, page_texts: List[Optional[str]]):
+        """保存页面文本索引，失败时只记录警告"""
+        try:
+            self.text_index_path.parent.mkdir(parents=True, exist_ok=True)
+            index = PageTextIndex(page_texts, PageTextIndex.source_info(self.pdf_path), self._text_index_options())
+            index.save(self.text_index_path)
+            self.logger.info(f"页面文本索引已保存: {self.text_index_path}")
+        except Exception as e:
+            self.logger.warning(f"保存页面文本索引失败: {e}")
+    
+    def load_text_index(self) -> Optional[PageTextIndex]:
+        """读取与当前源文件和提取配置一致的页面文本索引，不存在或已过期时返回None"""
+        if self.text_index_path is None or not self.text_index_path.exists():
+            return None
+        
+        try:
+            index = PageTextIndex.load(self.text_index_path)
+            if index.matches(PageTextIndex.source_info(self.pdf_path), self._text_index_options()):
+                return index
+            self.logger.info("源文件或提取配置已变化，页面文本索引已过期")
+        except Exception as e:
+            self.logger.warning(f"读取页面文本索引失败: {e}")
+        return None
+    
+    def rescan_text_index(self, index: PageTextIndex) -> List[Tuple[int, str]]:
+        """用当前的章节模式重新匹配索引中保存的页面文本，不打开PDF"""
+        self.detection_engine = 'text_index'
+        progress = self.progress_callback
+        chapter_breaks = []
+        for page_num, text in enumerate(index.texts):
+            if not text or not text.strip():
+                continue
+            chapter_title = self._match_chapter_title(text)
+            if chapter_title is None:
+                continue
+            chapter_breaks.append((page_num, chapter_title))
+            self.logger.info(f"发现章节: 第{page_num + 1}页 - {chapter_title}")
+            if progress is not None:
+                self._emit('chapter_found', page=page_num + 1, title=chapter_title)
+        
+        skipped = index.skipped
+        if skipped:
+            self.logger.warning(f"索引中有 {len(skipped)} 页被预筛选排除、没有文本，这些页面上的章节无法检测")
+        return self._finish_text_breaks(chapter_breaks)
+    
     def create_output_directory(self) -> bool:
         """创建输出目录"""
         try:
@@ -211,16 +1008,31 @@ class PDFChapterSplitter:
     
     def split_pdf_by_chapters(self) -> bool:
         """按章节分割PDF"""
-        # 验证PDF文件
-        if not self.validate_pdf():
+        if not self._check_file():
+            return False
+            
+        # 整个作业只解析一次PDF
+        try:
+            with self.session():
+                return self._split_pdf_by_chapters()
+        except Exception as e:
+            self.logger.error(f"分割过程中出错: {e}")
             return False
+    
+    def _split_pdf_by_chapters(self) -> bool:
+        """在已打开的会话中按章节分割PDF"""
+        # 验证PDF文件
+        with self._timed('validate'):
+            if not self.validate_pdf():
+                return False
         
         # 创建输出目录
         if not self.create_output_directory():
             return False
         
         # 查找章节分割点
-        chapter_breaks = self.find_chapter_breaks()
+        with self._timed('detect'):
+            chapter_breaks = self.find_chapter_breaks()
         
         if not chapter_breaks:
             self.logger.warning("未找到章节标记，尝试按页数均匀分割...")
@@ -231,25 +1043,10 @@ class PDFChapterSplitter:
             self.logger.warning("只找到一个章节，可能检测有误，尝试按页数分割...")
             return self.split_pdf_evenly()
         
-        success = True
         try:
             with self._pdf_context() as reader:
-                total_pages = len(reader.pages)
-                
-                for i, (start_page, title) in enumerate(chapter_breaks):
-                    # 计算结束页面
-                    if i + 1 < len(chapter_breaks):
-                        end_page = chapter_breaks[i + 1][0] - 1
-                    else:
-                        end_page = total_pages - 1
-                    
-                    # 确保页面范围有效
-                    if start_page > end_page or start_page >= total_pages:
-                        self.logger.warning(f"章节 {i+1} 页面范围无效: {start_page}-{end_page}")
-                        continue
-                    
-                    if not self.extract_pages_to_pdf(reader, start_page, end_page, title, i + 1):
-                        success = False
+                manifest = self._plan_chapters(reader, chapter_breaks)
+                success = self.write_manifest(reader, manifest)
                         
                 if success:
                     self.logger.info(f"PDF按章节分割完成！输出目录: {self.output_dir}")
@@ -262,49 +1059,274 @@ class PDFChapterSplitter:
         
         return success
     
-    def extract_pages_to_pdf(self, reader, start_page: int, end_page: int, title: str, chapter_num: int) -> bool:
-        """提取指定页面范围到新的PDF文件"""
-        try:
-            writer = PyPDF2.PdfWriter()
-            pages_added = 0
-            
-            for page_num in range(start_page, end_page + 1):
-                if page_num < len(reader.pages):
-                    try:
-                        page = reader.pages[page_num]
-                        writer.add_page(page)
-                        pages_added += 1
-                    except Exception as e:
-                        self.logger.warning(f"添加第{page_num + 1}页时出错: {e}")
-                        continue
+    def _plan_chapters(self, reader, chapter_breaks: List[Tuple[int, str]]) -> List[dict]:
+        """根据章节分割点计算每个章节的页面范围和输出文件名"""
+        total_pages = len(reader.pages)
+        reserved = set()
+        manifest = []
+        
+        for i, (start_page, title) in enumerate(chapter_breaks):
+            # 计算结束页面
+            if i + 1 < len(chapter_breaks):
+                end_page = chapter_breaks[i + 1][0] - 1
+            else:
+                end_page = total_pages - 1
             
-            if pages_added == 0:
-                self.logger.error(f"章节 {chapter_num} 没有成功添加任何页面")
-                return False
+            # 确保页面范围有效
+            if start_page > end_page or start_page >= total_pages:
+                self.logger.warning(f"章节 {i+1} 页面范围无效: {start_page}-{end_page}")
+                continue
             
             clean_title = self.sanitize_filename(title)
-            filename = f"第{chapter_num:02d}章_{clean_title}.pdf"
-            output_path = self.output_dir / filename
-            
-            # 确保文件名不会重复
-            counter = 1
-            original_path = output_path
-            while output_path.exists():
-                stem = original_path.stem
-                suffix = original_path.suffix
-                output_path = original_path.parent / f"{stem}_{counter}{suffix}"
-                counter += 1
-            
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            # 验证输出文件
-            if not output_path.exists() or output_path.stat().st_size == 0:
-                self.logger.error(f"输出文件创建失败或为空: {output_path}")
-                return False
+            output_path = self._reserve_output_path(f"第{i + 1:02d}章_{clean_title}.pdf", reserved)
+            manifest.append({
+                'kind': 'chapter',
+                'chapter_num': i + 1,
+                'title': title,
+                'start_page': start_page,
+                'end_page': end_page,
+                'filename': output_path.name
+            })
+        
+        return manifest
+    
+    def _plan_sections(self, reader, pages_per_section: int) -> List[dict]:
+        """按固定页数计算每个部分的页面范围和输出文件名"""
+        total_pages = len(reader.pages)
+        reserved = set()
+        manifest = []
+        
+        for section_num, start_page in enumerate(range(0, total_pages, pages_per_section), 1):
+            end_page = min(start_page + pages_per_section - 1, total_pages - 1)
+            filename = f"第{section_num:02d}部分_第{start_page + 1}-{end_page + 1}页.pdf"
+            output_path = self._reserve_output_path(filename, reserved)
+            manifest.append({
+                'kind': 'section',
+                'chapter_num': section_num,
+                'title': f"第{section_num}部分",
+                'start_page': start_page,
+                'end_page': end_page,
+                'filename': output_path.name
+            })
+        
+        return manifest
+    
+    def _manifest_jobs(self, manifest: List[dict]) -> List[Tuple[int, int, Path, str]]:
+        """把分割方案转换为写入任务"""
+        return [
+            (
+                entry['start_page'],
+                entry['end_page'],
+                self.output_dir / entry['filename'],
+                f"章节 {entry['chapter_num']}" if entry['kind'] == 'chapter' else entry['title']
+            )
+            for entry in manifest
+        ]
+    
+    def plan_split(self, pages_per_section: int = 10) -> List[dict]:
+        """只计算分割方案而不写文件：返回每个输出文件的章节号、标题、页面范围和文件名
+
+        未找到足够的章节时与 split_pdf_by_chapters 一样退回按页数均匀分割。
+        """
+        if not self._check_file():
+            return []
+        
+        if pages_per_section <= 0:
+            pages_per_section = 10
+        
+        try:
+            with self.session() as reader:
+                with self._timed('validate'):
+                    if not self.validate_pdf():
+                        return []
+                
+                with self._timed('detect'):
+                    chapter_breaks = self.find_chapter_breaks()
+                if len(chapter_breaks) < 2:
+                    self.logger.warning("未找到足够的章节标记，按页数均匀分割")
+                    return self._plan_sections(reader, pages_per_section)
+                
+                return self._plan_chapters(reader, chapter_breaks)
+                
+        except Exception as e:
+            self.logger.error(f"计算分割方案失败: {e}")
+            return []
+    
+    def write_manifest(self, reader, manifest: List[dict]) -> bool:
+        """按 plan_split 返回的分割方案在输出目录中写出全部文件，reader 为 session() 打开的PDF"""
+        return self._write_jobs(reader, self._manifest_jobs(manifest))
+    
+    def write_manifest_entry(self, entry: dict, output_path: Optional[str] = None) -> bool:
+        """按 plan_split 返回的一项生成对应的PDF文件，默认写入输出目录"""
+        output_path = Path(output_path) if output_path else self.output_dir / entry['filename']
+        start_page, end_page = entry['start_page'], entry['end_page']
+        
+        try:
+            with self._pdf_context() as reader, self._timed('write'):
+                pages_added, size_before = self._write_page_range(reader, start_page, end_page, output_path)
+                return self._check_written(output_path, start_page, end_page, pages_added, entry['title'], size_before)
+        except Exception as e:
+            self.logger.error(f"创建{entry['title']}PDF失败: {e}")
+            return False
+    
+    def _reserve_output_path(self, filename: str, reserved: set) -> Path:
+        """确定输出文件路径并避免与已有文件或本次已分配的文件重名"""
+        output_path = self.output_dir / filename
+        
+        # 确保文件名不会重复
+        counter = 1
+        original_path = output_path
+        while output_path.exists() or output_path in reserved:
+            stem = original_path.stem
+            suffix = original_path.suffix
+            output_path = original_path.parent / f"{stem}_{counter}{suffix}"
+            counter += 1
+        
+        reserved.add(output_path)
+        return output_path
+    
+    def _write_page_range(self, reader, start_page: int, end_page: int, output_path: Path) -> Tuple[int, Optional[int]]:
+        """把指定页面范围写入 output_path，返回 (成功添加的页数, 优化前字节数)；页数为0时不写文件"""
+        if self.write_engine == 'raw' and not self.optimize_output:
+            try:
+                return self._write_page_range_raw(reader, start_page, end_page, output_path), None
+            except Exception as e:
+                # 之后的文件也不再尝试，直接使用常规写入
+                self.logger.warning(f"无法直接复制原始对象，改用常规写入: {e}")
+                self.write_engine = 'standard'
+        
+        writer = PyPDF2.PdfWriter()
+        pages_added = 0
+        
+        for page_num in range(start_page, end_page + 1):
+            if page_num < len(reader.pages):
+                try:
+                    page = reader.pages[page_num]
+                    writer.add_page(page)
+                    pages_added += 1
+                except Exception as e:
+                    self.logger.warning(f"添加第{page_num + 1}页时出错: {e}")
+                    continue
+        
+        if pages_added == 0:
+            return 0, None
+        
+        size_before = None
+        if self.optimize_output:
+            # 先序列化一次得到优化前的大小，用于报告优化效果
+            buffer = BytesIO()
+            writer.write(buffer)
+            size_before = buffer.tell()
+            stats = optimize_writer(writer)
+            self.logger.debug(f"{output_path.name}: 删除未使用资源 {stats['removed_resources']} 个，"
+                              f"合并相同对象 {stats['merged_objects']} 个")
+        
+        with open(output_path, 'wb') as output_file:
+            writer.write(output_file)
+        
+        # 章节之间不保留reader的解析缓存；writer与复制的对象互相引用，需要循环回收才能立即释放
+        if self.low_memory:
+            del writer
+            reader.resolved_objects.clear()
+            gc.collect()
+        
+        return pages_added, size_before
+    
+    def _write_page_range_raw(self, reader, start_page: int, end_page: int, output_path: Path) -> int:
+        """按原始字节复制页面范围及其引用的对象，返回写入的页数；页数为0时不写文件"""
+        if self._raw_copier is None or self._raw_copier.reader is not reader:
+            self._raw_copier = RawPageCopier(reader)
+        
+        page_numbers = [page_num for page_num in range(start_page, end_page + 1) if page_num < len(reader.pages)]
+        if not page_numbers:
+            return 0
+        
+        with open(output_path, 'wb') as output_file:
+            pages_added = self._raw_copier.write(page_numbers, output_file)
+        
+        if self.low_memory:
+            self._raw_copier.clear_cache()
+            reader.resolved_objects.clear()
+        return pages_added
+    
+    def _check_written(self, output_path: Path, start_page: int, end_page: int, pages_added: int, label: str,
+                       size_before: Optional[int] = None) -> bool:
+        """检查写入结果并记录日志"""
+        if pages_added == 0:
+            self.logger.error(f"{label} 没有成功添加任何页面")
+            return False
+        
+        # 验证输出文件
+        if not output_path.exists() or output_path.stat().st_size == 0:
+            self.logger.error(f"输出文件创建失败或为空: {output_path}")
+            return False
+        
+        self.bytes_out += output_path.stat().st_size
+        self.logger.info(f"已创建: {output_path.name} (第{start_page + 1}-{end_page + 1}页, {pages_added}页)")
+        if size_before is not None:
+            size_after = output_path.stat().st_size
+            self.logger.info(f"输出优化: {output_path.name} {size_before / 1024:.1f} KB -> {size_after / 1024:.1f} KB "
+                             f"({(size_before - size_after) / size_before:.1%})")
+        return True
+    
+    def _write_jobs(self, reader, jobs: List[Tuple[int, int, Path, str]]) -> bool:
+        """写入一组 (起始页, 结束页, 输出路径, 名称) 任务，全部成功时返回True"""
+        with self._timed('write'):
+            if self.write_workers > 1 and len(jobs) > 1:
+                try:
+                    return self._write_jobs_parallel(jobs)
+                except BrokenProcessPool as e:
+                    self.logger.warning(f"并行写入失败，改为串行写入: {e}")
             
-            self.logger.info(f"已创建: {output_path.name} (第{start_page + 1}-{end_page + 1}页, {pages_added}页)")
-            return True
+            success = True
+            for index, (start_page, end_page, output_path, label) in enumerate(jobs, 1):
+                try:
+                    pages_added, size_before = self._write_page_range(reader, start_page, end_page, output_path)
+                    written = self._check_written(output_path, start_page, end_page, pages_added, label, size_before)
+                except Exception as e:
+                    self.logger.error(f"创建{label}PDF失败: {e}")
+                    written = False
+                
+                success = success and written
+                if self.progress_callback is not None:
+                    self._emit('chapter_written', index=index, total=len(jobs), filename=output_path.name, success=written)
+            
+            return success
+    
+    def _write_jobs_parallel(self, jobs: List[Tuple[int, int, Path, str]]) -> bool:
+        """把写入任务分发到进程池，每个工作进程独立打开PDF；文件名已在主进程中确定"""
+        self.logger.info(f"使用 {min(self.write_workers, len(jobs))} 个进程并行写入 {len(jobs)} 个文件")
+        
+        success = True
+        with ProcessPoolExecutor(max_workers=min(self.write_workers, len(jobs)), initializer=_init_write_worker,
+                                 initargs=(str(self.pdf_path), self.optimize_output, self._memory_options(),
+                                           self.write_engine)) as executor:
+            futures = [
+                executor.submit(_write_pages_worker, start_page, end_page, str(output_path))
+                for start_page, end_page, output_path, _ in jobs
+            ]
+            # 按提交顺序汇总，日志与串行模式一致
+            for index, ((start_page, end_page, output_path, label), future) in enumerate(zip(jobs, futures), 1):
+                try:
+                    pages_added, size_before = future.result()
+                    written = self._check_written(output_path, start_page, end_page, pages_added, label, size_before)
+                except Exception as e:
+                    self.logger.error(f"创建{label}PDF失败: {e}")
+                    written = False
+                
+                success = success and written
+                if self.progress_callback is not None:
+                    self._emit('chapter_written', index=index, total=len(jobs), filename=output_path.name, success=written)
+        
+        return success
+    
+    def extract_pages_to_pdf(self, reader, start_page: int, end_page: int, title: str, chapter_num: int) -> bool:
+        """提取指定页面范围到新的PDF文件"""
+        try:
+            clean_title = self.sanitize_filename(title)
+            output_path = self._reserve_output_path(f"第{chapter_num:02d}章_{clean_title}.pdf", set())
+            pages_added, size_before = self._write_page_range(reader, start_page, end_page, output_path)
+            return self._check_written(output_path, start_page, end_page, pages_added, f"章节 {chapter_num}", size_before)
             
         except Exception as e:
             self.logger.error(f"创建章节PDF失败: {e}")
@@ -317,54 +1339,10 @@ class PDFChapterSplitter:
             
         try:
             with self._pdf_context() as reader:
-                total_pages = len(reader.pages)
-                section_num = 1
-                success = True
-                
                 self.logger.info(f"开始按 {pages_per_section} 页/节均匀分割 PDF...")
                 
-                for start_page in range(0, total_pages, pages_per_section):
-                    end_page = min(start_page + pages_per_section - 1, total_pages - 1)
-                    
-                    writer = PyPDF2.PdfWriter()
-                    pages_added = 0
-                    
-                    for page_num in range(start_page, end_page + 1):
-                        try:
-                            writer.add_page(reader.pages[page_num])
-                            pages_added += 1
-                        except Exception as e:
-                            self.logger.warning(f"添加第{page_num + 1}页时出错: {e}")
-                            continue
-                    
-                    if pages_added == 0:
-                        self.logger.warning(f"第{section_num}部分没有成功添加任何页面")
-                        success = False
-                        continue
-                    
-                    filename = f"第{section_num:02d}部分_第{start_page + 1}-{end_page + 1}页.pdf"
-                    output_path = self.output_dir / filename
-                    
-                    # 处理文件名冲突
-                    counter = 1
-                    original_path = output_path
-                    while output_path.exists():
-                        stem = original_path.stem
-                        suffix = original_path.suffix
-                        output_path = original_path.parent / f"{stem}_{counter}{suffix}"
-                        counter += 1
-                    
-                    with open(output_path, 'wb') as output_file:
-                        writer.write(output_file)
-                    
-                    # 验证输出文件
-                    if not output_path.exists() or output_path.stat().st_size == 0:
-                        self.logger.error(f"输出文件创建失败或为空: {output_path}")
-                        success = False
-                        continue
-                    
-                    self.logger.info(f"已创建: {output_path.name} ({pages_added}页)")
-                    section_num += 1
+                jobs = self._manifest_jobs(self._plan_sections(reader, pages_per_section))
+                success = self._write_jobs(reader, jobs)
                 
                 if success:
                     self.logger.info(f"PDF均匀分割完成！输出目录: {self.output_dir}")
@@ -419,6 +1397,61 @@ class PDFChapterSplitter:
             return {'total_pages': 0}
 
 
+def _scan_pages_worker(pdf_path: str, options: dict, start_page: int, end_page: int,
+                       collect_text: bool = False) -> Tuple[List[Tuple[int, str]], Optional[List[Optional[str]]]]:
+    """进程池工作函数：独立打开PDF并扫描一个连续的页面分片，返回 (章节分割点, 每页文本或None)"""
+    options = dict(options)
+    chapter_patterns = options.pop('chapter_patterns')
+    splitter = PDFChapterSplitter(pdf_path, **options)
+    splitter.chapter_patterns = chapter_patterns
+    splitter.logger.setLevel(logging.WARNING)
+    page_texts = [] if collect_text else None
+    with splitter._pdf_context() as reader:
+        return splitter._scan_pages(reader, start_page, end_page, page_texts), page_texts
+
+
+# 写入工作进程持有的splitter，在进程初始化时打开一次PDF并在整个进程生命周期内复用
+_write_worker_splitter = None
+
+
+def _init_write_worker(pdf_path: str, optimize_output: bool = False, memory_options: Optional[dict] = None,
+                       write_engine: str = 'standard'):
+    """写入进程池初始化函数：每个工作进程独立打开并解析一次PDF"""
+    global _write_worker_splitter
+    splitter = PDFChapterSplitter(pdf_path, optimize_output=optimize_output, write_engine=write_engine,
+                                  **(memory_options or {}))
+    splitter.logger.setLevel(logging.WARNING)
+    splitter._open_reader()
+    _write_worker_splitter = splitter
+
+
+def _write_pages_worker(start_page: int, end_page: int, output_path: str) -> Tuple[int, Optional[int]]:
+    """进程池工作函数：用本进程的reader把一个页面范围写入指定文件"""
+    splitter = _write_worker_splitter
+    return splitter._write_page_range(splitter.reader, start_page, end_page, Path(output_path))
+
+
+def print_profile(profile: dict):
+    """打印 PDFChapterSplitter.profile() 的各阶段耗时和吞吐量"""
+    phase_names = {'parse': '解析', 'validate': '验证', 'detect': '检测', 'write': '写入'}
+    engine_names = {'outline': 'PDF书签', 'text': '全文扫描'}
+    
+    print("\n性能分析:")
+    for phase, seconds in profile['phases'].items():
+        share = seconds / profile['total_seconds'] if profile['total_seconds'] else 0
+        print(f"  {phase_names.get(phase, phase)}: {seconds:.3f}s ({share:.0%})")
+    print(f"  合计: {profile['total_seconds']:.3f}s")
+    if profile['pages_per_second']:
+        print(f"  页数: {profile['pages']}, {profile['pages_per_second']:.1f} 页/秒")
+    if profile['detection_engine']:
+        print(f"  检测方式: {engine_names.get(profile['detection_engine'], profile['detection_engine'])}"
+              f"{'（缓存）' if profile['from_cache'] else ''}")
+    if profile['bytes_in'] is not None:
+        print(f"  输入: {profile['bytes_in'] / 1024 / 1024:.2f} MB, 输出: {profile['bytes_out'] / 1024 / 1024:.2f} MB")
+    if profile['peak_rss_bytes'] is not None:
+        print(f"  内存峰值: {profile['peak_rss_bytes'] / 1024 / 1024:.1f} MB")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='PDF章节分割工具',
@@ -429,6 +1462,17 @@ def main():
   python pdf_chapter_splitter.py document.pdf -o output_folder   # 指定输出目录
   python pdf_chapter_splitter.py document.pdf -p 15             # 设置每节页数
   python pdf_chapter_splitter.py document.pdf --pattern "^附录.*"  # 添加自定义匹配模式
+  python pdf_chapter_splitter.py document.pdf --outline-depth 2  # 使用前两级书签划分章节
+  python pdf_chapter_splitter.py document.pdf --workers 8       # 使用8个进程并行扫描章节
+  python pdf_chapter_splitter.py document.pdf --write-workers 4 # 使用4个进程并行写入章节文件
+  python pdf_chapter_splitter.py document.pdf --optimize        # 精简输出文件（删除未使用资源、合并相同对象）
+  python pdf_chapter_splitter.py scan.pdf --write-engine raw     # 直接复制原始对象字节，适合图片较多的PDF
+  python pdf_chapter_splitter.py document.pdf --header-only --header-ratio 0.3  # 只扫描页面顶部30%区域
+  python pdf_chapter_splitter.py document.pdf --prefilter       # 先按字号和字面文字预筛选，只完整提取候选页
+  python pdf_chapter_splitter.py document.pdf --no-cache        # 不使用检测结果缓存
+  python pdf_chapter_splitter.py document.pdf --reuse-text --dry-run --pattern "^附录.*"  # 用保存的页面文本重新匹配，不重新提取
+  python pdf_chapter_splitter.py document.pdf --profile         # 输出各阶段耗时、吞吐量和内存峰值
+  python pdf_chapter_splitter.py scan.pdf --memory-limit 512    # 低内存模式，常驻内存超过512MB时提前释放缓存
         """
     )
     
@@ -438,6 +1482,29 @@ def main():
     parser.add_argument('--pattern', help='添加自定义章节匹配模式（正则表达式）', action='append')
     parser.add_argument('-v', '--verbose', action='store_true', help='显示详细输出')
     parser.add_argument('--dry-run', action='store_true', help='仅显示会找到的章节，不实际分割')
+    parser.add_argument('--no-outline', action='store_true', help='不使用PDF书签，始终扫描全文检测章节')
+    parser.add_argument('--outline-depth', type=int, help='使用书签检测章节时的最大层级（默认1，仅顶层）', default=1)
+    parser.add_argument('--workers', type=int, help='并行扫描章节的进程数（默认1，页数较少时自动串行）', default=1)
+    parser.add_argument('--write-workers', type=int, help='并行写入章节文件的进程数（默认1）', default=1)
+    parser.add_argument('--optimize', action='store_true', help='写入前删除未使用的资源并合并相同对象，并报告优化前后的大小')
+    parser.add_argument('--write-engine', choices=PDFChapterSplitter.WRITE_ENGINES, default='standard',
+                        help='写入方式：standard 由PyPDF2重新序列化页面，raw 直接复制原始对象字节（更快，与 --optimize 同时使用时仍为 standard）')
+    parser.add_argument('--header-only', action='store_true', help='只提取页面顶部区域的文本检测章节（更快，但不检查页面中部）')
+    parser.add_argument('--header-lines', type=int, help='页眉模式下每页最多提取的文本行数（默认10）', default=10)
+    parser.add_argument('--header-ratio', type=float, help='页眉模式下提取的页面顶部比例，0-1之间（默认不限制）', default=None)
+    parser.add_argument('--prefilter', action='store_true',
+                        help='先检查内容流中的字号和字面文字，只对可能是章节首页的页面完整提取文本（更快，标题字号与正文相同时可能漏检）')
+    parser.add_argument('--reuse-text', action='store_true',
+                        help='使用页面文本索引重新匹配章节模式，不重新提取文本；索引不存在或已过期时扫描全文并生成索引')
+    parser.add_argument('--text-index', help=f'页面文本索引文件路径（默认为输出目录下的 {PDFChapterSplitter.TEXT_INDEX_FILENAME}）；'
+                                             '指定时全文扫描后保存索引', default=None)
+    parser.add_argument('--no-cache', action='store_true', help='不读取也不保存章节检测结果缓存')
+    parser.add_argument('--cache-dir', help='检测结果缓存目录（默认 ~/.cache/pdf-chapter-splitter）', default=None)
+    parser.add_argument('--cache-size', type=int, help=f'检测结果缓存最多保存的条目数（默认{DetectionCache.DEFAULT_MAX_ENTRIES}）',
+                        default=DetectionCache.DEFAULT_MAX_ENTRIES)
+    parser.add_argument('--low-memory', action='store_true', help='低内存模式：按页窗口释放已解析的对象，限制处理大文件时的内存占用')
+    parser.add_argument('--memory-limit', type=int, help='内存上限（MB），超过时立即释放缓存；指定后自动启用低内存模式', default=None)
+    parser.add_argument('--profile', action='store_true', help='结束后输出解析、验证、检测、写入各阶段的耗时、吞吐量和内存峰值')
     
     args = parser.parse_args()
     
@@ -450,6 +1517,30 @@ def main():
         print("错误: 页数必须大于0")
         sys.exit(1)
     
+    if args.outline_depth <= 0:
+        print("错误: 书签层级必须大于0")
+        sys.exit(1)
+    
+    if args.workers <= 0 or args.write_workers <= 0:
+        print("错误: 进程数必须大于0")
+        sys.exit(1)
+    
+    if args.header_lines <= 0:
+        print("错误: 页眉行数必须大于0")
+        sys.exit(1)
+    
+    if args.header_ratio is not None and not 0 < args.header_ratio < 1:
+        print("错误: 页眉比例必须在0到1之间")
+        sys.exit(1)
+    
+    if args.cache_size <= 0:
+        print("错误: 缓存条目数必须大于0")
+        sys.exit(1)
+    
+    if args.memory_limit is not None and args.memory_limit <= 0:
+        print("错误: 内存上限必须大于0")
+        sys.exit(1)
+    
     pdf_path = Path(args.pdf_path)
     if not pdf_path.exists():
         print(f"错误: 文件 '{pdf_path}' 不存在")
@@ -460,7 +1551,30 @@ def main():
         sys.exit(1)
     
     try:
-        splitter = PDFChapterSplitter(str(pdf_path), args.output)
+        splitter = PDFChapterSplitter(
+            str(pdf_path),
+            args.output,
+            use_outline=not args.no_outline,
+            outline_depth=args.outline_depth,
+            workers=args.workers,
+            write_workers=args.write_workers,
+            optimize_output=args.optimize,
+            write_engine=args.write_engine,
+            header_only=args.header_only,
+            header_lines=args.header_lines,
+            header_ratio=args.header_ratio,
+            prefilter=args.prefilter,
+            use_cache=not args.no_cache,
+            cache_dir=args.cache_dir,
+            cache_max_entries=args.cache_size,
+            low_memory=args.low_memory,
+            memory_limit_mb=args.memory_limit,
+            text_index_path=args.text_index,
+            reuse_text=args.reuse_text
+        )
+        if args.reuse_text and args.text_index is None:
+            splitter.text_index_path = splitter.output_dir / PDFChapterSplitter.TEXT_INDEX_FILENAME
+            splitter.reuse_text = True
         
         # 添加自定义模式
         if args.pattern:
@@ -474,17 +1588,34 @@ def main():
         
         # 如果是演练模式，只显示章节检测结果
         if args.dry_run:
-            if not splitter.validate_pdf():
-                print("PDF文件验证失败")
-                sys.exit(1)
-            
-            chapter_breaks = splitter.find_chapter_breaks()
+            text_index = splitter.load_text_index() if splitter.reuse_text else None
+            if text_index is not None:
+                # 索引可用时不需要打开PDF
+                with splitter._timed('detect'):
+                    chapter_breaks = splitter.rescan_text_index(text_index)
+            else:
+                with splitter.session():
+                    with splitter._timed('validate'):
+                        if not splitter.validate_pdf():
+                            print("PDF文件验证失败")
+                            sys.exit(1)
+                    
+                    with splitter._timed('detect'):
+                        chapter_breaks = splitter.find_chapter_breaks()
+            engine_names = {'outline': 'PDF书签', 'text': '全文扫描', 'text_index': '页面文本索引'}
+            print(f"检测方式: {engine_names.get(splitter.detection_engine, '未知')}"
+                  f"{'（缓存）' if splitter.from_cache else ''}")
             if chapter_breaks:
                 print(f"\n找到 {len(chapter_breaks)} 个章节:")
                 for i, (page, title) in enumerate(chapter_breaks, 1):
                     print(f"  {i}. 第{page + 1}页: {title}")
             else:
                 print("未找到章节标记")
+            rss = peak_rss_bytes()
+            if rss is not None:
+                print(f"\n内存峰值: {rss / 1024 / 1024:.1f} MB{'（低内存模式）' if splitter.low_memory else ''}")
+            if args.profile:
+                print_profile(splitter.profile())
             return
         
         # 执行分割
@@ -498,6 +1629,11 @@ def main():
             print(f"分割完成！输出目录: {splitter.output_dir}")
         else:
             print("分割失败")
+        
+        if args.profile:
+            print_profile(splitter.profile())
+        
+        if not success:
             sys.exit(1)
             
     except KeyboardInterrupt:
@@ -0,0 +1,226 @@
+import hashlib
+import re
+from io import BytesIO
+from typing import Dict, Optional, Set
+
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    StreamObject,
+)
+
+# 页面 /Resources 中按名称引用的资源类别
+RESOURCE_CATEGORIES = ('/Font', '/XObject', '/ExtGState', '/ColorSpace', '/Pattern', '/Shading', '/Properties')
+
+# 页面树节点需要保持各自独立，不能合并
+_UNMERGEABLE_TYPES = ('/Page', '/Pages', '/Catalog')
+
+_NAME_RE = re.compile(rb'/([^\s/\[\]()<>{}%]+)')
+_NAME_ESCAPE_RE = re.compile(rb'#([0-9a-fA-F]{2})')
+
+
+def _stream_names(contents) -> Optional[Set[str]]:
+    """内容流（或内容流数组）中出现的全部名称，无法读取时返回None"""
+    if contents is None:
+        return set()
+
+    try:
+        contents = contents.get_object()
+        streams = contents if isinstance(contents, ArrayObject) else [contents]
+        data = b'\n'.join(stream.get_object().get_data() for stream in streams)
+    except Exception:
+        return None
+
+    names = set()
+    for raw in _NAME_RE.findall(data):
+        if b'#' in raw:
+            raw = _NAME_ESCAPE_RE.sub(lambda m: bytes([int(m.group(1), 16)]), raw)
+        names.add('/' + raw.decode('latin-1'))
+    return names
+
+
+def _content_names(page, resources) -> Optional[Set[str]]:
+    """页面内容流和继承页面资源的内容流中出现的全部名称，任一内容流无法读取时返回None
+
+    没有自己 /Resources 的表单XObject使用页面的资源，其中引用的名称也计为已使用（递归）；
+    同样继承页面资源的平铺图案和Type3字体难以逐个分析，页面用到时返回None，不删除该页的资源。
+    """
+    names = _stream_names(page.get('/Contents'))
+    if names is None:
+        return None
+
+    try:
+        xobjects = resources.get('/XObject')
+        xobjects = xobjects.get_object() if xobjects is not None else {}
+        pending = [name for name in names if name in xobjects]
+        visited = set()
+        while pending:
+            name = pending.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+            form = xobjects[name].get_object()
+            if form.get('/Subtype') != '/Form' or '/Resources' in form:
+                continue
+            form_names = _stream_names(form)
+            if form_names is None:
+                return None
+            names |= form_names
+            pending.extend(n for n in form_names if n in xobjects)
+
+        for category, inherits in (('/Pattern', lambda obj: obj.get('/PatternType') == 1),
+                                   ('/Font', lambda obj: obj.get('/Subtype') == '/Type3')):
+            entries = resources.get(category)
+            for name, ref in (entries.get_object().items() if entries is not None else ()):
+                obj = ref.get_object()
+                if name in names and isinstance(obj, DictionaryObject) and inherits(obj) and '/Resources' not in obj:
+                    return None
+    except Exception:
+        return None
+    return names
+
+
+def prune_unused_resources(writer) -> int:
+    """删除各页面 /Resources 中内容流未引用的字体、图片等资源，返回删除的条目数
+
+    共享的资源字典会先复制再修改，不影响其他页面。
+    """
+    removed = 0
+    for page in writer.pages:
+        resources = page.get('/Resources')
+        if resources is None:
+            continue
+        resources = resources.get_object()
+
+        used = _content_names(page, resources)
+        if used is None:
+            continue
+
+        pruned = DictionaryObject()
+        for key, value in resources.items():
+            category = value.get_object() if key in RESOURCE_CATEGORIES else None
+            if isinstance(category, DictionaryObject):
+                kept = DictionaryObject({name: ref for name, ref in category.items() if name in used})
+                removed += len(category) - len(kept)
+                pruned[NameObject(key)] = kept
+            else:
+                pruned[NameObject(key)] = value
+        page[NameObject('/Resources')] = pruned
+
+    return removed
+
+
+def _children(obj):
+    if isinstance(obj, DictionaryObject):
+        return obj.values()
+    if isinstance(obj, ArrayObject):
+        return obj
+    return ()
+
+
+def _reachable(writer) -> Set[int]:
+    """从文档目录和信息字典出发可达的对象编号"""
+    seen = set()
+    stack = [writer._root_object]
+    if getattr(writer, '_info', None) is not None:
+        stack.append(writer._info)
+
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is not writer or obj.idnum in seen:
+                continue
+            seen.add(obj.idnum)
+            obj = writer._objects[obj.idnum - 1]
+        stack.extend(_children(obj))
+
+    if writer._root is not None:
+        seen.add(writer._root.idnum)
+    return seen
+
+
+def _remap_references(obj, remap: Dict[int, int], writer):
+    """把对重复对象的引用改为指向保留的对象"""
+    if isinstance(obj, DictionaryObject):
+        items = obj.items()
+    elif isinstance(obj, ArrayObject):
+        items = enumerate(obj)
+    else:
+        return
+
+    for key, value in list(items):
+        if isinstance(value, IndirectObject):
+            if value.pdf is writer and value.idnum in remap:
+                obj[key] = IndirectObject(remap[value.idnum], 0, writer)
+        else:
+            _remap_references(value, remap, writer)
+
+
+def _object_key(obj) -> Optional[bytes]:
+    """对象序列化后的摘要，用于识别内容完全相同的对象"""
+    if not isinstance(obj, (DictionaryObject, ArrayObject)):
+        return None
+    if isinstance(obj, DictionaryObject) and (obj.get('/Type') in _UNMERGEABLE_TYPES or '/Parent' in obj):
+        return None
+
+    buffer = BytesIO()
+    buffer.write(b'S' if isinstance(obj, StreamObject) else b'D')
+    obj.write_to_stream(buffer, None)
+    return hashlib.sha256(buffer.getvalue()).digest()
+
+
+def _drop_unreachable(writer) -> int:
+    """把不可达的对象替换为null，返回替换的数量"""
+    reachable = _reachable(writer)
+    dropped = 0
+    for index, obj in enumerate(writer._objects):
+        if index + 1 not in reachable and obj is not None and not isinstance(obj, NullObject):
+            writer._objects[index] = NullObject()
+            dropped += 1
+    return dropped
+
+
+def deduplicate_objects(writer, max_passes: int = 4) -> int:
+    """合并写入器中内容完全相同的对象，返回合并的数量
+
+    每一轮合并后引用这些对象的父对象可能也变得相同，因此重复直到没有新的合并。
+    """
+    merged = 0
+    for _ in range(max_passes):
+        reachable = _reachable(writer)
+        canonical = {}
+        remap = {}
+        for idnum in sorted(reachable):
+            key = _object_key(writer._objects[idnum - 1])
+            if key is None:
+                continue
+            if key in canonical:
+                remap[idnum] = canonical[key]
+            else:
+                canonical[key] = idnum
+
+        if not remap:
+            break
+
+        for idnum in reachable:
+            if idnum not in remap:
+                _remap_references(writer._objects[idnum - 1], remap, writer)
+        merged += len(remap)
+        _drop_unreachable(writer)
+
+    return merged
+
+
+def optimize_writer(writer) -> Dict[str, int]:
+    """删除未使用的资源、合并相同对象并丢弃不再引用的对象"""
+    removed_resources = prune_unused_resources(writer)
+    merged_objects = deduplicate_objects(writer)
+    dropped_objects = _drop_unreachable(writer)
+    return {
+        'removed_resources': removed_resources,
+        'merged_objects': merged_objects,
+        'dropped_objects': dropped_objects,
+    }
@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import List, Tuple
+
+
+class ProgressBroker:
+    """在任务线程和SSE请求之间传递进度事件
+
+    每个任务的事件带递增序号，客户端断线重连时凭最后收到的序号继续接收。
+    高频的 page_scanned 事件只保留最新一条，内存占用与页数无关。
+    """
+
+    # 连续出现时只保留最新一条的事件
+    COALESCED_EVENTS = ('page_scanned',)
+
+    def __init__(self, retention: float = 600, max_events: int = 1000):
+        self.retention = retention  # 任务结束后事件保留的秒数
+        self.max_events = max_events  # 每个任务最多保留的事件数
+        self._tasks = {}  # task_id -> {'seq', 'events', 'finished_at'}
+        self._cond = threading.Condition()
+
+    def publish(self, task_id: str, event: str, data: dict):
+        with self._cond:
+            task = self._tasks.get(task_id)
+            if task is None:
+                self._prune()
+                task = self._tasks[task_id] = {'seq': 0, 'events': [], 'finished_at': None}
+
+            task['seq'] += 1
+            task['finished_at'] = None  # 同一任务重新执行（重新分割）
+            events = task['events']
+            if event in self.COALESCED_EVENTS and events and events[-1][1] == event:
+                events[-1] = (task['seq'], event, data)
+            else:
+                events.append((task['seq'], event, data))
+                if len(events) > self.max_events:
+                    del events[:len(events) - self.max_events]
+            self._cond.notify_all()
+
+    def reset(self, task_id: str):
+        """任务重新提交（重新分割）时丢弃上次执行的事件和结束标记，序号继续递增"""
+        with self._cond:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task['events'] = []
+                task['finished_at'] = None
+
+    def finish(self, task_id: str):
+        """标记任务结束，等待中的请求立即返回"""
+        with self._cond:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task['finished_at'] = time.time()
+            self._cond.notify_all()
+
+    def wait(self, task_id: str, after: int, timeout: float) -> Tuple[List[tuple], bool]:
+        """等待序号大于 after 的事件，返回 (事件列表, 任务是否已结束)；超时返回空列表"""
+        def ready():
+            task = self._tasks.get(task_id)
+            return task is not None and (task['seq'] > after or task['finished_at'] is not None)
+
+        with self._cond:
+            self._cond.wait_for(ready, timeout)
+            task = self._tasks.get(task_id)
+            if task is None:
+                return [], False
+            return [e for e in task['events'] if e[0] > after], task['finished_at'] is not None
+
+    def _prune(self):
+        """删除结束超过保留时间的任务，调用方需持有锁"""
+        cutoff = time.time() - self.retention
+        for task_id in [t for t, task in self._tasks.items()
+                        if task['finished_at'] is not None and task['finished_at'] < cutoff]:
+            del self._tasks[task_id]
@@ -0,0 +1,217 @@
+"""直接复制原始对象字节的页面提取
+
+常规写入会把页面引用到的全部对象解析、克隆后再逐个序列化。这里按交叉引用表定位每个对象，
+把对象字典的原始字节和（压缩的）流数据原样写出，只重新编号对象并改写其中的引用；
+只有页面字典本身需要重新生成，以便去掉 /Parent 并带上从页面树继承的属性。
+"""
+import bisect
+import re
+from collections import deque
+from io import BytesIO
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from PyPDF2.generic import DictionaryObject, NameObject
+
+_OBJ_HEADER_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj(?![^\s/\[\]()<>{}%])')
+
+# 对象引用、必须整体跳过的字符串和注释、以及对象体的结束位置
+_TOKEN_RE = re.compile(
+    rb'(?<![\w.+-])(?P<num>\d+)\s+\d+\s+R(?!\w)'
+    rb'|\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\)'
+    rb'|(?<!<)<(?!<)[0-9A-Fa-f\s]*>'
+    rb'|%[^\r\n]*'
+    rb'|(?<!\w)(?P<kw>stream[ \t]*(?:\r\n|\r|\n)|endobj(?!\w))',
+    re.DOTALL
+)
+
+_LENGTH_RE = re.compile(rb'/Length\s+(\d+)(?:\s+(\d+)\s+R(?!\w))?')
+_PAGE_TREE_RE = re.compile(rb'/Type\s*/Pages?(?![^\s/\[\]()<>{}%])')
+
+# 文件头后的二进制注释行，提示传输工具按二进制处理
+_BINARY_MARKER = b'%\xe2\xe3\xcf\xd3\n'
+
+
+class RawCopyError(Exception):
+    """源文件无法直接复制原始对象（已加密、交叉引用与对象不符等），应改用常规写入"""
+
+
+class RawPageCopier:
+    """按原始字节复制页面及其引用的对象；同一个reader可重复用于提取多个页面范围"""
+
+    def __init__(self, reader):
+        if reader.is_encrypted:
+            # 加密密钥与对象号相关，重新编号后无法解密
+            raise RawCopyError('加密的PDF不能直接复制原始对象')
+
+        self.reader = reader
+        self.stream = reader.stream
+        self._offsets: Dict[int, int] = {}  # 对象号 -> 文件偏移
+        for generation, entries in reader.xref.items():
+            if generation == 65535:
+                continue
+            for idnum, offset in entries.items():
+                if offset:
+                    self._offsets.setdefault(idnum, offset)
+
+        self.stream.seek(0, 2)
+        self._file_size = self.stream.tell()
+        # 按偏移排序，下一个对象的起点即当前对象读取范围的上界
+        self._sorted_offsets = sorted(set(self._offsets.values()))
+        self._objstm_cache: Dict[int, Tuple[bytes, List[Tuple[int, int]]]] = {}
+
+    def clear_cache(self):
+        """丢弃已解压的对象流"""
+        self._objstm_cache.clear()
+
+    def _read(self, offset: int, size: int) -> bytes:
+        self.stream.seek(offset)
+        return self.stream.read(size)
+
+    def read_object(self, idnum: int) -> Optional[Tuple[bytes, Optional[bytes]]]:
+        """返回 (对象体原始字节, 流数据原始字节或None)；对象不存在时返回None"""
+        if idnum in getattr(self.reader, 'xref_objStm', {}):
+            return self._read_compressed_object(idnum), None
+
+        offset = self._offsets.get(idnum)
+        if offset is None:
+            return None
+
+        index = bisect.bisect_right(self._sorted_offsets, offset)
+        end = self._sorted_offsets[index] if index < len(self._sorted_offsets) else self._file_size
+        data = self._read(offset, end - offset)
+
+        header = _OBJ_HEADER_RE.match(data)
+        if header is None or int(header.group(1)) != idnum:
+            raise RawCopyError(f'交叉引用表中对象 {idnum} 的位置不正确')
+
+        body_start = header.end()
+        for token in _TOKEN_RE.finditer(data, body_start):
+            keyword = token.group('kw')
+            if keyword is None:
+                continue
+            body = data[body_start:token.start()].strip()
+            if keyword == b'endobj':
+                return body, None
+            return body, self._stream_payload(body, offset, data, token.end())
+
+        raise RawCopyError(f'对象 {idnum} 没有结束标记')
+
+    def _stream_payload(self, body: bytes, offset: int, data: bytes, start: int) -> bytes:
+        """按 /Length 取出流数据，长度缺失或不符时退回查找 endstream"""
+        length = None
+        match = _LENGTH_RE.search(body)
+        if match is not None:
+            if match.group(2) is None:
+                length = int(match.group(1))
+            else:
+                length_object = self.read_object(int(match.group(1)))
+                if length_object is not None and length_object[0].isdigit():
+                    length = int(length_object[0])
+
+        if length is not None:
+            needed = start + length + 32
+            if needed > len(data):
+                # 对象不是按偏移顺序连续存放时，流数据可能超出按下一个对象估计的范围
+                data += self._read(offset + len(data), needed - len(data))
+            if data[start + length:start + length + 32].lstrip(b'\r\n \t\f\x00').startswith(b'endstream'):
+                return data[start:start + length]
+
+        end = data.find(b'endstream', start)
+        if end < 0:
+            raise RawCopyError('流对象没有 endstream 标记')
+        payload = data[start:end]
+        if payload.endswith(b'\r\n'):
+            return payload[:-2]
+        return payload[:-1] if payload.endswith((b'\n', b'\r')) else payload
+
+    def _read_compressed_object(self, idnum: int) -> bytes:
+        """从对象流中取出对象的原始字节，每个对象流只解压一次"""
+        stream_num, index = self.reader.xref_objStm[idnum]
+        cached = self._objstm_cache.get(stream_num)
+        if cached is None:
+            object_stream = self.reader.get_object(stream_num)
+            data = object_stream.get_data()
+            first = int(object_stream['/First'])
+            numbers = data[:first].split()
+            entries = [(int(numbers[i]), first + int(numbers[i + 1])) for i in range(0, len(numbers) - 1, 2)]
+            cached = self._objstm_cache[stream_num] = (data, entries)
+
+        data, entries = cached
+        if index >= len(entries) or entries[index][0] != idnum:
+            index = next((i for i, entry in enumerate(entries) if entry[0] == idnum), None)
+            if index is None:
+                raise RawCopyError(f'对象流 {stream_num} 中没有对象 {idnum}')
+        start = entries[index][1]
+        end = entries[index + 1][1] if index + 1 < len(entries) else len(data)
+        return data[start:end].strip()
+
+    def write(self, page_numbers: List[int], output: BinaryIO) -> int:
+        """把指定页面（从0开始）写为一个新的PDF，返回写入的页数"""
+        pages = [self.reader.pages[page_num] for page_num in page_numbers]
+        if not pages:
+            return 0
+
+        numbers: Dict[int, int] = {}  # 原对象号 -> 新对象号；1、2 为新的目录和页面树
+        queue = deque()
+        for page in pages:
+            if page.indirect_reference is None:
+                raise RawCopyError('页面不是间接对象')
+            numbers[page.indirect_reference.idnum] = len(numbers) + 3
+        page_ids = set(numbers)
+
+        def renumber(match):
+            if match.group('num') is None:
+                return match.group(0)
+            idnum = int(match.group('num'))
+            if idnum not in numbers:
+                numbers[idnum] = len(numbers) + 3
+                queue.append(idnum)
+            return b'%d 0 R' % numbers[idnum]
+
+        header = getattr(self.reader, 'pdf_header', '') or ''
+        output.write((header if header.startswith('%PDF-') else '%PDF-1.7').encode('latin-1') + b'\n' + _BINARY_MARKER)
+        offsets = {}
+
+        def write_object(number: int, body: bytes, payload: Optional[bytes] = None):
+            offsets[number] = output.tell()
+            output.write(b'%d 0 obj\n' % number)
+            output.write(body)
+            if payload is not None:
+                output.write(b'\nstream\n')
+                output.write(payload)
+                output.write(b'\nendstream')
+            output.write(b'\nendobj\n')
+
+        write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        kids = b' '.join(b'%d 0 R' % numbers[page.indirect_reference.idnum] for page in pages)
+        write_object(2, b'<< /Type /Pages /Kids [ %s ] /Count %d >>' % (kids, len(pages)))
+
+        for page in pages:
+            # 页面字典已由reader补全继承的属性，重新序列化并指向新的页面树
+            page_dict = DictionaryObject({key: value for key, value in page.items() if key != '/Parent'})
+            page_dict[NameObject('/Parent')] = NameObject('/__parent__')
+            buffer = BytesIO()
+            page_dict.write_to_stream(buffer, None)
+            body = _TOKEN_RE.sub(renumber, buffer.getvalue()).replace(b'/__parent__', b'2 0 R')
+            write_object(numbers[page.indirect_reference.idnum], body)
+
+        while queue:
+            idnum = queue.popleft()
+            obj = self.read_object(idnum)
+            if obj is None:
+                write_object(numbers[idnum], b'null')
+                continue
+            body, payload = obj
+            if payload is None and idnum not in page_ids and _PAGE_TREE_RE.search(body):
+                # 注释、书签等引用的其他页面和原页面树不复制，引用处视为null
+                write_object(numbers[idnum], b'null')
+                continue
+            write_object(numbers[idnum], _TOKEN_RE.sub(renumber, body), payload)
+
+        size = len(numbers) + 3
+        xref_offset = output.tell()
+        output.write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        for number in range(1, size):
+            output.write(b'%010d 00000 n \n' % offsets[number])
+        output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref_offset))
+        return len(pages)
@@ -1,3 +1,13 @@
+// 超过该大小的文件使用分块上传
+const CHUNKED_UPLOAD_THRESHOLD = 20 * 1024 * 1024;
+const MAX_DOCUMENT_SIZE = 500 * 1024 * 1024;
+const CHUNK_MAX_RETRIES = 5;
+// 进度条分段：上传 0-30%，扫描章节 30-70%，写入章节文件 70-100%
+const PROGRESS_UPLOAD_END = 30;
+const PROGRESS_SCAN_END = 70;
+// SSE连续重连失败的次数上限，超过后改为轮询任务状态
+const SSE_MAX_RECONNECTS = 3;
+
 document.addEventListener('DOMContentLoaded', function() {
     const uploadForm = document.getElementById('uploadForm');
     const uploadBtn = document.getElementById('uploadBtn');
@@ -22,8 +32,8 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
-        if (file.size > 50 * 1024 * 1024) {
-            showAlert('文件大小不能超过50MB', 'error');
+        if (file.size > MAX_DOCUMENT_SIZE) {
+            showAlert(`文件大小不能超过${MAX_DOCUMENT_SIZE / 1024 / 1024}MB`, 'error');
             return;
         }
         
@@ -36,22 +46,23 @@ document.addEventListener('DOMContentLoaded', function() {
         formData.append('custom_patterns', document.getElementById('customPatterns').value);
         
         try {
-            // 模拟进度更新
-            let progress = 0;
-            const progressInterval = setInterval(() => {
-                progress += Math.random() * 15;
-                if (progress > 90) progress = 90;
-                updateProgress(progress, '正在处理PDF文件...');
-            }, 500);
-            
-            const response = await fetch('/upload', {
-                method: 'POST',
-                body: formData
-            });
-            
-            clearInterval(progressInterval);
+            let result;
+            if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+                // 大文件分块上传，连接中断后从服务器已接收的位置续传
+                result = await uploadChunked(file, document.getElementById('customPatterns').value);
+            } else {
+                const response = await fetch('/upload', {
+                    method: 'POST',
+                    body: formData
+                });
+                result = await response.json();
+            }
             
-            const result = await response.json();
+            // 上传成功后接收处理进度，直到分割完成或失败
+            if (result.success) {
+                updateProgress(PROGRESS_UPLOAD_END, '上传完成，等待处理...');
+                result = await waitForJob(result.task_id);
+            }
             
             if (result.success) {
                 updateProgress(100, '处理完成！');
@@ -70,6 +81,120 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    async function uploadChunked(file, customPatterns) {
+        const initResponse = await fetch('/upload/init', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        const session = await initResponse.json();
+        if (!initResponse.ok) {
+            return { success: false, error: session.error };
+        }
+        
+        let offset = 0;
+        let retries = 0;
+        while (offset < file.size) {
+            const chunk = file.slice(offset, offset + session.chunk_size);
+            try {
+                const response = await fetch(`/upload/${session.upload_id}/chunk?offset=${offset}`, {
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream' },
+                    body: chunk
+                });
+                const result = await response.json();
+                if (!response.ok && response.status !== 409) {
+                    return { success: false, error: result.error };
+                }
+                if (response.ok) {
+                    offset = result.received;
+                    retries = 0;
+                    updateProgress(offset / file.size * PROGRESS_UPLOAD_END, `正在上传... ${(offset / 1024 / 1024).toFixed(1)}MB`);
+                    continue;
+                }
+            } catch (error) {
+                if (++retries > CHUNK_MAX_RETRIES) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            }
+            
+            // 偏移不一致或请求失败时，以服务器已接收的字节数为准继续上传
+            const statusResponse = await fetch(`/upload/${session.upload_id}`);
+            const status = await statusResponse.json();
+            if (!statusResponse.ok) {
+                return { success: false, error: status.error };
+            }
+            offset = status.received;
+        }
+        
+        const finalizeResponse = await fetch(`/upload/${session.upload_id}/finalize`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ custom_patterns: customPatterns })
+        });
+        return await finalizeResponse.json();
+    }
+
+    function waitForJob(taskId) {
+        if (!window.EventSource) {
+            return pollJob(taskId);
+        }
+        
+        // 通过SSE接收扫描和写入进度，连接失败时改为轮询任务状态
+        return new Promise(resolve => {
+            const source = new EventSource(`/events/${taskId}`);
+            let chaptersFound = 0;
+            
+            source.addEventListener('page_scanned', e => {
+                const data = JSON.parse(e.data);
+                const percent = PROGRESS_UPLOAD_END + data.page / data.total * (PROGRESS_SCAN_END - PROGRESS_UPLOAD_END);
+                updateProgress(percent, `正在扫描章节... 第 ${data.page}/${data.total} 页，已发现 ${chaptersFound} 个章节`);
+            });
+            source.addEventListener('chapter_found', () => {
+                chaptersFound++;
+            });
+            source.addEventListener('chapter_written', e => {
+                const data = JSON.parse(e.data);
+                const percent = PROGRESS_SCAN_END + data.index / data.total * (100 - PROGRESS_SCAN_END);
+                updateProgress(Math.min(percent, 99), `正在生成章节文件... ${data.index}/${data.total}`);
+            });
+            source.addEventListener('status', e => {
+                source.close();
+                const status = JSON.parse(e.data);
+                resolve(status.status === 'done' ? status : { success: false, error: status.error || '处理失败' });
+            });
+            let reconnects = 0;
+            source.onopen = () => {
+                reconnects = 0;
+            };
+            source.onerror = () => {
+                // 服务器定期关闭长连接，浏览器会带 Last-Event-ID 自动重连；连续重连失败或连接被拒绝时改为轮询
+                if (source.readyState === EventSource.CONNECTING && ++reconnects <= SSE_MAX_RECONNECTS) {
+                    return;
+                }
+                source.close();
+                pollJob(taskId).then(resolve);
+            };
+        });
+    }
+
+    async function pollJob(taskId) {
+        while (true) {
+            const response = await fetch(`/status/${taskId}`);
+            const status = await response.json();
+            
+            if (status.status === 'done') {
+                return status;
+            }
+            if (status.status === 'failed' || !response.ok) {
+                return { success: false, error: status.error || '处理失败' };
+            }
+            
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+
     function showProgress() {
         uploadBtn.disabled = true;
         uploadBtn.innerHTML = `
@@ -99,26 +224,23 @@ document.addEventListener('DOMContentLoaded', function() {
 
     function updateProgress(percent, text) {
         progressBar.style.width = percent + '%';
-        progressText.innerHTML = `
-            <i class="fas fa-info-circle me-1"></i>
-            ${text}
-        `;
+        progressBar.setAttribute('aria-valuenow', Math.round(percent));
         
-        // 根据进度更新文字
-        if (percent < 30) {
+        // 根据进度阶段选择图标
+        if (percent < PROGRESS_UPLOAD_END) {
             progressText.innerHTML = `
                 <i class="fas fa-upload me-1"></i>
                 ${text}
             `;
-        } else if (percent < 70) {
+        } else if (percent < PROGRESS_SCAN_END) {
             progressText.innerHTML = `
                 <i class="fas fa-cog fa-spin me-1"></i>
-                正在智能分析文档结构和章节...
+                ${text}
             `;
-        } else if (percent < 95) {
+        } else if (percent < 100) {
             progressText.innerHTML = `
                 <i class="fas fa-cut me-1"></i>
-                正在分割PDF文档为章节文件...
+                ${text}
             `;
         } else {
             progressText.innerHTML = `
@@ -0,0 +1,308 @@
+import heapq
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+
+def _path_size(path: str) -> int:
+    """文件或目录（递归）的字节数，不存在时为0"""
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+    except OSError:
+        return 0
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class TaskRegistry:
+    """记录每个任务的文件、创建时间和占用空间，按过期时间和总磁盘配额清理
+
+    过期时间保存在按时间排序的堆中，清理时只检查已到期的任务，开销与任务总数无关；每次访问把过期时间顺延 ttl；
+    总大小超过配额时按最近访问顺序淘汰最久未使用的任务。is_busy 返回True的任务（排队或执行中）不会被删除。
+    """
+
+    def __init__(self, ttl: float, max_bytes: Optional[int] = None, cleanup_interval: float = 60,
+                 is_busy: Optional[Callable[[str], bool]] = None,
+                 on_remove: Optional[Callable[[str, List[str]], None]] = None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.cleanup_interval = cleanup_interval
+        self.is_busy = is_busy or (lambda task_id: False)
+        self.on_remove = on_remove
+        self.logger = logging.getLogger(__name__)
+        self._tasks = OrderedDict()  # task_id -> {'paths', 'created_at', 'expires_at', 'size'}，按最近访问排序
+        self._expiry = []  # (过期时间, task_id) 堆，任务删除或延期后旧条目在出堆时跳过
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, task_id: str):
+        return task_id in self._tasks
+
+    def register(self, task_id: str, paths: Iterable[str], created_at: Optional[float] = None):
+        """登记任务占用的文件或目录（可以尚不存在），已登记的任务追加路径"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                created_at = created_at or time.time()
+                task = self._tasks[task_id] = {'paths': [], 'created_at': created_at,
+                                               'expires_at': created_at + self.ttl, 'size': 0}
+                heapq.heappush(self._expiry, (task['expires_at'], task_id))
+            for path in paths:
+                if path not in task['paths']:
+                    task['paths'].append(path)
+            self._tasks.move_to_end(task_id)
+        self.update(task_id)
+
+    def update(self, task_id: str):
+        """重新统计任务占用的空间，任务写入新文件后调用"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return
+            paths = list(task['paths'])
+
+        size = sum(_path_size(path) for path in paths)
+        with self._lock:
+            if self._tasks.get(task_id) is task:
+                self._total += size - task['size']
+                task['size'] = size
+
+    def touch(self, task_id: str):
+        """记录一次访问：过期时间顺延为 ttl 之后，配额淘汰时最近访问的任务最后删除
+
+        顺延超过 cleanup_interval 时才写入新的堆条目，频繁访问的任务不会在堆中堆积旧条目。
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return
+            self._tasks.move_to_end(task_id)
+            expires_at = time.time() + self.ttl
+            if expires_at - task['expires_at'] >= min(self.cleanup_interval, self.ttl):
+                task['expires_at'] = expires_at
+                heapq.heappush(self._expiry, (expires_at, task_id))
+
+    def forget(self, task_id: str):
+        """不删除文件，只从索引中移除（文件已转交给其他任务时使用）"""
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if task is not None:
+                self._total -= task['size']
+
+    def maybe_cleanup(self) -> int:
+        """有任务到期或超出配额时执行清理；只检查堆顶和总大小，适合在每个请求中调用"""
+        now = time.time()
+        expired = bool(self._expiry) and self._expiry[0][0] <= now
+        over_quota = self.max_bytes is not None and self._total > self.max_bytes
+        if not expired and not over_quota:
+            return 0
+        return self.cleanup(now)
+
+    def cleanup(self, now: Optional[float] = None) -> int:
+        """删除已过期的任务，再按最近最少使用淘汰到配额以内，返回删除的任务数"""
+        now = now or time.time()
+        victims = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, task_id = heapq.heappop(self._expiry)
+                task = self._tasks.get(task_id)
+                if task is None or task['expires_at'] != expires_at:
+                    continue
+                if self.is_busy(task_id):
+                    # 执行中的任务延期 cleanup_interval 后再检查
+                    task['expires_at'] = now + self.cleanup_interval
+                    heapq.heappush(self._expiry, (task['expires_at'], task_id))
+                    continue
+                victims.append((task_id, self._pop(task_id), 'expired'))
+
+            if self.max_bytes is not None and self._total > self.max_bytes:
+                for task_id in list(self._tasks):
+                    if self._total <= self.max_bytes:
+                        break
+                    if not self.is_busy(task_id):
+                        victims.append((task_id, self._pop(task_id), 'over quota'))
+
+        for task_id, task, reason in victims:
+            self._delete(task_id, task['paths'], reason)
+        return len(victims)
+
+    def _pop(self, task_id: str) -> dict:
+        """从索引中移除任务，调用方需持有锁"""
+        task = self._tasks.pop(task_id)
+        self._total -= task['size']
+        return task
+
+    def _delete(self, task_id: str, paths: List[str], reason: str):
+        for path in paths:
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.error(f"Error cleaning up {path}: {e}")
+        self.logger.info(f"Cleaned up task {task_id} ({reason})")
+
+        if self.on_remove is not None:
+            try:
+                self.on_remove(task_id, paths)
+            except Exception as e:
+                self.logger.warning(f"Cleanup callback failed for {task_id}: {e}")
+
+
+class SQLiteTaskRegistry(TaskRegistry):
+    """任务登记保存在SQLite中，多个gunicorn worker共享过期时间、访问顺序和总占用空间
+
+    进程内的 TaskRegistry 只知道本进程创建的任务，多个worker时总占用可达配额的数倍，
+    在其他worker上的访问也不会顺延过期时间。过期时间和最近访问时间带索引，清理时只读取到期的任务；
+    多个worker同时清理时以删除登记记录成功的一方删除文件。
+    """
+
+    def __init__(self, db_path: str, ttl: float, max_bytes: Optional[int] = None, cleanup_interval: float = 60,
+                 is_busy: Optional[Callable[[str], bool]] = None,
+                 on_remove: Optional[Callable[[str, List[str]], None]] = None):
+        super().__init__(ttl, max_bytes=max_bytes, cleanup_interval=cleanup_interval, is_busy=is_busy,
+                         on_remove=on_remove)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS tasks ('
+                ' task_id TEXT PRIMARY KEY,'
+                ' paths TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL,'
+                ' size INTEGER NOT NULL DEFAULT 0)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS tasks_expires_at ON tasks (expires_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS tasks_accessed_at ON tasks (accessed_at)')
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后关闭连接"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('SELECT COALESCE(SUM(size), 0) FROM tasks').fetchone()[0]
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+
+    def __contains__(self, task_id: str):
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM tasks WHERE task_id = ?', (task_id,)).fetchone() is not None
+
+    def register(self, task_id: str, paths: Iterable[str], created_at: Optional[float] = None):
+        created_at = created_at or time.time()
+        with self._connect() as conn:
+            conn.execute('INSERT OR IGNORE INTO tasks (task_id, paths, created_at, expires_at, accessed_at)'
+                         ' VALUES (?, ?, ?, ?, ?)', (task_id, '[]', created_at, created_at + self.ttl, created_at))
+            known = json.loads(conn.execute('SELECT paths FROM tasks WHERE task_id = ?', (task_id,)).fetchone()[0])
+            merged = known + [path for path in dict.fromkeys(paths) if path not in known]
+            if merged != known:
+                conn.execute('UPDATE tasks SET paths = ? WHERE task_id = ?', (json.dumps(merged), task_id))
+        self.update(task_id)
+
+    def update(self, task_id: str):
+        with self._connect() as conn:
+            row = conn.execute('SELECT paths FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+        if row is None:
+            return
+
+        size = sum(_path_size(path) for path in json.loads(row[0]))
+        with self._connect() as conn:
+            conn.execute('UPDATE tasks SET size = ? WHERE task_id = ?', (size, task_id))
+
+    def touch(self, task_id: str):
+        """顺延过期时间并记录访问时间；与上次顺延相差不到 cleanup_interval 时不写入"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('UPDATE tasks SET expires_at = ?, accessed_at = ? WHERE task_id = ? AND expires_at <= ?',
+                         (now + self.ttl, now, task_id, now + self.ttl - min(self.cleanup_interval, self.ttl)))
+
+    def forget(self, task_id: str):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,))
+
+    def maybe_cleanup(self) -> int:
+        now = time.time()
+        with self._connect() as conn:
+            next_expiry, total = conn.execute('SELECT MIN(expires_at), COALESCE(SUM(size), 0) FROM tasks').fetchone()
+        expired = next_expiry is not None and next_expiry <= now
+        over_quota = self.max_bytes is not None and total > self.max_bytes
+        if not expired and not over_quota:
+            return 0
+        return self.cleanup(now)
+
+    def cleanup(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        with self._connect() as conn:
+            expired = conn.execute('SELECT task_id, paths, expires_at FROM tasks WHERE expires_at <= ?'
+                                   ' ORDER BY expires_at', (now,)).fetchall()
+        removed = 0
+        for task_id, paths, expires_at in expired:
+            if self.is_busy(task_id):
+                # 执行中的任务延期 cleanup_interval 后再检查
+                with self._connect() as conn:
+                    conn.execute('UPDATE tasks SET expires_at = ? WHERE task_id = ? AND expires_at = ?',
+                                 (now + self.cleanup_interval, task_id, expires_at))
+                continue
+            if self._claim(task_id, 'AND expires_at = ?', (expires_at,)):
+                self._delete(task_id, json.loads(paths), 'expired')
+                removed += 1
+
+        if self.max_bytes is None:
+            return removed
+        with self._connect() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM tasks').fetchone()[0]
+            candidates = conn.execute('SELECT task_id, paths, size FROM tasks ORDER BY accessed_at').fetchall() \
+                if total > self.max_bytes else []
+        for task_id, paths, size in candidates:
+            if total <= self.max_bytes:
+                break
+            if self.is_busy(task_id) or not self._claim(task_id):
+                continue
+            total -= size
+            self._delete(task_id, json.loads(paths), 'over quota')
+            removed += 1
+        return removed
+
+    def _claim(self, task_id: str, condition: str = '', params: tuple = ()) -> bool:
+        """删除任务的登记记录，成功时由本进程删除文件"""
+        with self._connect() as conn:
+            return conn.execute(f'DELETE FROM tasks WHERE task_id = ? {condition}', (task_id,) + params).rowcount == 1
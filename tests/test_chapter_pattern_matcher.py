@@ -0,0 +1,77 @@
+"""ChapterPatternMatcher 与逐个模式依次匹配（组合正则引入前的做法）的结果一致"""
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pdf_chapter_splitter import ChapterPatternMatcher, PDFChapterSplitter
+
+DEFAULT_PATTERNS = PDFChapterSplitter('unused.pdf').chapter_patterns
+
+LINES = [
+    '', ' ', '第一章 总论', '第12章', '第十二章 结语', '第3节 方法', '第二部分 实验', '第 一章',
+    'Chapter 1', 'chapter 12 Results', 'CHAPTER 7', 'Chapter', 'Chapters 3', ' Chapter 1',
+    'Section 2 Methods', 'section 10', 'ſection 3', '1. Introduction', '12.  Results', '3.', '3.5 Data',
+    'Appendix A', 'APPENDIX', 'ABCD', 'aa Notes', 'AA notes', 'ab notes', '"Preface"', "'Preface'", '"Preface\'',
+    'II. Background', 'iv. Scope', 'XI. Summary', 'IV Summary', 'Part II', 'part iv', 'Key Terms', 'key terms',
+    'İndex', 'index', '附录 A', '附录', '序言', 'the end', '2023 Annual Report', '². Footnote',
+]
+
+CUSTOM_PATTERNS = [
+    r'^(\w)\1\s+\w+',  # 反向引用：行首两个相同字符
+    r'^(?P<q>["\'])\w+(?P=q)',  # 命名分组的反向引用：成对的引号
+    r'^[IVX]+\.\s+\S+',  # 行首为字符类
+    r'^[A-Z]{4}$',
+    r'^Part\s+[IVX]+',
+    r'^Appendix\s+[A-Z]',
+    r'^Key\s+Terms',
+    r'^index',
+    r'^附录',
+]
+
+
+def reference_match(patterns, line, flags=re.IGNORECASE):
+    """按顺序逐个匹配，返回首个匹配的模式序号"""
+    for index, pattern in enumerate(patterns):
+        if re.match(pattern, line, flags):
+            return index
+    return None
+
+
+@pytest.mark.parametrize('patterns', [
+    DEFAULT_PATTERNS,
+    DEFAULT_PATTERNS + CUSTOM_PATTERNS,
+    CUSTOM_PATTERNS + DEFAULT_PATTERNS,
+    [CUSTOM_PATTERNS[0]] + DEFAULT_PATTERNS,
+    [CUSTOM_PATTERNS[2]] + DEFAULT_PATTERNS,
+    DEFAULT_PATTERNS + [r'(?i)^epilogue', r'^\d+\.\s+\S+'],  # 自带全局标志，无法组合
+], ids=['default', 'default+custom', 'custom+default', 'backreference', 'character-class', 'inline-flag'])
+def test_same_match_as_pattern_loop(patterns):
+    matcher = ChapterPatternMatcher(patterns)
+    for line in LINES + ['Epilogue']:
+        assert matcher.match(line) == reference_match(patterns, line), line
+
+
+def test_backreferences_are_matched():
+    matcher = ChapterPatternMatcher(DEFAULT_PATTERNS + CUSTOM_PATTERNS[:2])
+    assert matcher.match('AA notes') == len(DEFAULT_PATTERNS)
+    assert matcher.match('ab notes') is None
+    assert matcher.match('"Preface"') == len(DEFAULT_PATTERNS) + 1
+    assert matcher.match('"Preface\'') is None
+
+
+def test_earlier_pattern_wins_across_combined_and_separate():
+    # 带分组的模式单独匹配，排在组合正则中的模式之前时仍然优先
+    patterns = [r'^(\d)\.\s+\S+', r'^\d+\.\s+\S+']
+    assert ChapterPatternMatcher(patterns).match('1. Introduction') == 0
+    assert ChapterPatternMatcher(list(reversed(patterns))).match('1. Introduction') == 0
+
+
+def test_prefilter_keeps_case_insensitive_equivalents():
+    matcher = ChapterPatternMatcher([r'^Section\s+\d+', r'^Key', r'^index'])
+    for line in ('ſection 3', 'Key', 'İndex', 'ındex'):
+        assert matcher.could_match(line), line
+    assert not matcher.could_match('Chapter 1')
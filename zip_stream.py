@@ -0,0 +1,66 @@
+import io
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+class _StreamBuffer(io.RawIOBase):
+    """zipfile 写入目标：不可 seek，写入的数据由生成器取走后立即释放"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files: Iterable[Tuple[str, str]], compress_level: Optional[int] = None,
+               chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """边读取文件边生成ZIP数据，不落盘也不在内存中缓存整个压缩包
+
+    files 为 (磁盘路径, 压缩包内文件名) 序列。PDF本身已压缩，默认以 ZIP_STORED 存储，条目保留文件的修改时间；
+    指定 compress_level 时使用 ZIP_DEFLATED 和该压缩级别。ZipInfo 没有设置压缩级别的公开接口，
+    压缩的条目按文件名打开以使用 ZipFile 的 compresslevel，修改时间为zipfile的默认值。
+    """
+    compression = zipfile.ZIP_STORED if compress_level is None else zipfile.ZIP_DEFLATED
+    buffer = _StreamBuffer()
+
+    with zipfile.ZipFile(buffer, 'w', compression=compression, compresslevel=compress_level) as zipf:
+        for file_path, arcname in files:
+            stat = os.stat(file_path)
+            if compress_level is None:
+                entry = zipfile.ZipInfo(arcname, date_time=time.localtime(stat.st_mtime)[:6])
+                entry.compress_type = compression
+                entry.file_size = stat.st_size
+                force_zip64 = False
+            else:
+                # 与 ZipFile 按 file_size 判断是否需要ZIP64的方式一致
+                entry = arcname
+                force_zip64 = stat.st_size * 1.05 > zipfile.ZIP64_LIMIT
+
+            with open(file_path, 'rb') as src, zipf.open(entry, 'w', force_zip64=force_zip64) as dest:
+                for chunk in iter(lambda: src.read(chunk_size), b''):
+                    dest.write(chunk)
+                    data = buffer.take()
+                    if data:
+                        yield data
+
+            data = buffer.take()
+            if data:
+                yield data
+
+    # 中央目录在关闭时写入
+    data = buffer.take()
+    if data:
+        yield data